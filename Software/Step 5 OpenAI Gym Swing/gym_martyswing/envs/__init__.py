@@ -1 +1,2 @@
 from gym_martyswing.envs.martyswing_env import MartySwingEnv
+from gym_martyswing.envs.martyswing_raster import SwingRasterizer
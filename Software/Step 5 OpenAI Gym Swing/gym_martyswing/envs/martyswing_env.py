@@ -2,8 +2,19 @@ import gym
 from gym import error, spaces, utils
 from gym.utils import seeding
 import numpy as np
+import os
 from os import path
-from gym.envs.classic_control import rendering
+from gym_martyswing.envs.martyswing_raster import SwingRasterizer
+
+# Rendering uses pyglet and OpenGL which are only loaded on the first call to render() so the
+# env can be imported and used on machines without a display. Setting MARTYSWING_HEADLESS=1
+# makes render() in 'human' mode do nothing so scripts which render can also be run headless,
+# and makes render() in 'rgb_array' mode use the software rasterizer rather than OpenGL
+HEADLESS = os.environ.get("MARTYSWING_HEADLESS", "0") == "1"
+
+# Record format for each step of a rollout
+ROLLOUT_DTYPE = np.dtype([("t", np.float64), ("theta", np.float64), ("v", np.float64), ("l", np.float64),
+            ("kickAngle", np.float64), ("PE", np.float64), ("KE", np.float64), ("reward", np.float64)])
 
 class MartySwingEnv(gym.Env):
     metadata = {
@@ -37,6 +48,9 @@ class MartySwingEnv(gym.Env):
 
         # Viewer
         self.viewer = None
+        self.headless = HEADLESS
+        self.rasterizer = None
+        self.useRasterizer = HEADLESS
         self.lenRope = 1
         self.lenBody = 0.7
         self.lenLegTop = 0.4
@@ -86,6 +100,10 @@ class MartySwingEnv(gym.Env):
         return [seed]
 
     def step(self, act):
+        reward, done = self._advance(act)
+        return self._get_obs(), reward, done, {"t":self.t, "PE":self.potentialE, "KE":self.kineticE, "v":self.v, "l":self.l, "theta":self.theta, "kickAngle":self.kickAngle, "thetaMax":self.thetaMax}
+
+    def _advance(self, act):
         # Immediate implementation of action
         reward = 0
         if act == 0:
@@ -132,18 +150,47 @@ class MartySwingEnv(gym.Env):
         self.potentialE = newPotentialE
         self.theta = newTheta
         self.t += self.dt
-        return self._get_obs(), reward, done, {"t":self.t, "PE":self.potentialE, "KE":self.kineticE, "v":self.v, "l":self.l, "theta":self.theta, "kickAngle":self.kickAngle, "thetaMax":self.thetaMax}
+        return reward, done
+
+    def rollout(self, policy, maxSteps):
+        # Run a whole episode from reset without building per-step observations and info
+        # policy is either a fixed action or a function called with this env (so it can
+        # use t, theta, v, kickAngle, etc) which returns the action for the next step
+        # Returns the trajectory as a structured array and a dict of summary stats
+        trajectory = np.zeros(maxSteps, dtype=ROLLOUT_DTYPE)
+        self.reset()
+        fixedAction = not callable(policy)
+        act = policy
+        rewardSum = 0
+        done = False
+        steps = 0
+        while steps < maxSteps and not done:
+            if not fixedAction:
+                act = policy(self)
+            reward, done = self._advance(act)
+            rewardSum += reward
+            trajectory[steps] = (self.t, self.theta, self.v, self.l, self.kickAngle, self.potentialE, self.kineticE, reward)
+            steps += 1
+        stats = {"steps":steps, "t":self.t, "rewardSum":rewardSum, "thetaMax":self.thetaMax, "thetaPeakCount":self.thetaPeakCount, "done":done}
+        return trajectory[:steps], stats
 
     def _get_obs(self):
         xAcc = - self.g * np.sin(self.theta)
         return np.array([xAcc])
 
     def makeRect(self, length, width):
+        from gym.envs.classic_control import rendering
         l, r, t, b = 0, length, width/2, -width/2
         return rendering.make_polygon([(l,b), (l,t), (r,t), (r,b)])
 
     def render(self, mode='human'):
 
+        if self.headless and mode == 'human':
+            return None
+        if self.useRasterizer and mode == 'rgb_array':
+            return self.renderFrames(self.theta, self.kickAngle)[0]
+
+        from gym.envs.classic_control import rendering
         if self.viewer is None:
 
             # First time through we create the scene 
@@ -200,6 +247,13 @@ class MartySwingEnv(gym.Env):
         # Render
         return self.viewer.render(return_rgb_array = mode=='rgb_array')
 
+    def renderFrames(self, theta, kickAngle):
+        # Software render of one or more swing states to an array of shape (T, H, W, 3)
+        if self.rasterizer is None:
+            self.rasterizer = SwingRasterizer(lenRope=self.lenRope, lenBody=self.lenBody,
+                        lenLegTop=self.lenLegTop, lenLegBottom=self.lenLegBottom)
+        return self.rasterizer.renderFrames(theta, kickAngle)
+
     def close(self):
         if self.viewer:
             self.viewer.close()
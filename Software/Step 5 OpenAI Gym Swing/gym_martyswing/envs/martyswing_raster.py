@@ -0,0 +1,82 @@
+import numpy as np
+
+# Software rasterizer for the MartySwing scene - draws the same axle, rope, body and legs as
+# MartySwingEnv.render() straight into uint8 arrays without needing OpenGL or a display, and can
+# render a whole batch of swing states in one call
+class SwingRasterizer:
+
+    def __init__(self, width=500, height=500, bounds=(-2.2, 2.2, -3.4, 1.0),
+                lenRope=1, lenBody=0.7, lenLegTop=0.4, lenLegBottom=0.4, framesPerChunk=64):
+        self.width = width
+        self.height = height
+        self.lenRope = lenRope
+        self.lenBody = lenBody
+        self.lenLegTop = lenLegTop
+        self.lenLegBottom = lenLegBottom
+        self.framesPerChunk = framesPerChunk
+
+        # World coordinates of pixel centres (row 0 is the top of the image)
+        self.left, right, bottom, self.top = bounds
+        self.pixSizeX = (right - self.left) / width
+        self.pixSizeY = (self.top - bottom) / height
+        self.pixX = self.left + (np.arange(width) + 0.5) * self.pixSizeX
+        self.pixY = self.top - (np.arange(height) + 0.5) * self.pixSizeY
+
+        # Colours as in MartySwingEnv.render()
+        self.colourBackground = np.array([255, 255, 255], dtype=np.uint8)
+        self.colourAxle = np.array([0, 0, 0], dtype=np.uint8)
+        self.colourRope = np.array([51, 51, 51], dtype=np.uint8)
+        self.colourBody = np.array([10, 141, 231], dtype=np.uint8)
+        self.colourLeg = np.array([28, 173, 252], dtype=np.uint8)
+
+        # The axle doesn't move so its mask is computed once
+        self.axleMask = (self.pixX[np.newaxis, :] ** 2 + self.pixY[:, np.newaxis] ** 2) <= .05 ** 2
+
+    def _drawRect(self, frame, posX, posY, angle, length, width, colour):
+        # Fill the pixels inside a rectangle which starts at pos and extends length along angle
+        # - only the pixels in the bounding box of the rectangle are tested
+        cosA, sinA = np.cos(angle), np.sin(angle)
+        cornersX = posX + np.array([0, length, length, 0]) * cosA - np.array([-1, -1, 1, 1]) * width / 2 * sinA
+        cornersY = posY + np.array([0, length, length, 0]) * sinA + np.array([-1, -1, 1, 1]) * width / 2 * cosA
+        colStart = max(0, int(np.floor((cornersX.min() - self.left) / self.pixSizeX)))
+        colEnd = min(self.width, int(np.ceil((cornersX.max() - self.left) / self.pixSizeX)) + 1)
+        rowStart = max(0, int(np.floor((self.top - cornersY.max()) / self.pixSizeY)))
+        rowEnd = min(self.height, int(np.ceil((self.top - cornersY.min()) / self.pixSizeY)) + 1)
+        if colStart >= colEnd or rowStart >= rowEnd:
+            return
+        dx = self.pixX[np.newaxis, colStart:colEnd] - posX
+        dy = self.pixY[rowStart:rowEnd, np.newaxis] - posY
+        along = dx * cosA + dy * sinA
+        across = dy * cosA - dx * sinA
+        mask = (along >= 0) & (along <= length) & (np.abs(across) <= width / 2)
+        frame[rowStart:rowEnd, colStart:colEnd][mask] = colour
+
+    def _renderChunk(self, theta, kickAngle, frames):
+        # Positions of each part of Marty (as the transforms in MartySwingEnv.render())
+        ropeAngle = theta - np.pi/2
+        legAngle = theta - kickAngle - np.pi/2
+        martyTopX, martyTopY = np.cos(ropeAngle) * self.lenRope, np.sin(ropeAngle) * self.lenRope
+        legTopX, legTopY = martyTopX + np.cos(ropeAngle) * self.lenBody, martyTopY + np.sin(ropeAngle) * self.lenBody
+        legBottomX, legBottomY = legTopX + np.cos(legAngle) * self.lenLegTop, legTopY + np.sin(legAngle) * self.lenLegTop
+
+        # Draw in the same order as the viewer
+        frames[:] = self.colourBackground
+        frames[:, self.axleMask] = self.colourAxle
+        for i, frame in enumerate(frames):
+            self._drawRect(frame, 0, 0, ropeAngle[i], self.lenRope, .02, self.colourRope)
+            self._drawRect(frame, martyTopX[i], martyTopY[i], ropeAngle[i], self.lenBody, .5, self.colourBody)
+            self._drawRect(frame, legTopX[i], legTopY[i], legAngle[i], self.lenLegTop, .3, self.colourLeg)
+            self._drawRect(frame, legBottomX[i], legBottomY[i], ropeAngle[i], self.lenLegBottom, .3, self.colourLeg)
+
+    def renderFrames(self, theta, kickAngle):
+        # theta and kickAngle are arrays (or scalars) - returns an array of shape (T, H, W, 3)
+        theta, kickAngle = np.broadcast_arrays(np.atleast_1d(np.asarray(theta, dtype=np.float64)),
+                    np.atleast_1d(np.asarray(kickAngle, dtype=np.float64)))
+        frames = np.empty((len(theta), self.height, self.width, 3), dtype=np.uint8)
+        for start in range(0, len(theta), self.framesPerChunk):
+            end = start + self.framesPerChunk
+            self._renderChunk(theta[start:end], kickAngle[start:end], frames[start:end])
+        return frames
+
+    def renderFrame(self, theta, kickAngle):
+        return self.renderFrames(theta, kickAngle)[0]
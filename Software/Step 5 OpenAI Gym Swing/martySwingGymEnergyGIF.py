@@ -11,35 +11,39 @@ martyPumps = True
 # Create the MartySwing
 env = gym.make('MartySwing-v0')
 
-# First action is to remain straight-legged
-nextAction = 1
-
 # Reset the Gym
 env.dt = 0.03
 env.thetaInit = np.radians(40)
-observation = env.reset()
 
 # List of images for the GIF
 framesEnergy = []
-tim = []
-ke = []
-pe = []
 maxTime = 1.4
 if martyPumps:
     maxTime = 2.8
 
-# Go through a number of swings
-while(True):
-    # Take the next action
-    observation, reward, done, info = env.step(nextAction)
+# Select the action based on the position in the swing cycle
+def pumpPolicy(swingEnv):
+    if (swingEnv.theta < np.radians(10) and swingEnv.theta > np.radians(-10)) and swingEnv.kickAngle < 0.01:
+        # Kick if we are near the middle and haven't kicked already
+        return 0
+    elif (swingEnv.theta < np.radians(-35) or swingEnv.theta > np.radians(35)) and swingEnv.kickAngle > 0.01:
+        # Straighten if we are near the top of our swing and not straight-legged already
+        return 1
+    # Otherwise stay as we are (first action is to remain straight-legged)
+    return 0 if swingEnv.kickAngle > 0.01 else 1
+
+# Simulate the whole run and then render all of the images of marty swinging in one go
+trajectory, stats = env.rollout(pumpPolicy, int(maxTime / env.dt) + 1)
+martyFrames = env.renderFrames(trajectory["theta"], trajectory["kickAngle"])
 
-    # Render the image of marty swinging
-    martyImage = Image.fromarray(env.render(mode='rgb_array'))
+# Go through the swing
+for stepIdx in range(len(trajectory)):
+    martyImage = Image.fromarray(martyFrames[stepIdx])
 
-    # Add to data series
-    tim.append(info["t"])
-    pe.append(info["PE"])
-    ke.append(info["KE"]) 
+    # Data series up to this step
+    tim = trajectory["t"][:stepIdx+1]
+    ke = trajectory["KE"][:stepIdx+1]
+    pe = trajectory["PE"][:stepIdx+1]
 
     # Plot energy
     plt.clf()
@@ -74,22 +78,12 @@ while(True):
     # Add the combined image to a list
     framesEnergy.append(outImage)
 
-    # Select a new action based on the position in the swing cycle
-    if (info["theta"] < np.radians(10) and info["theta"] > np.radians(-10)) and info["kickAngle"] < 0.01:
-        # Kick if we are near the middle and haven't kicked already
-        nextAction = 0
-    elif (info["theta"] < np.radians(-35) or info["theta"] > np.radians(35)) and info["kickAngle"] > 0.01:
-        # Straighten if we are near the top of our swing and not straight-legged already
-        nextAction = 1
-
-    # Check if we completed this test
-    if info["t"] > maxTime and not done:
-        fileName = 'MartySwingEnergy.gif' if not martyPumps else 'MartySwingPumpEnergy.gif'
-        print("Saving GIF image as", fileName)
-        with open(fileName, 'wb') as outFile:
-            im = Image.new('RGB', framesEnergy[0].size)
-            im.save(outFile, save_all=True, append_images=framesEnergy)
-        break
+# Save the GIF
+fileName = 'MartySwingEnergy.gif' if not martyPumps else 'MartySwingPumpEnergy.gif'
+print("Saving GIF image as", fileName)
+with open(fileName, 'wb') as outFile:
+    im = Image.new('RGB', framesEnergy[0].size)
+    im.save(outFile, save_all=True, append_images=framesEnergy)
 
 # Close the swing environment
 env.close()
@@ -8,40 +8,31 @@ env = gym.make('MartySwing-v0')
 env.thetaInit = np.radians(40)
 env.dt = 0.005
 
-tim = []
-ke = []
-pe = []
-# th = []
-# rewardTotal = []
+# Render the swing before each step of a rollout
+def renderEachStep(policy):
+    def renderAndAct(swingEnv):
+        swingEnv.render()
+        return policy(swingEnv) if callable(policy) else policy
+    return renderAndAct
 
+# Run 5 secs of swinging straight-legged in one go
 nextAction = 1
-for i_episode in range(1):
-    observation = env.reset()
-    rewardSum = 0
-    while(True):
-        env.render()
-        # print(observation)
-        # action = env.action_space.sample()
-        observation, reward, done, info = env.step(nextAction)
-        tim.append(info["t"])
-        pe.append(info["PE"])
-        ke.append(info["KE"]) 
-        # th.append(info["theta"])
-        # rewardSum += reward / 50
-        # rewardTotal.append(rewardSum)
-        # print(np.degrees(info["theta"]), info["PE"])
-        # if (info["theta"] < np.radians(5) and info["theta"] > np.radians(-5)) and info["kickAngle"] < 0.01:
-        #     nextAction = 0
-        # elif (info["theta"] < np.radians(-29) or info["theta"] > np.radians(29)) and info["kickAngle"] > 0.01:
-        #     nextAction = 1
-        if info["t"] > 5 or done:
-            print("Episode finished after {} secs".format(info["t"]))
-            break
+trajectory, stats = env.rollout(renderEachStep(nextAction), int(5 / env.dt) + 1)
+print("Episode finished after {} secs".format(stats["t"]))
+
+# Alternatively pump the swing
+# def pumpPolicy(swingEnv):
+#     if (swingEnv.theta < np.radians(5) and swingEnv.theta > np.radians(-5)) and swingEnv.kickAngle < 0.01:
+#         return 0
+#     elif (swingEnv.theta < np.radians(-29) or swingEnv.theta > np.radians(29)) and swingEnv.kickAngle > 0.01:
+#         return 1
+#     return 0 if swingEnv.kickAngle > 0.01 else 1
+# trajectory, stats = env.rollout(renderEachStep(pumpPolicy), int(5 / env.dt) + 1)
             
 env.close()
 
-plt.plot(tim, ke, 'r')
-plt.plot(tim, pe, 'b')
-# plt.plot(tim, th, 'g')
-# plt.plot(tim, rewardTotal, 'p')
+plt.plot(trajectory["t"], trajectory["KE"], 'r')
+plt.plot(trajectory["t"], trajectory["PE"], 'b')
+# plt.plot(trajectory["t"], trajectory["theta"], 'g')
+# plt.plot(trajectory["t"], np.cumsum(trajectory["reward"]) / 50, 'p')
 plt.show()
@@ -3,3 +3,12 @@ register(
     id='MartySwing-v0',
     entry_point='gym_martyswing.envs:MartySwingEnv',
 )
+register(
+    id='MartySwingVec-v0',
+    entry_point='gym_martyswing.envs:MartySwingVecEnv',
+)
+
+# Create the MartySwing environment directly (without gym.make wrappers) and in fast mode
+def makeRaw(fastMode=True, **kwargs):
+    from gym_martyswing.envs import MartySwingEnv
+    return MartySwingEnv(fastMode=fastMode, **kwargs)
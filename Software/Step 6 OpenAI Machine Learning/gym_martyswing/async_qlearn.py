@@ -0,0 +1,146 @@
+import numpy as np
+import math, os, random, time
+import multiprocessing
+from multiprocessing import shared_memory
+import gym_martyswing
+from gym_martyswing.discretizer import ObservationDiscretizer
+from gym_martyswing.policy_cache import GreedyPolicyCache
+
+# Asynchronous (Hogwild style) Q-learning over worker processes
+#
+# The Q-table is in shared memory and each worker runs the learnToSwing() loop on its own
+# MartySwingEnv with its own exploration and learning rate schedule, updating the shared table
+# without any locking. The coordinator watches the total number of episodes and every
+# evalEpisodes episodes evaluates the greedy policy of the current table - the run is solved when
+# the greedy policy reaches the reward goal for more than streakLenWhenDone evaluations in a row.
+# A second small shared block holds the stop flag and each worker's episode count. The greedy
+# evaluations go through a GreedyPolicyCache (kept in cacheFile if given) so a greedy policy which
+# has been evaluated before isn't rolled out again
+class AsyncQLearner:
+
+    def __init__(self, numWorkers=None, xAccNumBins=9, obsWindowLen=3,
+                explorationRateMax=0.4, explorationRateMin=0.01, explorationRateDecayFactor=1,
+                learnRateMax=1, learnRateMin=0.1, learnRateDecayFactor=1, discountFactor=0.9,
+                episodeMax=500, timeMax=1000, streakLenWhenDone=20, rewardSumGoal=2500,
+                evalEpisodes=None, seed=None, envArgs=None, cacheFile=None):
+        self.numWorkers = numWorkers or os.cpu_count()
+        self.settings = {"xAccNumBins":xAccNumBins, "obsWindowLen":obsWindowLen,
+                "explorationRateMax":explorationRateMax, "explorationRateMin":explorationRateMin,
+                "explorationRateDecayFactor":explorationRateDecayFactor,
+                "learnRateMax":learnRateMax, "learnRateMin":learnRateMin, "learnRateDecayFactor":learnRateDecayFactor,
+                "discountFactor":discountFactor, "episodeMax":episodeMax, "timeMax":timeMax, "envArgs":envArgs or {}}
+        self.numStates = xAccNumBins * 2
+        self.numActions = 2
+        self.streakLenWhenDone = streakLenWhenDone
+        self.rewardSumGoal = rewardSumGoal
+        self.evalEpisodes = evalEpisodes or self.numWorkers
+        self.seed = seed
+        self.cacheFile = cacheFile
+
+    def train(self, verbose=True, pollInterval=0.005):
+        qShm = shared_memory.SharedMemory(create=True, size=self.numStates * self.numActions * 8)
+        statusShm = shared_memory.SharedMemory(create=True, size=(self.numWorkers + 1) * 8)
+        processes = []
+        try:
+            qTable = np.ndarray((self.numStates, self.numActions), dtype=np.float64, buffer=qShm.buf)
+            status = np.ndarray(self.numWorkers + 1, dtype=np.int64, buffer=statusShm.buf)
+            qTable[:] = 0
+            status[:] = 0
+            timeStart = time.time()
+            seeds = np.random.SeedSequence(self.seed).generate_state(self.numWorkers)
+            for workerIdx in range(self.numWorkers):
+                process = multiprocessing.Process(target=_worker, daemon=True,
+                            args=(qShm.name, statusShm.name, workerIdx, self.numWorkers, self.settings, int(seeds[workerIdx])))
+                process.start()
+                processes.append(process)
+
+            # Greedy evaluation and streak detection
+            greedyCache = GreedyPolicyCache(gym_martyswing.makeRaw(**self.settings["envArgs"]), self.settings["xAccNumBins"],
+                        self.settings["obsWindowLen"], self.settings["timeMax"], self.cacheFile)
+            rewardTotal = []
+            streaksNum = 0
+            solved = False
+            nextEval = self.evalEpisodes
+            while not solved:
+                time.sleep(pollInterval)
+                episodes = int(status[1:].sum())
+                running = any(process.is_alive() for process in processes)
+                if episodes < nextEval and running:
+                    continue
+                nextEval = episodes + self.evalEpisodes
+                episodeRewardSum, thetaMax = greedyCache.evaluate(qTable.copy())
+                rewardTotal.append(episodeRewardSum)
+                streaksNum = streaksNum + 1 if episodeRewardSum >= self.rewardSumGoal else 0
+                solved = streaksNum > self.streakLenWhenDone
+                if verbose and len(rewardTotal) % 50 == 0:
+                    print(f"Episodes {episodes} greedy episodeRewardSum {episodeRewardSum:.2f} thetaMax {thetaMax:.2f} streakLen {streaksNum}")
+                if not running:
+                    break
+
+            # Stop the workers
+            status[0] = 1
+            for process in processes:
+                process.join()
+            greedyCache.save()
+            return {"qTable":qTable.copy(), "solved":solved, "episodes":int(status[1:].sum()),
+                    "workerEpisodes":status[1:].copy(), "rewardTotal":rewardTotal, "time":time.time() - timeStart,
+                    "cacheHits":greedyCache.hits, "cacheMisses":greedyCache.misses}
+        finally:
+            for process in processes:
+                if process.is_alive():
+                    process.terminate()
+            qShm.close()
+            qShm.unlink()
+            statusShm.close()
+            statusShm.unlink()
+
+def _worker(qShmName, statusShmName, workerIdx, numWorkers, settings, seed):
+    qShm = shared_memory.SharedMemory(name=qShmName)
+    statusShm = shared_memory.SharedMemory(name=statusShmName)
+    qTable = None
+    status = None
+    try:
+        numStates = settings["xAccNumBins"] * 2
+        qTable = np.ndarray((numStates, 2), dtype=np.float64, buffer=qShm.buf)
+        status = np.ndarray(numWorkers + 1, dtype=np.int64, buffer=statusShm.buf)
+        _learn(qTable, status, workerIdx, settings, random.Random(seed))
+    finally:
+        # The views must be released before the shared memory can be closed
+        qTable = None
+        status = None
+        qShm.close()
+        statusShm.close()
+
+def _learn(qTable, status, workerIdx, settings, rng):
+    # The learnToSwing() loop on the shared table
+    env = gym_martyswing.makeRaw(**settings["envArgs"])
+    discretizer = ObservationDiscretizer(env.observation_space.low[0], env.observation_space.high[0],
+                settings["xAccNumBins"], settings["obsWindowLen"])
+    discountFactor = settings["discountFactor"]
+    timeMax = settings["timeMax"]
+    for episode in range(settings["episodeMax"]):
+        if status[0]:
+            break
+        explorationRate = max(settings["explorationRateMin"], settings["explorationRateMax"] * (1.0 - math.log10(episode/settings["explorationRateDecayFactor"]+1)))
+        learningRate = max(settings["learnRateMin"], settings["learnRateMax"] * (1.0 - math.log10(episode/settings["learnRateDecayFactor"]+1)))
+        observation = env.reset()
+        discretizer.reset()
+        statePrev = discretizer(observation[0])
+        rewardInState = 0
+        action = 0
+        for t in range(1, timeMax + 2):
+            observation, reward, done, _ = env.step(action)
+            state = discretizer(observation[0])
+            rewardInState += reward
+            if state != statePrev:
+                bestQ = qTable[state].max()
+                qTable[statePrev, action] += learningRate * (rewardInState + discountFactor * bestQ - qTable[statePrev, action])
+                if rng.random() < explorationRate:
+                    action = rng.randrange(2)
+                else:
+                    action = int(qTable[state].argmax())
+                rewardInState = 0
+            statePrev = state
+            if done:
+                break
+        status[workerIdx + 1] += 1
@@ -0,0 +1,68 @@
+import numpy as np
+import os, pickle, random
+
+# Checkpoints of Q-learning progress
+#
+# A checkpoint holds the Q-table, the next episode number, the current learning and exploration
+# rates, the streak count, the rewards so far and the states of the random number generators in a
+# single compressed npz file. The file is written to a temporary name and then renamed so an
+# interrupted write never leaves a broken checkpoint behind
+
+def _getGeneratorState(rng):
+    # numpy Generator or (older gym versions) RandomState
+    if hasattr(rng, "bit_generator"):
+        return rng.bit_generator.state
+    return rng.get_state()
+
+def _setGeneratorState(rng, state):
+    if hasattr(rng, "bit_generator"):
+        rng.bit_generator.state = state
+    else:
+        rng.set_state(state)
+
+def captureRngStates(env=None):
+    # States of python's random, numpy's global generator and the env's action space sampler
+    states = {"random":random.getstate(), "numpy":np.random.get_state()}
+    if env is not None:
+        states["actionSpace"] = _getGeneratorState(env.action_space.np_random)
+    return states
+
+def restoreRngStates(states, env=None):
+    random.setstate(states["random"])
+    np.random.set_state(states["numpy"])
+    if env is not None and "actionSpace" in states:
+        _setGeneratorState(env.action_space.np_random, states["actionSpace"])
+
+def saveCheckpoint(fileName, qTable, episode, learningRate, explorationRate, streaksNum, rewardTotal=(), rngStates=None):
+    rngBytes = np.frombuffer(pickle.dumps(rngStates), dtype=np.uint8)
+    dirName = os.path.dirname(fileName)
+    if dirName:
+        os.makedirs(dirName, exist_ok=True)
+    tmpFileName = fileName + ".tmp"
+    with open(tmpFileName, "wb") as checkpointFile:
+        np.savez_compressed(checkpointFile, qTable=qTable, episode=episode, learningRate=learningRate,
+                    explorationRate=explorationRate, streaksNum=streaksNum,
+                    rewardTotal=np.asarray(rewardTotal, dtype=np.float64), rngStates=rngBytes)
+        checkpointFile.flush()
+        os.fsync(checkpointFile.fileno())
+    os.replace(tmpFileName, fileName)
+
+def loadCheckpoint(fileName):
+    with np.load(fileName) as data:
+        checkpoint = {"qTable":data["qTable"].copy(), "episode":int(data["episode"]),
+                    "learningRate":float(data["learningRate"]), "explorationRate":float(data["explorationRate"]),
+                    "streaksNum":int(data["streaksNum"]), "rewardTotal":list(data["rewardTotal"])}
+        checkpoint["rngStates"] = pickle.loads(data["rngStates"].tobytes())
+    return checkpoint
+
+def loadWarmStartTable(fileName, shape):
+    # Q-table from a checkpoint (or a .npy file of the table) of another run - e.g. one with a
+    # different l2 - to start learning from rather than zeros
+    if fileName.endswith(".npy"):
+        qTable = np.load(fileName)
+    else:
+        with np.load(fileName) as data:
+            qTable = data["qTable"].copy()
+    if qTable.shape != tuple(shape):
+        raise ValueError(f"Warm start Q-table in {fileName} has shape {qTable.shape} but {tuple(shape)} is needed")
+    return qTable
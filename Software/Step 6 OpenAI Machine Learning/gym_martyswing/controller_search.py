@@ -0,0 +1,37 @@
+import numpy as np
+from gym_martyswing.envs.martyswing_vec_env import MartySwingVecEnv
+from gym_martyswing.controllers import ThresholdController
+
+# Result format for each combination of controller thresholds and starting angle
+SEARCH_DTYPE = np.dtype([("kickWindowDeg", np.float64), ("straightenAngleDeg", np.float64), ("thetaInitDeg", np.float64),
+            ("reward", np.float64), ("thetaMax", np.float64), ("t", np.float64), ("done", np.bool_)])
+
+def searchThresholdControllers(kickWindowsDeg, straightenAnglesDeg, thetaInitsDeg, dt=0.05, maxSteps=2000, **envArgs):
+    # Every combination of kick window, straighten angle and starting angle is simulated as one
+    # swing in a MartySwingVecEnv - the thresholds become arrays so the controller rules are
+    # evaluated as masks over all of the swings. Returns the results ranked by episode reward
+    kickWindowsDeg, straightenAnglesDeg, thetaInitsDeg = [grid.ravel() for grid in
+                np.meshgrid(kickWindowsDeg, straightenAnglesDeg, thetaInitsDeg, indexing='ij')]
+    numEnvs = len(kickWindowsDeg)
+    env = MartySwingVecEnv(numEnvs, **envArgs)
+    env.dt = dt
+    env.thetaInit = np.radians(thetaInitsDeg)
+    env.reset()
+    controller = ThresholdController(kickWindowsDeg, straightenAnglesDeg, actionKick=env.ACTION_KICK)
+
+    # Run one episode of each swing - swings are auto-reset when done so results after that are ignored
+    results = np.zeros(numEnvs, dtype=SEARCH_DTYPE)
+    results["kickWindowDeg"] = kickWindowsDeg
+    results["straightenAngleDeg"] = straightenAnglesDeg
+    results["thetaInitDeg"] = thetaInitsDeg
+    running = np.ones(numEnvs, dtype=bool)
+    for i in range(maxSteps):
+        obs, reward, done, info = env.step(controller.batchActions(env))
+        results["reward"] += np.where(running, reward, 0)
+        results["thetaMax"] = np.where(running, info["thetaMax"], results["thetaMax"])
+        results["t"] = np.where(running, info["t"], results["t"])
+        results["done"] |= running & done
+        running &= ~done
+        if not running.any():
+            break
+    return np.sort(results, order="reward")[::-1]
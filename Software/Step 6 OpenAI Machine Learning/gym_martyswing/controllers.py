@@ -0,0 +1,30 @@
+import numpy as np
+
+# Rule-based controller - kick when the swing is near the bottom and straighten when it is near
+# the top. Instances can be passed as the policy to MartySwingEnv.rollout() and can be pickled
+# for use in worker processes
+class ThresholdController:
+
+    def __init__(self, kickWindowDeg=5, straightenAngleDeg=29, actionKick=1):
+        self.kickWindow = np.radians(kickWindowDeg)
+        self.straightenAngle = np.radians(straightenAngleDeg)
+        self.actionKick = actionKick
+        self.actionStraight = 1 - actionKick
+
+    def __call__(self, env):
+        if abs(env.theta) < self.kickWindow and env.kickAngle < 0.01:
+            # Kick if we are near the middle and haven't kicked already
+            return self.actionKick
+        elif abs(env.theta) > self.straightenAngle and env.kickAngle > 0.01:
+            # Straighten if we are near the top of our swing and not straight-legged already
+            return self.actionStraight
+        # Otherwise stay as we are
+        return self.actionKick if env.kickAngle > 0.01 else self.actionStraight
+
+    def batchActions(self, env):
+        # Same rules applied to all the swings in a MartySwingVecEnv at once - the thresholds
+        # can also be arrays with a value for each swing
+        kicked = env.kickAngle > 0.01
+        kickNow = (np.abs(env.theta) < self.kickWindow) & ~kicked
+        straightenNow = (np.abs(env.theta) > self.straightenAngle) & kicked
+        return np.where(kickNow | (kicked & ~straightenNow), self.actionKick, self.actionStraight)
@@ -0,0 +1,146 @@
+import numpy as np
+import math
+
+# Discrete states for Q-learning from the xAcc observation
+#
+# The observation is put into one of numBins bins which are uniform between low and high (as
+# np.digitize() with np.linspace(low, high, numBins-1) bounds) and the direction of swing is
+# sensed from a moving sum of the last windowLen observations. While the moving sum isn't
+# decreasing the state is the bin number, otherwise it is counted down from numBins*2-1 so that
+# there are numBins*2 states in all. The moving sum changes by the new observation less the one
+# which drops out of the window so only the oldest observation needs to be compared
+class ObservationDiscretizer:
+    __slots__ = ["low", "numBins", "windowLen", "binScale", "window", "windowPos", "started"]
+
+    def __init__(self, low, high, numBins=9, windowLen=3):
+        self.low = float(low)
+        self.numBins = numBins
+        self.windowLen = windowLen
+        self.binScale = (numBins - 2) / (float(high) - self.low)
+        self.window = [0.0] * windowLen
+        self.windowPos = 0
+        self.started = False
+
+    @property
+    def numStates(self):
+        return self.numBins * 2
+
+    @property
+    def binBounds(self):
+        return np.linspace(self.low, self.low + (self.numBins - 2) / self.binScale, self.numBins - 1)
+
+    def reset(self):
+        # Call at the start of each episode - the next observation refills the window
+        self.started = False
+
+    @property
+    def smoothed(self):
+        # Moving average of the observations in the window
+        return sum(self.window) / self.windowLen
+
+    def getBin(self, val):
+        binIdx = math.floor((val - self.low) * self.binScale) + 1
+        return 0 if binIdx < 0 else (self.numBins - 1 if binIdx >= self.numBins else binIdx)
+
+    def __call__(self, val):
+        # Returns the discrete state for a new observation
+        if not self.started:
+            self.window = [val] * self.windowLen
+            self.started = True
+        increasing = val >= self.window[self.windowPos]
+        self.window[self.windowPos] = val
+        self.windowPos = (self.windowPos + 1) % self.windowLen
+        binIdx = self.getBin(val)
+        return binIdx if increasing else self.numBins * 2 - 1 - binIdx
+
+    # Q-table access - with a single grid the table has a row (tile) for each state
+    @property
+    def numTiles(self):
+        return self.numStates
+
+    def getQ(self, qTable, state):
+        return qTable[state]
+
+    def update(self, qTable, state, action, delta):
+        qTable[state, action] += delta
+
+    def getQTable(self, qTable):
+        return qTable
+
+# Tile coding - numTilings grids of numBins bins, each offset from the last by 1/numTilings of a
+# bin (the first is the grid of ObservationDiscretizer). The state is the bin of the fine grid
+# formed by all the bounds together (numTilings*(numBins-1)+1 bins in each direction) and each
+# fine state is in one tile of every tiling. The table passed to getQ() and update() has a row for
+# each tile and Q is the sum over the state's tiles, so what is learnt in one state is shared with
+# its neighbours in the coarse tiles while the fine states still give distinct Q values
+class TileCodingDiscretizer(ObservationDiscretizer):
+    __slots__ = ["numTilings", "tileBins", "tilesForState"]
+
+    def __init__(self, low, high, numBins=9, windowLen=3, numTilings=4):
+        fineWidth = (float(high) - float(low)) / (numBins - 2) / numTilings
+        fineLow = float(low) - (numTilings - 1) * fineWidth
+        numFineBins = numTilings * (numBins - 1) + 1
+        super().__init__(fineLow, fineLow + (numFineBins - 2) * fineWidth, numFineBins, windowLen)
+        self.numTilings = numTilings
+        self.tileBins = numBins
+
+        # Bin of tiling k for fine bin f is floor((f - numTilings + k) / numTilings) + 1 - tiles
+        # are numbered by tiling then state within the tiling (in the same way as the states)
+        fineBins = np.arange(numFineBins)[:, np.newaxis]
+        tilings = np.arange(numTilings)
+        tileBinIdxs = np.clip((fineBins - numTilings + tilings) // numTilings + 1, 0, numBins - 1)
+        increasingTiles = tilings * numBins * 2 + tileBinIdxs
+        decreasingTiles = tilings * numBins * 2 + numBins * 2 - 1 - tileBinIdxs
+        self.tilesForState = np.concatenate((increasingTiles, decreasingTiles[::-1]))
+
+    @property
+    def numTiles(self):
+        return self.numTilings * self.tileBins * 2
+
+    def getQ(self, qTable, state):
+        return qTable[self.tilesForState[state]].sum(axis=0)
+
+    def update(self, qTable, state, action, delta):
+        # The change is shared between the tiles
+        qTable[self.tilesForState[state], action] += delta / self.numTilings
+
+    def getQTable(self, qTable):
+        # Q for every fine state - shape (numStates, numActions) as for a single grid
+        return qTable[self.tilesForState].sum(axis=1)
+
+# Batched form of ObservationDiscretizer for a vector of envs - the windows are held in an
+# array of shape (numEnvs, windowLen) and all envs share the position in the window
+class BatchObservationDiscretizer:
+
+    def __init__(self, numEnvs, low, high, numBins=9, windowLen=3):
+        self.numEnvs = numEnvs
+        self.low = float(low)
+        self.numBins = numBins
+        self.windowLen = windowLen
+        self.numStates = numBins * 2
+        self.binScale = (numBins - 2) / (float(high) - self.low)
+        self.window = np.zeros((numEnvs, windowLen))
+        self.windowPos = 0
+
+    def reset(self, vals, mask=None):
+        # Start the episodes of the envs in mask (or all envs) with the first observations
+        # vals - returns the states for these (other envs' states are returned as -1)
+        if mask is None:
+            mask = np.ones(self.numEnvs, dtype=bool)
+        self.window[mask] = vals[mask, np.newaxis]
+        return np.where(mask, self.getBin(vals), -1)
+
+    @property
+    def smoothed(self):
+        return self.window.mean(axis=1)
+
+    def getBin(self, vals):
+        binIdxs = np.floor((vals - self.low) * self.binScale).astype(np.int64) + 1
+        return np.clip(binIdxs, 0, self.numBins - 1)
+
+    def __call__(self, vals):
+        increasing = vals >= self.window[:, self.windowPos]
+        self.window[:, self.windowPos] = vals
+        self.windowPos = (self.windowPos + 1) % self.windowLen
+        binIdxs = self.getBin(vals)
+        return np.where(increasing, binIdxs, self.numBins * 2 - 1 - binIdxs)
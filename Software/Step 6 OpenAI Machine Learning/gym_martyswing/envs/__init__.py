@@ -1 +1,4 @@
 from gym_martyswing.envs.martyswing_env import MartySwingEnv
+from gym_martyswing.envs.martyswing_vec_env import MartySwingVecEnv
+from gym_martyswing.envs.martyswing_raster import SwingRasterizer
+from gym_martyswing.envs.martyswing_subproc_vec_env import MartySwingSubprocVecEnv
@@ -2,8 +2,21 @@ import gym
 from gym import error, spaces, utils
 from gym.utils import seeding
 import numpy as np
+import math
+import json
+import os
 from os import path
-from gym.envs.classic_control import rendering
+from gym_martyswing.envs.martyswing_raster import SwingRasterizer
+
+# Rendering uses pyglet and OpenGL which are only loaded on the first call to render() so the
+# env can be imported and used on machines without a display. Setting MARTYSWING_HEADLESS=1
+# makes render() in 'human' mode do nothing so scripts which render can also be run headless,
+# and makes render() in 'rgb_array' mode use the software rasterizer rather than OpenGL
+HEADLESS = os.environ.get("MARTYSWING_HEADLESS", "0") == "1"
+
+# Record format for each step of a rollout
+ROLLOUT_DTYPE = np.dtype([("t", np.float64), ("theta", np.float64), ("v", np.float64), ("l", np.float64),
+            ("kickAngle", np.float64), ("PE", np.float64), ("KE", np.float64), ("reward", np.float64)])
 
 class MartySwingEnv(gym.Env):
     metadata = {
@@ -11,7 +24,14 @@ class MartySwingEnv(gym.Env):
         'video.frames_per_second' : 30
     }
 
-    def __init__(self, g=9.81, l1=0.45, l2=0.42, m=0.3, thetaInitDeg=30, vInitial=0):
+    def __init__(self, g=9.81, l1=0.45, l2=0.42, m=0.3, thetaInitDeg=30, vInitial=0, fastMode=False,
+                integrator='euler', exactPeaks=False, damping=0):
+        # Fast mode reuses a single observation array (so callers must copy it to keep it)
+        # and step() returns an empty info dict - use getInfo() to get the info when needed
+        self.fastMode = fastMode
+        self._obsBuffer = np.zeros(1)
+        self._emptyInfo = {}
+
         # Marty mass
         self.m = m
 
@@ -19,6 +39,19 @@ class MartySwingEnv(gym.Env):
         self.dt = .05
         self.g = g
 
+        # Damping (deceleration per unit of tangential velocity) - zero for an ideal swing
+        self.damping = damping
+
+        # Integrator for the swing physics - 'euler' (the original semi-implicit Euler),
+        # 'leapfrog' (symplectic and second order) or 'rk4' (with adaptive sub-steps)
+        self.integrator = integrator
+        self.rk4Tolerance = 1e-7
+        self.rk4MaxDepth = 6
+
+        # Interpolate the exact time and angle of each change of direction within a step
+        # rather than using the angle at the end of the step
+        self.exactPeaks = exactPeaks
+
         # Equivalent length when extended and kicked (initially extended)
         self.l1 = l1
         self.l2 = l2
@@ -38,6 +71,9 @@ class MartySwingEnv(gym.Env):
 
         # Viewer
         self.viewer = None
+        self.headless = HEADLESS
+        self.rasterizer = None
+        self.useRasterizer = HEADLESS
         self.lenRope = 1
         self.lenBody = 0.7
         self.lenLegTop = 0.4
@@ -64,20 +100,24 @@ class MartySwingEnv(gym.Env):
         self.t = 0
 
         # Angles
-        self.theta = self.thetaInit
+        self.theta = float(self.thetaInit)
         self.thetaMax = self.theta
         self.kickAngle = self.kickAngleStright
+        self.l = self.l1
 
         # Tangential velocity
         self.v = self.vInitial
+        self.kineticE = self.calcKineticEnergy(self.v)
+        self.potentialE = self.calcPotentialEnergy(self.theta)
 
         # Rewards and completion
         self.thetaPeakCount = 0
+        self.tPeakLast = 0
 
         return self._get_obs()
 
     def calcPotentialEnergy(self, theta):
-        return self.m * self.g * (self.l1 - np.cos(theta) * self.l)
+        return self.m * self.g * (self.l1 - math.cos(theta) * self.l)
 
     def calcKineticEnergy(self, v):
         return 0.5 * self.m * v * v
@@ -86,7 +126,47 @@ class MartySwingEnv(gym.Env):
         self.np_random, seed = seeding.np_random(seed)
         return [seed]
 
+    def loadParams(self, fileName):
+        # Load physical parameters (e.g. fitted to recorded swing data) from a JSON file - any of
+        # g, l1, l2, m, damping and dt which are in the file are used
+        with open(fileName, "r") as paramsFile:
+            params = json.load(paramsFile)
+        for key in ["g", "l1", "l2", "m", "damping", "dt"]:
+            if key in params:
+                setattr(self, key, params[key])
+        self.basePotentialE = self.l1 * self.m * self.g
+        self.reset()
+        return params
+
+    def getState(self, includeRng=True):
+        # Snapshot of the dynamic state of the swing which can be restored with setState()
+        rngState = None
+        if includeRng:
+            rngState = self.np_random.get_state() if hasattr(self.np_random, "get_state") else self.np_random.bit_generator.state
+        return (self.t, self.theta, self.v, self.l, self.kickAngle, self.thetaMax, self.thetaPeakCount,
+                    self.tPeakLast, self.kineticE, self.potentialE, rngState)
+
+    def setState(self, state):
+        (self.t, self.theta, self.v, self.l, self.kickAngle, self.thetaMax, self.thetaPeakCount,
+                    self.tPeakLast, self.kineticE, self.potentialE, rngState) = state
+        if rngState is not None:
+            if hasattr(self.np_random, "set_state"):
+                self.np_random.set_state(rngState)
+            else:
+                self.np_random.bit_generator.state = rngState
+
     def step(self, act):
+        if self.fastMode and self.integrator == 'euler' and not self.exactPeaks:
+            return self._fastEulerStep(act)
+        reward, done = self._advance(act)
+        if self.fastMode:
+            return self._get_obs(), reward, done, self._emptyInfo
+        return self._get_obs(), reward, done, self.getInfo()
+
+    def getInfo(self):
+        return {"t":self.t, "PE":self.potentialE, "KE":self.kineticE, "v":self.v, "l":self.l, "theta":self.theta, "kickAngle":self.kickAngle, "thetaMax":self.thetaMax}
+
+    def _advance(self, act):
         # Immediate implementation of action
         reward = 0
         if act == self.ACTION_KICK:
@@ -102,14 +182,21 @@ class MartySwingEnv(gym.Env):
                 self.kickAngle = self.kickAngleStright
                 # reward -= 0.03
 
-        # Update tangential velocity based on acceleration
-        tangentialAcc = self.g * np.sin(self.theta)
-        newV = self.v - tangentialAcc * self.dt
-
-        # Calculate arc-angle traversed at current v in time dt
-        arcLen = newV * self.dt
-        thetaDiff = arcLen / self.l
-        newTheta = self.theta + thetaDiff
+        if self.integrator == 'euler':
+            # Update tangential velocity based on acceleration
+            tangentialAcc = self.g * math.sin(self.theta) + self.damping * self.v
+            newV = self.v - tangentialAcc * self.dt
+
+            # Calculate arc-angle traversed at current v in time dt
+            arcLen = newV * self.dt
+            thetaDiff = arcLen / self.l
+            newTheta = self.theta + thetaDiff
+        elif self.integrator == 'leapfrog':
+            newTheta, newV = self._leapfrogStep(self.theta, self.v, self.dt)
+        elif self.integrator == 'rk4':
+            newTheta, newV = self._rk4Adaptive(self.theta, self.v, self.dt, 0)
+        else:
+            raise ValueError(f"Unknown integrator {self.integrator}")
 
         # Check for change of direction
         done = False
@@ -117,11 +204,14 @@ class MartySwingEnv(gym.Env):
             self.thetaPeakCount += 1
             if self.thetaPeakCount > 10:
                 done = True
-            # reward += (abs(newTheta) - self.thetaMax) * 1000
-            if self.thetaMax < abs(newTheta):
-                # reward += (abs(newTheta) - self.thetaMax) * 1000
-                reward += abs(newTheta) * 1000
-                self.thetaMax = abs(newTheta)
+            peakTheta = newTheta
+            if self.exactPeaks:
+                peakTheta = self._interpolatePeak(newTheta, newV)
+            # reward += (abs(peakTheta) - self.thetaMax) * 1000
+            if self.thetaMax < abs(peakTheta):
+                # reward += (abs(peakTheta) - self.thetaMax) * 1000
+                reward += abs(peakTheta) * 1000
+                self.thetaMax = abs(peakTheta)
             # else:
             #     reward += (abs(newTheta) - self.thetaMax) * 10
             # reward += abs(newTheta) * 10
@@ -138,18 +228,133 @@ class MartySwingEnv(gym.Env):
         self.potentialE = newPotentialE
         self.theta = newTheta
         self.t += self.dt
-        return self._get_obs(), reward, done, {"t":self.t, "PE":self.potentialE, "KE":self.kineticE, "v":self.v, "l":self.l, "theta":self.theta, "kickAngle":self.kickAngle, "thetaMax":self.thetaMax}
+        return reward, done
+
+    def _fastEulerStep(self, act):
+        # Fast mode step with the default euler integrator - the same sums as _advance() and
+        # _get_obs() (so the trajectory is identical) but with the attributes read into locals
+        # once and without the method calls, which are most of the cost of a step
+        if act == self.ACTION_KICK:
+            if self.kickAngle != self.kickAngleKicked:
+                self.l = self.l2
+                self.kickAngle = self.kickAngleKicked
+        elif self.kickAngle != self.kickAngleStright:
+            self.l = self.l1
+            self.kickAngle = self.kickAngleStright
+        g, m, dt, l, v = self.g, self.m, self.dt, self.l, self.v
+        newV = v - (g * math.sin(self.theta) + self.damping * v) * dt
+        newTheta = self.theta + newV * dt / l
+
+        # Check for change of direction
+        reward = 0
+        done = False
+        if (newV > 0) != (v > 0):
+            self.thetaPeakCount += 1
+            done = self.thetaPeakCount > 10
+            if self.thetaMax < abs(newTheta):
+                reward += abs(newTheta) * 1000
+                self.thetaMax = abs(newTheta)
+
+        # Update the state
+        sinTheta = math.sin(newTheta)
+        self.potentialE = m * g * (self.l1 - math.cos(newTheta) * l)
+        self.kineticE = 0.5 * m * newV * newV
+        self.v = newV
+        self.theta = newTheta
+        self.t += dt
+        obs = self._obsBuffer
+        obs[0] = - g * sinTheta
+        return obs, reward, done, self._emptyInfo
+
+    def _leapfrogStep(self, theta, v, dt):
+        # Velocity Verlet - half step of velocity, full step of angle, half step of velocity
+        vHalf = v - (self.g * math.sin(theta) + self.damping * v) * dt / 2
+        newTheta = theta + vHalf * dt / self.l
+        return newTheta, vHalf - (self.g * math.sin(newTheta) + self.damping * vHalf) * dt / 2
+
+    def _rk4Step(self, theta, v, dt):
+        # Classic 4th order Runge-Kutta on dtheta/dt = v/l, dv/dt = -g.sin(theta) - damping.v
+        g, l, c = self.g, self.l, self.damping
+        k1t, k1v = v / l, -g * math.sin(theta) - c * v
+        k2t, k2v = (v + k1v * dt / 2) / l, -g * math.sin(theta + k1t * dt / 2) - c * (v + k1v * dt / 2)
+        k3t, k3v = (v + k2v * dt / 2) / l, -g * math.sin(theta + k2t * dt / 2) - c * (v + k2v * dt / 2)
+        k4t, k4v = (v + k3v * dt) / l, -g * math.sin(theta + k3t * dt) - c * (v + k3v * dt)
+        return (theta + (k1t + 2 * k2t + 2 * k3t + k4t) * dt / 6,
+                v + (k1v + 2 * k2v + 2 * k3v + k4v) * dt / 6)
+
+    def _rk4Adaptive(self, theta, v, dt, depth):
+        # Step doubling - compare one full step with two half steps and subdivide
+        # further if the difference is larger than the tolerance
+        fullTheta, fullV = self._rk4Step(theta, v, dt)
+        halfTheta, halfV = self._rk4Step(theta, v, dt / 2)
+        twoHalfTheta, twoHalfV = self._rk4Step(halfTheta, halfV, dt / 2)
+        err = max(abs(twoHalfTheta - fullTheta), abs(twoHalfV - fullV) / self.l)
+        if err <= self.rk4Tolerance or depth >= self.rk4MaxDepth:
+            return twoHalfTheta, twoHalfV
+        halfTheta, halfV = self._rk4Adaptive(theta, v, dt / 2, depth + 1)
+        return self._rk4Adaptive(halfTheta, halfV, dt / 2, depth + 1)
+
+    def _interpolatePeak(self, newTheta, newV):
+        # Cubic Hermite interpolation across the step (using the derivatives at each end)
+        # to find the fraction of the step at which v is zero and the angle at that time
+        dt, l = self.dt, self.l
+        v0, v1 = self.v, newV
+        a0 = -(self.g * math.sin(self.theta) + self.damping * v0) * dt
+        a1 = -(self.g * math.sin(newTheta) + self.damping * v1) * dt
+        frac = v0 / (v0 - v1)
+        for i in range(4):
+            s2, s3 = frac * frac, frac * frac * frac
+            vAtFrac = (2*s3 - 3*s2 + 1) * v0 + (s3 - 2*s2 + frac) * a0 + (-2*s3 + 3*s2) * v1 + (s3 - s2) * a1
+            dvAtFrac = (6*s2 - 6*frac) * v0 + (3*s2 - 4*frac + 1) * a0 + (-6*s2 + 6*frac) * v1 + (3*s2 - 2*frac) * a1
+            if dvAtFrac == 0:
+                break
+            frac = min(1.0, max(0.0, frac - vAtFrac / dvAtFrac))
+        s2, s3 = frac * frac, frac * frac * frac
+        self.tPeakLast = self.t + frac * dt
+        return (2*s3 - 3*s2 + 1) * self.theta + (s3 - 2*s2 + frac) * v0 * dt / l + (-2*s3 + 3*s2) * newTheta + (s3 - s2) * v1 * dt / l
+
+    def rollout(self, policy, maxSteps):
+        # Run a whole episode from reset without building per-step observations and info
+        # policy is either a fixed action or a function called with this env (so it can
+        # use t, theta, v, kickAngle, etc) which returns the action for the next step
+        # Returns the trajectory as a structured array and a dict of summary stats
+        trajectory = np.zeros(maxSteps, dtype=ROLLOUT_DTYPE)
+        self.reset()
+        fixedAction = not callable(policy)
+        act = policy
+        rewardSum = 0
+        done = False
+        steps = 0
+        while steps < maxSteps and not done:
+            if not fixedAction:
+                act = policy(self)
+            reward, done = self._advance(act)
+            rewardSum += reward
+            trajectory[steps] = (self.t, self.theta, self.v, self.l, self.kickAngle, self.potentialE, self.kineticE, reward)
+            steps += 1
+        stats = {"steps":steps, "t":self.t, "rewardSum":rewardSum, "thetaMax":self.thetaMax, "thetaPeakCount":self.thetaPeakCount, "done":done}
+        return trajectory[:steps], stats
 
     def _get_obs(self):
-        xAcc = - self.g * np.sin(self.theta)
+        xAcc = - self.g * math.sin(self.theta)
+        if self.fastMode:
+            self._obsBuffer[0] = xAcc
+            return self._obsBuffer
         return np.array([xAcc])
 
     def makeRect(self, length, width):
+        from gym.envs.classic_control import rendering
         l, r, t, b = 0, length, width/2, -width/2
         return rendering.make_polygon([(l,b), (l,t), (r,t), (r,b)])
 
     def render(self, mode='human'):
 
+        if self.headless and mode == 'human':
+            return None
+        if self.useRasterizer and mode == 'rgb_array':
+            return self.renderFrames(self.theta, self.kickAngle)[0]
+
+        from gym.envs.classic_control import rendering
         if self.viewer is None:
 
             # First time through we create the scene 
@@ -206,6 +411,13 @@ class MartySwingEnv(gym.Env):
         # Render
         return self.viewer.render(return_rgb_array = mode=='rgb_array')
 
+    def renderFrames(self, theta, kickAngle):
+        # Software render of one or more swing states to an array of shape (T, H, W, 3)
+        if self.rasterizer is None:
+            self.rasterizer = SwingRasterizer(lenRope=self.lenRope, lenBody=self.lenBody,
+                        lenLegTop=self.lenLegTop, lenLegBottom=self.lenLegBottom)
+        return self.rasterizer.renderFrames(theta, kickAngle)
+
     def close(self):
         if self.viewer:
             self.viewer.close()
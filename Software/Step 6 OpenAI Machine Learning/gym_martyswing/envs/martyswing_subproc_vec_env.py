@@ -0,0 +1,166 @@
+import gym
+import numpy as np
+import multiprocessing
+import pickle
+import traceback
+
+# Info values which are passed back from the workers (as returned by MartySwingEnv.step())
+INFO_KEYS = ["t", "PE", "KE", "v", "l", "theta", "kickAngle", "thetaMax"]
+
+def makeDefaultEnv():
+    return gym.make('MartySwing-v0')
+
+def _sharedArray(shape, dtype):
+    # Shared memory block which the parent and workers view as a numpy array
+    dtype = np.dtype(dtype)
+    return multiprocessing.RawArray('b', max(1, int(np.prod(shape)) * dtype.itemsize)), shape, dtype
+
+def _arrayView(shared):
+    rawArray, shape, dtype = shared
+    return np.frombuffer(rawArray, dtype=dtype, count=int(np.prod(shape))).reshape(shape)
+
+def _errorReply(error):
+    # Exceptions are sent to the parent with the worker's traceback (as a RuntimeError if the
+    # exception itself can't be pickled)
+    try:
+        pickle.dumps(error)
+    except Exception:
+        error = RuntimeError(repr(error))
+    return ("error", (error, traceback.format_exc()))
+
+def _worker(pipe, makeEnv, envIdx, sharedObs, sharedReward, sharedDone, sharedInfo, sharedFrames):
+    obsBuf, rewardBuf, doneBuf, infoBuf = [_arrayView(shared) for shared in [sharedObs, sharedReward, sharedDone, sharedInfo]]
+    framesBuf = _arrayView(sharedFrames) if sharedFrames is not None else None
+
+    # If the env can't be made the error is the reply to every command other than close
+    env = None
+    try:
+        env = makeEnv()
+    except Exception as error:
+        startReply = _errorReply(error)
+
+    while True:
+        cmd, data = pipe.recv()
+        if env is None:
+            if cmd == "close":
+                pipe.send(("ok", None))
+                break
+            pipe.send(startReply)
+            continue
+        try:
+            if cmd == "step":
+                obs, reward, done, info = env.step(data)
+                infoBuf[envIdx] = [info.get(key, np.nan) for key in INFO_KEYS]
+                if done:
+                    obs = env.reset()
+                obsBuf[envIdx] = np.ravel(obs)
+                rewardBuf[envIdx] = reward
+                doneBuf[envIdx] = done
+            elif cmd == "reset":
+                obsBuf[envIdx] = np.ravel(env.reset())
+            elif cmd == "render":
+                framesBuf[envIdx] = env.render(mode='rgb_array')
+            elif cmd == "setattr":
+                setattr(env.unwrapped, data[0], data[1])
+            elif cmd == "close":
+                env.close()
+        except Exception as error:
+            pipe.send(_errorReply(error))
+        else:
+            pipe.send(("ok", None))
+        if cmd == "close":
+            break
+
+# Vector of MartySwing envs (or any env with the same observation and info) each running in its
+# own worker process. Each env is created in its worker by a picklable function so it can be
+# wrapped or be a custom variant. Only a short command goes through the pipe to each worker -
+# observations, rewards, dones, info values and rendered frames are written by the workers into
+# shared memory, so the cost of a step doesn't grow with the size of the data
+class MartySwingSubprocVecEnv:
+
+    def __init__(self, makeEnvs, frameShape=None):
+        # makeEnvs is a list of functions which create the envs (or a count of default envs)
+        # frameShape (e.g. (500, 500, 3)) is needed to use render()
+        if isinstance(makeEnvs, int):
+            makeEnvs = [makeDefaultEnv] * makeEnvs
+        self.numEnvs = len(makeEnvs)
+        self.closed = False
+
+        # Spaces of the individual envs
+        env = makeEnvs[0]()
+        self.action_space = env.action_space
+        self.observation_space = env.observation_space
+        obsSize = int(np.prod(env.observation_space.shape))
+        env.close()
+
+        # Shared memory for results from the workers
+        sharedObs = _sharedArray((self.numEnvs, obsSize), np.float64)
+        sharedReward = _sharedArray((self.numEnvs,), np.float64)
+        sharedDone = _sharedArray((self.numEnvs,), np.bool_)
+        sharedInfo = _sharedArray((self.numEnvs, len(INFO_KEYS)), np.float64)
+        sharedFrames = _sharedArray((self.numEnvs,) + tuple(frameShape), np.uint8) if frameShape is not None else None
+        self.obsBuf, self.rewardBuf, self.doneBuf, self.infoBuf = [_arrayView(shared) for shared in [sharedObs, sharedReward, sharedDone, sharedInfo]]
+        self.framesBuf = _arrayView(sharedFrames) if sharedFrames is not None else None
+
+        # Start the workers
+        self.pipes = []
+        self.processes = []
+        for envIdx, makeEnv in enumerate(makeEnvs):
+            parentPipe, workerPipe = multiprocessing.Pipe()
+            process = multiprocessing.Process(target=_worker, daemon=True,
+                        args=(workerPipe, makeEnv, envIdx, sharedObs, sharedReward, sharedDone, sharedInfo, sharedFrames))
+            process.start()
+            workerPipe.close()
+            self.pipes.append(parentPipe)
+            self.processes.append(process)
+
+    def _command(self, cmd, data=None):
+        for pipe in self.pipes:
+            pipe.send((cmd, data))
+        self._receive()
+
+    def _receive(self):
+        # Every worker's reply is read (so the pipes stay in step) and then the first error from
+        # a worker is raised here with the worker's traceback as its cause
+        errors = []
+        for envIdx, pipe in enumerate(self.pipes):
+            status, data = pipe.recv()
+            if status == "error":
+                errors.append((envIdx, data))
+        if errors:
+            envIdx, (error, workerTraceback) = errors[0]
+            raise error from RuntimeError(f"in MartySwingSubprocVecEnv worker {envIdx}\n{workerTraceback}")
+
+    def reset(self):
+        self._command("reset")
+        return self.obsBuf.copy()
+
+    def step(self, acts):
+        # Envs which are done are reset and the observation returned is from the reset
+        for pipe, act in zip(self.pipes, acts):
+            pipe.send(("step", int(act)))
+        self._receive()
+        info = {key:self.infoBuf[:, i].copy() for i, key in enumerate(INFO_KEYS)}
+        return self.obsBuf.copy(), self.rewardBuf.copy(), self.doneBuf.copy(), info
+
+    def render(self, mode='rgb_array'):
+        # Returns the frames of all envs in a (numEnvs, H, W, 3) array - this is the shared
+        # buffer itself so it is overwritten by the next call
+        if self.framesBuf is None:
+            raise ValueError("render() needs frameShape to be given when the MartySwingSubprocVecEnv is created")
+        self._command("render")
+        return self.framesBuf
+
+    def setAttr(self, name, value):
+        # Set an attribute (e.g. dt or thetaInit) on every env
+        self._command("setattr", (name, value))
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            self._command("close")
+        finally:
+            for process in self.processes:
+                process.join()
@@ -0,0 +1,149 @@
+import gym
+from gym import spaces
+from gym.utils import seeding
+import numpy as np
+
+# Batched version of MartySwingEnv - the state of numEnvs swings is held in arrays
+# and all of them are advanced together using the same physics as MartySwingEnv
+class MartySwingVecEnv(gym.Env):
+    metadata = {
+        'render.modes' : []
+    }
+
+    def __init__(self, numEnvs=1024, g=9.81, l1=0.45, l2=0.42, m=0.3, thetaInitDeg=30, vInitial=0, damping=0):
+        # Number of swings simulated together
+        self.numEnvs = numEnvs
+
+        # Marty mass
+        self.m = m
+
+        # Time increment and acc-due-to-gravity for sim
+        self.dt = .05
+        self.g = g
+
+        # Damping (deceleration per unit of tangential velocity) - zero for an ideal swing
+        self.damping = damping
+
+        # Equivalent length when extended and kicked - these (and the other physical
+        # parameters) may be scalars or arrays of length numEnvs
+        self.l1 = l1
+        self.l2 = l2
+        self.ACTION_KICK = 1
+
+        # Initial angle to vertical (anti-clockwise from vertically downwards)
+        self.thetaInit = np.radians(thetaInitDeg)
+
+        # Initial velocity
+        self.vInitial = vInitial
+
+        # Kick angles
+        self.kickAngleKicked =  np.radians(20)
+        self.kickAngleStright = 0
+
+        # Number of direction changes before an episode is done
+        self.thetaPeakCountMax = 10
+
+        # Action space - kick, straighten for each swing
+        self.action_space = spaces.MultiDiscrete([2] * self.numEnvs)
+
+        # Observation space - X accelerometer reading only for each swing
+        self.maxXAcc = np.max(self.g)
+        high = np.full((self.numEnvs, 1), self.maxXAcc)
+        self.observation_space = spaces.Box(low=-high, high=high, dtype=np.float32)
+
+        # Reset
+        self.reset()
+
+        # Randomness
+        self.seed()
+
+    def _perEnv(self, val):
+        return np.array(np.broadcast_to(val, (self.numEnvs,)), dtype=np.float64)
+
+    def reset(self):
+        # Time elapsed
+        self.t = np.zeros(self.numEnvs)
+
+        # Angles and length
+        self.theta = self._perEnv(self.thetaInit)
+        self.thetaMax = self.theta.copy()
+        self.kickAngle = np.full(self.numEnvs, self.kickAngleStright, dtype=np.float64)
+        self.l = self._perEnv(self.l1)
+
+        # Tangential velocity
+        self.v = self._perEnv(self.vInitial)
+
+        # Rewards and completion
+        self.thetaPeakCount = np.zeros(self.numEnvs, dtype=np.int64)
+
+        # Energies
+        self.kineticE = self.calcKineticEnergy(self.v)
+        self.potentialE = self.calcPotentialEnergy(self.theta)
+
+        return self._get_obs()
+
+    def calcPotentialEnergy(self, theta):
+        return self.m * self.g * (self.l1 - np.cos(theta) * self.l)
+
+    def calcKineticEnergy(self, v):
+        return 0.5 * self.m * v * v
+
+    def seed(self, seed=None):
+        self.np_random, seed = seeding.np_random(seed)
+        return [seed]
+
+    def step(self, acts):
+        # Immediate implementation of actions - swings which kick use the shorter length
+        kicked = np.asarray(acts) == self.ACTION_KICK
+        self.kickAngle = np.where(kicked, self.kickAngleKicked, self.kickAngleStright)
+        self.l = np.where(kicked, self.l2, self.l1)
+
+        # Update tangential velocity based on acceleration
+        newV = self.v - (self.g * np.sin(self.theta) + self.damping * self.v) * self.dt
+
+        # Calculate arc-angle traversed at current v in time dt
+        newTheta = self.theta + newV * self.dt / self.l
+
+        # Check for change of direction
+        peaked = (newV > 0) != (self.v > 0)
+        self.thetaPeakCount += peaked
+        done = self.thetaPeakCount > self.thetaPeakCountMax
+
+        # Reward for a new maximum angle at a peak
+        newThetaAbs = np.abs(newTheta)
+        improved = peaked & (self.thetaMax < newThetaAbs)
+        reward = np.where(improved, newThetaAbs * 1000, 0.0)
+        self.thetaMax = np.where(improved, newThetaAbs, self.thetaMax)
+
+        # Update the state
+        self.v = newV
+        self.theta = newTheta
+        self.kineticE = self.calcKineticEnergy(newV)
+        self.potentialE = self.calcPotentialEnergy(newTheta)
+        self.t = self.t + self.dt
+        info = {"t":self.t, "PE":self.potentialE, "KE":self.kineticE, "v":self.v, "l":self.l, "theta":self.theta, "kickAngle":self.kickAngle, "thetaMax":self.thetaMax}
+
+        # Auto-reset any swings which are done (info holds the values before the reset)
+        if done.any():
+            self._resetDone(done)
+        return self._get_obs(), reward, done, info
+
+    def resetEnvs(self, mask):
+        # Reset only the swings selected by mask (e.g. those which have hit a time limit)
+        self._resetDone(mask)
+        return self._get_obs()
+
+    def _resetDone(self, done):
+        self.t = np.where(done, 0.0, self.t)
+        self.theta = np.where(done, self.thetaInit, self.theta)
+        self.thetaMax = np.where(done, self.theta, self.thetaMax)
+        self.kickAngle = np.where(done, self.kickAngleStright, self.kickAngle)
+        self.l = np.where(done, self.l1, self.l)
+        self.v = np.where(done, self.vInitial, self.v)
+        self.thetaPeakCount = np.where(done, 0, self.thetaPeakCount)
+        self.kineticE = self.calcKineticEnergy(self.v)
+        self.potentialE = self.calcPotentialEnergy(self.theta)
+
+    def _get_obs(self):
+        xAcc = - self.g * np.sin(self.theta)
+        return xAcc[:, np.newaxis]
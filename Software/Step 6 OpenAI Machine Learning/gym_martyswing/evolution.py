@@ -0,0 +1,100 @@
+import numpy as np
+import functools, os
+import multiprocessing
+from gym_martyswing.envs.martyswing_vec_env import MartySwingVecEnv
+
+# Evolution strategies for policies on the recent xAcc history
+#
+# The policy sees the last historyLen xAcc readings (scaled by g) and gives a kick probability,
+# either from a linear function or a small MLP with one tanh hidden layer. A population of
+# parameter vectors is evaluated together - each one controls its own swing in a
+# MartySwingVecEnv - and the population can be split into chunks run on a pool of worker
+# processes. The ES update uses antithetic (mirrored) perturbations and centred rank fitness
+class SwingPolicy:
+
+    def __init__(self, historyLen=4, hiddenSize=0):
+        self.historyLen = historyLen
+        self.hiddenSize = hiddenSize
+        if hiddenSize > 0:
+            self.numParams = historyLen * hiddenSize + hiddenSize + hiddenSize + 1
+        else:
+            self.numParams = historyLen + 1
+
+    def kickProbs(self, params, history):
+        # params has shape (numPolicies, numParams) and history (numPolicies, historyLen)
+        if self.hiddenSize > 0:
+            h, n = self.historyLen, self.hiddenSize
+            weights1 = params[:, :h*n].reshape(-1, h, n)
+            bias1 = params[:, h*n:h*n+n]
+            weights2 = params[:, h*n+n:h*n+2*n]
+            bias2 = params[:, -1]
+            hidden = np.tanh(np.einsum("ph,phn->pn", history, weights1) + bias1)
+            logits = (hidden * weights2).sum(axis=1) + bias2
+        else:
+            logits = (history * params[:, :-1]).sum(axis=1) + params[:, -1]
+        return 1 / (1 + np.exp(-np.clip(logits, -50, 50)))
+
+def evaluatePolicies(params, policy, maxSteps=1000, stochastic=False, seed=None, envArgs=None):
+    # Episode reward (the sum of the env rewards) for each parameter vector - actions are a kick
+    # when the probability is over a half (or sampled from it if stochastic)
+    params = np.atleast_2d(params)
+    numPolicies = len(params)
+    rng = np.random.default_rng(seed)
+    env = MartySwingVecEnv(numPolicies, **(envArgs or {}))
+    xAcc = env.reset()[:, 0]
+    history = np.repeat(xAcc[:, np.newaxis] / env.maxXAcc, policy.historyLen, axis=1)
+    rewardSums = np.zeros(numPolicies)
+    running = np.ones(numPolicies, dtype=bool)
+    for i in range(maxSteps):
+        kickProbs = policy.kickProbs(params, history)
+        kick = (rng.random(numPolicies) < kickProbs) if stochastic else (kickProbs > 0.5)
+        obs, reward, done, info = env.step(kick.astype(np.int64))
+        rewardSums += np.where(running, reward, 0)
+        running &= ~done
+        if not running.any():
+            break
+        history = np.roll(history, -1, axis=1)
+        history[:, -1] = obs[:, 0] / env.maxXAcc
+    return rewardSums
+
+def _evaluateChunks(params, policy, processes, pool, **kwargs):
+    if pool is None:
+        return evaluatePolicies(params, policy, **kwargs)
+    chunks = np.array_split(params, processes)
+    results = pool.map(functools.partial(evaluatePolicies, policy=policy, **kwargs), chunks)
+    return np.concatenate(results)
+
+def centredRanks(rewards):
+    ranks = np.empty(len(rewards))
+    ranks[np.argsort(rewards)] = np.arange(len(rewards))
+    return ranks / (len(rewards) - 1) - 0.5
+
+def evolvePolicy(policy, numGenerations=100, popSize=256, sigma=0.1, learningRate=0.05, maxSteps=1000,
+                initParams=None, processes=None, seed=None, envArgs=None, verbose=True):
+    # Returns the final parameters and the reward of the (unperturbed) parameters at each
+    # generation along with the mean reward of the population
+    rng = np.random.default_rng(seed)
+    params = np.zeros(policy.numParams) if initParams is None else np.array(initParams, dtype=np.float64)
+    processes = processes or os.cpu_count()
+    pool = multiprocessing.Pool(processes) if processes > 1 else None
+    rewardTotal = []
+    populationRewardMean = []
+    try:
+        for generation in range(numGenerations):
+            # Mirrored perturbations - the centre is evaluated along with the population
+            noise = rng.standard_normal((popSize // 2, policy.numParams))
+            noise = np.concatenate((noise, -noise))
+            candidates = np.concatenate((params[np.newaxis, :], params + sigma * noise))
+            rewards = _evaluateChunks(candidates, policy, processes, pool, maxSteps=maxSteps, envArgs=envArgs)
+            rewardTotal.append(float(rewards[0]))
+            populationRewardMean.append(float(rewards[1:].mean()))
+
+            # Step along the estimated gradient of the rank-shaped reward
+            params = params + learningRate / (len(noise) * sigma) * (centredRanks(rewards[1:]) @ noise)
+            if verbose and generation % 10 == 0:
+                print(f"Generation {generation} reward {rewards[0]:.2f} population mean {rewards[1:].mean():.2f} max {rewards[1:].max():.2f}")
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    return params, rewardTotal, populationRewardMean
@@ -0,0 +1,47 @@
+import numpy as np
+from gym_martyswing.envs.martyswing_vec_env import MartySwingVecEnv
+from gym_martyswing.discretizer import BatchObservationDiscretizer
+
+# Evaluation of many tabular policies in one vectorized simulation
+#
+# actionTable has shape (numPolicies, numStates) and gives the action each policy takes in each
+# discrete state. Every policy controls its own swing in a MartySwingVecEnv and, as in
+# learnToSwing(), a new action is chosen only when the discrete state changes and the reward in a
+# state is added to the episode's reward at the change of state. Each episode runs until it is
+# done or has run for more than timeMax steps
+
+def evaluateActionTables(actionTable, numBins=9, windowLen=3, timeMax=1000, envArgs=None):
+    actionTable = np.asarray(actionTable, dtype=np.int64)
+    numPolicies = len(actionTable)
+    policyIdxs = np.arange(numPolicies)
+    env = MartySwingVecEnv(numPolicies, **(envArgs or {}))
+    discretizer = BatchObservationDiscretizer(numPolicies, -env.maxXAcc, env.maxXAcc, numBins, windowLen)
+    statePrev = discretizer.reset(env.reset()[:, 0])
+    action = np.zeros(numPolicies, dtype=np.int64)
+    rewardInState = np.zeros(numPolicies)
+    rewardSums = np.zeros(numPolicies)
+    thetaMax = np.zeros(numPolicies)
+    steps = np.zeros(numPolicies, dtype=np.int64)
+    running = np.ones(numPolicies, dtype=bool)
+    for t in range(1, timeMax + 2):
+        obs, reward, done, info = env.step(action)
+        xAcc = np.where(done, -env.g * np.sin(info["theta"]), obs[:, 0]) if done.any() else obs[:, 0]
+        state = discretizer(xAcc)
+        rewardInState += reward
+
+        # Change of state - the reward so far is added and the next action is from the table
+        changed = state != statePrev
+        rewardSums += np.where(changed & running, rewardInState, 0)
+        rewardInState[changed] = 0
+        action = np.where(changed, actionTable[policyIdxs, state], action)
+        statePrev = state
+
+        # Episodes which have finished (the swings which are done are reset by the env so they
+        # are just ignored from here on)
+        ended = running & (done | (t > timeMax))
+        thetaMax[ended] = info["thetaMax"][ended]
+        steps[ended] = t
+        running &= ~ended
+        if not running.any():
+            break
+    return {"rewardSums":rewardSums, "thetaMax":thetaMax, "steps":steps}
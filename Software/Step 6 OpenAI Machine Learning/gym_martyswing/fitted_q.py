@@ -0,0 +1,76 @@
+import numpy as np
+from gym_martyswing.trajectory_dataset import loadTrajectoryMeta, iterTrajectoryChunks
+from gym_martyswing.discretizer import BatchObservationDiscretizer
+
+# Offline fitted-Q iteration on a stored trajectory dataset
+#
+# The stored observations are discretized again with the given number of bins and smoothing
+# window and the steps are grouped into transitions in the same way as learnToSwing() - a
+# transition runs from the step where a state is entered until the state changes, carrying the
+# reward accumulated over those steps. As the data may have been generated with a different
+# discretization the action can change within a state, in which case the transition ends there
+# (back to the same state). Fitted-Q iteration is then run over all transitions at once
+
+def discretizeDataset(dirName, numBins=9, windowLen=3):
+    # Returns arrays of shape (numEnvs, numSteps) of state, action, reward, nextState, done and first
+    meta = loadTrajectoryMeta(dirName)
+    numEnvs = meta["numEnvs"]
+    discretizer = BatchObservationDiscretizer(numEnvs, -meta["maxXAcc"], meta["maxXAcc"], numBins, windowLen)
+    states, nextStates, actions, rewards, dones, firsts = [], [], [], [], [], []
+    nextState = np.zeros(numEnvs, dtype=np.int64)
+    for chunk in iterTrajectoryChunks(dirName, ["obs", "action", "reward", "nextObs", "done", "first"]):
+        obs = chunk["obs"].astype(np.float64)
+        nextObs = chunk["nextObs"].astype(np.float64)
+        chunkStates = np.zeros(obs.shape, dtype=np.int64)
+        chunkNextStates = np.zeros(obs.shape, dtype=np.int64)
+        for row in range(len(obs)):
+            first = chunk["first"][row]
+            state = np.where(first, discretizer.reset(obs[row], first), nextState) if first.any() else nextState
+            nextState = discretizer(nextObs[row])
+            chunkStates[row], chunkNextStates[row] = state, nextState
+        states.append(chunkStates)
+        nextStates.append(chunkNextStates)
+        actions.append(chunk["action"])
+        rewards.append(chunk["reward"])
+        dones.append(chunk["done"])
+        firsts.append(chunk["first"])
+    return [np.concatenate(vals).T for vals in (states, actions, rewards, nextStates, dones, firsts)]
+
+def extractTransitions(states, actions, rewards, nextStates, dones, firsts):
+    # Group steps (arrays of shape (numEnvs, numSteps)) into state to state transitions
+    numEnvs, numSteps = states.shape
+    nextFirst = np.ones(states.shape, dtype=bool)
+    nextFirst[:, :-1] = firsts[:, 1:]
+    nextAction = np.full(states.shape, -1, dtype=np.int64)
+    nextAction[:, :-1] = actions[:, 1:]
+    ends = ((nextStates != states) | dones | nextFirst | (nextAction != actions)).ravel()
+
+    # Each transition is the steps up to and including an end
+    endIdxs = np.flatnonzero(ends)
+    startIdxs = np.concatenate(([0], endIdxs[:-1] + 1))
+    rewardSums = np.add.reduceat(rewards.ravel().astype(np.float64), startIdxs)
+    return {"state":states.ravel()[startIdxs], "action":actions.ravel()[startIdxs].astype(np.int64),
+            "reward":rewardSums, "nextState":nextStates.ravel()[endIdxs], "done":dones.ravel()[endIdxs]}
+
+def fittedQIteration(transitions, numStates, numActions=2, discountFactor=0.9, tolerance=1e-6, maxIterations=10000):
+    # Q(s, a) is the mean over the transitions from (s, a) of reward + discount * max Q(next state)
+    # (with no future value when the episode is done) - repeated until Q stops changing. The mean
+    # only depends on the counts of each (s, a, next state) and the summed rewards for each (s, a)
+    # so these are collected once and each iteration works on the small tables
+    saIdxs = transitions["state"] * numActions + transitions["action"]
+    counts = np.maximum(np.bincount(saIdxs, minlength=numStates * numActions), 1).reshape(numStates, numActions)
+    rewards = np.bincount(saIdxs, weights=transitions["reward"], minlength=counts.size).reshape(counts.shape) / counts
+    continueCounts = np.bincount(saIdxs * numStates + transitions["nextState"], weights=~transitions["done"],
+                minlength=counts.size * numStates).reshape(numStates, numActions, numStates)
+    continueProbs = continueCounts / counts[:, :, np.newaxis]
+    qTable = np.zeros((numStates, numActions))
+    for i in range(maxIterations):
+        qTableNew = rewards + discountFactor * (continueProbs @ qTable.max(axis=1))
+        if np.abs(qTableNew - qTable).max() < tolerance:
+            return qTableNew
+        qTable = qTableNew
+    return qTable
+
+def fitQTable(dirName, numBins=9, windowLen=3, discountFactor=0.9):
+    transitions = extractTransitions(*discretizeDataset(dirName, numBins, windowLen))
+    return fittedQIteration(transitions, numBins * 2, 2, discountFactor), transitions
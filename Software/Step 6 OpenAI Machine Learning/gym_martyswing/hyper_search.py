@@ -0,0 +1,78 @@
+import numpy as np
+import itertools, functools, os, csv
+import multiprocessing
+from gym_martyswing.multi_agent_qlearn import MultiAgentQLearner
+
+# Hyperparameter search for the Q-learner using successive halving
+#
+# Every configuration (a dict of MultiAgentQLearner arguments such as explorationRateMax,
+# explorationRateDecayFactor, learnRateDecayFactor, discountFactor, xAccNumBins and obsWindowLen)
+# is trained with a number of seeds for a small number of episodes. The best fraction 1/eta of the
+# configurations are then trained again with eta times as many episodes and so on up to the
+# maximum, so most of the compute goes to the promising configurations. The configurations in
+# each round are shared out over a pool of worker processes
+RESULT_FIELDS = ["round", "episodeMax", "solvedFraction", "medianEpisodesToSolve", "meanRewardLast"]
+
+def evaluateConfig(config, episodeMax, numSeeds, baseSettings, seed):
+    settings = dict(baseSettings, **config)
+    learner = MultiAgentQLearner(numSeeds, episodeMax=episodeMax, seed=seed, **settings)
+    results = learner.train(verbose=False)
+    episodesToSolve = results["episodesToSolve"]
+    solved = episodesToSolve[episodesToSolve >= 0]
+
+    # Mean reward over the last few episodes of each seed
+    rewardTotals = results["rewardTotals"]
+    lastRewards = [rewards[~np.isnan(rewards)][-20:].mean() for rewards in rewardTotals]
+    return {"solvedFraction":len(solved) / numSeeds,
+            "medianEpisodesToSolve":float(np.median(solved)) if len(solved) > 0 else np.nan,
+            "meanRewardLast":float(np.mean(lastRewards))}
+
+def rankKey(result):
+    # More seeds solved is best, then fewer episodes to solve, then higher reward
+    medianEpisodes = result["medianEpisodesToSolve"]
+    return (-result["solvedFraction"], medianEpisodes if not np.isnan(medianEpisodes) else np.inf, -result["meanRewardLast"])
+
+def makeConfigs(searchSpace, maxConfigs=None, seed=None):
+    # Every combination of the values in the search space (or a random subset of them)
+    names = list(searchSpace.keys())
+    configs = [dict(zip(names, vals)) for vals in itertools.product(*searchSpace.values())]
+    if maxConfigs is not None and maxConfigs < len(configs):
+        rng = np.random.default_rng(seed)
+        configs = [configs[i] for i in rng.choice(len(configs), maxConfigs, replace=False)]
+    return configs
+
+def successiveHalving(configs, minEpisodes=200, maxEpisodes=2000, eta=3, numSeeds=16, baseSettings=None,
+                resultsFile=None, processes=None, seed=0, verbose=True):
+    baseSettings = baseSettings or {}
+    processes = processes or os.cpu_count()
+    table = []
+    episodeMax = minEpisodes
+    roundIdx = 0
+    with multiprocessing.Pool(processes) as pool:
+        while True:
+            evalFn = functools.partial(evaluateConfig, episodeMax=episodeMax, numSeeds=numSeeds, baseSettings=baseSettings, seed=seed)
+            results = pool.map(evalFn, configs, chunksize=1)
+            for config, result in zip(configs, results):
+                table.append(dict(config, round=roundIdx, episodeMax=episodeMax, **result))
+
+            # Rank and keep the best for the next round
+            ranked = sorted(zip(configs, results), key=lambda configResult: rankKey(configResult[1]))
+            if verbose:
+                bestConfig, bestResult = ranked[0]
+                print(f"Round {roundIdx} - {len(configs)} configs with {episodeMax} episodes - best {bestConfig} {bestResult}")
+            if episodeMax >= maxEpisodes or len(configs) <= 1:
+                break
+            configs = [config for config, result in ranked[:max(1, len(configs) // eta)]]
+            episodeMax = min(maxEpisodes, episodeMax * eta)
+            roundIdx += 1
+
+    if resultsFile is not None:
+        saveResultsTable(resultsFile, table)
+    return ranked[0][0], table
+
+def saveResultsTable(fileName, table):
+    fieldNames = [name for name in table[0].keys() if name not in RESULT_FIELDS] + RESULT_FIELDS
+    with open(fileName, "w", newline="") as resultsFile:
+        writer = csv.DictWriter(resultsFile, fieldnames=fieldNames)
+        writer.writeheader()
+        writer.writerows(table)
@@ -0,0 +1,99 @@
+import numpy as np
+from gym_martyswing.envs.martyswing_vec_env import MartySwingVecEnv
+from gym_martyswing.discretizer import BatchObservationDiscretizer
+
+# Model-based solution of the discretized swing
+#
+# Rather than learning the Q-table one episode at a time, transitions between the discrete
+# states used by the Q-learning scripts are sampled from many swings at once. A transition is
+# recorded at each change of state, in the same way as the Q-table is updated in learnToSwing() -
+# from the state and action when the action was chosen to the new state with the reward
+# accumulated in between. A swing which is done ends with a transition to no state (with the
+# reward since the last change of state) so there is no future value after it. The counts give
+# empirical transition and reward tensors and these are solved by value iteration. The sampling can then be repeated following the solved policy (with
+# some exploration) so the model covers the states the policy actually visits
+
+def sampleTransitions(numEnvs=4096, numSteps=1000, qTable=None, explorationRate=1.0, numBins=9, windowLen=3,
+                timeMax=1000, rng=None, envArgs=None):
+    # Returns counts of the transitions to another state of shape (numStates, numActions, numStates),
+    # counts of the transitions which end the episode and the summed rewards for each state and action
+    rng = rng if rng is not None else np.random.default_rng()
+    env = MartySwingVecEnv(numEnvs, **(envArgs or {}))
+    discretizer = BatchObservationDiscretizer(numEnvs, -env.maxXAcc, env.maxXAcc, numBins, windowLen)
+    numStates, numActions = discretizer.numStates, 2
+    counts = np.zeros(numStates * numActions * numStates, dtype=np.int64)
+    doneCounts = np.zeros(numStates * numActions, dtype=np.int64)
+    rewardSums = np.zeros(numStates * numActions)
+
+    allEnvs = np.ones(numEnvs, dtype=bool)
+    statePrev = discretizer.reset(env.reset()[:, 0], allEnvs)
+    action = np.zeros(numEnvs, dtype=np.int64)
+    rewardInState = np.zeros(numEnvs)
+    t = np.zeros(numEnvs, dtype=np.int64)
+    for i in range(numSteps):
+        obs, reward, done, info = env.step(action)
+        t += 1
+        xAcc = np.where(done, -env.g * np.sin(info["theta"]), obs[:, 0]) if done.any() else obs[:, 0]
+        state = discretizer(xAcc)
+        rewardInState += reward
+
+        # Record the transitions of swings which have changed state or are done
+        changed = state != statePrev
+        continued = changed & ~done
+        recorded = changed | done
+        saIdx = statePrev * numActions + action
+        counts += np.bincount(saIdx[continued] * numStates + state[continued], minlength=len(counts))
+        doneCounts += np.bincount(saIdx[done], minlength=len(doneCounts))
+        rewardSums += np.bincount(saIdx[recorded], weights=rewardInState[recorded], minlength=len(rewardSums))
+        rewardInState[recorded] = 0
+
+        # New actions - random or from the Q-table
+        newAction = rng.integers(0, numActions, numEnvs)
+        if qTable is not None:
+            newAction = np.where(rng.random(numEnvs) < explorationRate, newAction, np.argmax(qTable[state], axis=1))
+        action = np.where(changed, newAction, action)
+        statePrev = state
+
+        # Start new episodes for swings which are done or out of time
+        ended = done | (t > timeMax)
+        if ended.any():
+            if (ended & ~done).any():
+                obs = env.resetEnvs(ended & ~done)
+            statePrev = np.where(ended, discretizer.reset(obs[:, 0], ended), statePrev)
+            action[ended] = 0
+            rewardInState[ended] = 0
+            t[ended] = 0
+
+    return counts.reshape(numStates, numActions, numStates), doneCounts.reshape(numStates, numActions), rewardSums.reshape(numStates, numActions)
+
+def valueIteration(counts, doneCounts, rewardSums, discountFactor=0.9, tolerance=1e-6, maxIterations=10000):
+    # Q-table of shape (numStates, numActions) - state/action pairs which were never seen keep a Q of 0.
+    # The probabilities of the next states don't sum to 1 when some transitions end the episode
+    totals = counts.sum(axis=2) + doneCounts
+    seen = totals > 0
+    probs = counts / np.maximum(totals, 1)[:, :, np.newaxis]
+    rewards = rewardSums / np.maximum(totals, 1)
+    qTable = np.zeros(rewards.shape)
+    for i in range(maxIterations):
+        qTableNew = np.where(seen, rewards + discountFactor * (probs @ qTable.max(axis=1)), 0)
+        if np.abs(qTableNew - qTable).max() < tolerance:
+            return qTableNew
+        qTable = qTableNew
+    return qTable
+
+def solveSwing(numRounds=4, numEnvs=4096, numSteps=1000, explorationRate=0.2, discountFactor=0.9, numBins=9, windowLen=3,
+                timeMax=1000, seed=None, envArgs=None, verbose=True):
+    # The first round samples with random actions, later rounds follow the current solution.
+    # Counts from all rounds are kept
+    rng = np.random.default_rng(seed)
+    counts, doneCounts, rewardSums, qTable = 0, 0, 0, None
+    for roundIdx in range(numRounds):
+        roundCounts, roundDoneCounts, roundRewardSums = sampleTransitions(numEnvs, numSteps, qTable, explorationRate if roundIdx > 0 else 1.0,
+                    numBins, windowLen, timeMax, rng, envArgs)
+        counts = counts + roundCounts
+        doneCounts = doneCounts + roundDoneCounts
+        rewardSums = rewardSums + roundRewardSums
+        qTable = valueIteration(counts, doneCounts, rewardSums, discountFactor)
+        if verbose:
+            print(f"Round {roundIdx} transitions {counts.sum()} greedy actions {np.argmax(qTable, axis=1)}")
+    return qTable, counts, doneCounts, rewardSums
@@ -0,0 +1,143 @@
+import numpy as np
+from gym_martyswing.envs.martyswing_vec_env import MartySwingVecEnv
+from gym_martyswing.discretizer import BatchObservationDiscretizer
+
+# Q-learning for many independent agents in lockstep
+#
+# Each agent has its own swing in a MartySwingVecEnv, its own Q-table (held together in an array
+# of shape (numAgents, numStates, numActions)), its own episode count, learning and exploration
+# rates and streak. The learning is the same as learnToSwing() in martySwingGymQLearn.py but every
+# step of every agent is done with array operations
+class MultiAgentQLearner:
+
+    def __init__(self, numAgents=100, xAccNumBins=9, obsWindowLen=3,
+                explorationRateMax=0.4, explorationRateMin=0.01, explorationRateDecayFactor=1,
+                learnRateMax=1, learnRateMin=0.1, learnRateDecayFactor=1, discountFactor=0.9,
+                episodeMax=500, timeMax=1000, streakLenWhenDone=20, rewardSumGoal=2500,
+                randomBlockLen=1024, seed=None, envArgs=None):
+        self.numAgents = numAgents
+        self.xAccNumBins = xAccNumBins
+        self.obsWindowLen = obsWindowLen
+        self.explorationRateMax = explorationRateMax
+        self.explorationRateMin = explorationRateMin
+        self.explorationRateDecayFactor = explorationRateDecayFactor
+        self.learnRateMax = learnRateMax
+        self.learnRateMin = learnRateMin
+        self.learnRateDecayFactor = learnRateDecayFactor
+        self.discountFactor = discountFactor
+        self.episodeMax = episodeMax
+        self.timeMax = timeMax
+        self.streakLenWhenDone = streakLenWhenDone
+        self.rewardSumGoal = rewardSumGoal
+        self.randomBlockLen = randomBlockLen
+        self.rng = np.random.default_rng(seed)
+
+        # Swings and discrete states (bins of xAcc in each direction)
+        self.env = MartySwingVecEnv(numAgents, **(envArgs or {}))
+        self.numActions = 2
+        self.discretizer = BatchObservationDiscretizer(numAgents, -self.env.maxXAcc, self.env.maxXAcc, xAccNumBins, obsWindowLen)
+        self.numStates = self.discretizer.numStates
+        self.ACTION_STRAIGHT = 0
+        self.qTables = np.zeros((numAgents, self.numStates, self.numActions))
+
+    def getExplorationRate(self, episodes):
+        # Exploration rate is a log function reducing over time
+        return np.maximum(self.explorationRateMin, self.explorationRateMax * (1.0 - np.log10(episodes/self.explorationRateDecayFactor+1)))
+
+    def getLearningRate(self, episodes):
+        # Learning rate is a log function reducing over time
+        return np.maximum(self.learnRateMin, self.learnRateMax * (1.0 - np.log10(episodes/self.learnRateDecayFactor+1)))
+
+    def _startEpisodes(self, xAcc, mask, state):
+        # Smoothing window starts full of the first observation of the episode so the first
+        # state is the bin in the first direction
+        return np.where(mask, self.discretizer.reset(xAcc, mask), state)
+
+    def _randomDraws(self):
+        # Random numbers are generated in blocks rather than on every step
+        if self.randomIdx >= self.randomBlockLen:
+            self.randomExplore = self.rng.random((self.randomBlockLen, self.numAgents))
+            self.randomActions = self.rng.integers(0, self.numActions, (self.randomBlockLen, self.numAgents))
+            self.randomIdx = 0
+        self.randomIdx += 1
+        return self.randomExplore[self.randomIdx-1], self.randomActions[self.randomIdx-1]
+
+    def train(self, verbose=True):
+        agentIdxs = np.arange(self.numAgents)
+        env = self.env
+        xAcc = env.reset()[:, 0]
+        self.randomIdx = self.randomBlockLen
+
+        # Per-agent progress
+        episodes = np.zeros(self.numAgents, dtype=np.int64)
+        learningRate = self.getLearningRate(episodes)
+        explorationRate = self.getExplorationRate(episodes)
+        streaksNum = np.zeros(self.numAgents, dtype=np.int64)
+        episodesToSolve = np.full(self.numAgents, -1, dtype=np.int64)
+        rewardTotals = np.full((self.numAgents, self.episodeMax), np.nan)
+        active = np.ones(self.numAgents, dtype=bool)
+        nextReport = 100
+
+        # Per-agent episode state
+        statePrev = self._startEpisodes(xAcc, active, np.zeros(self.numAgents, dtype=np.int64))
+        action = np.full(self.numAgents, self.ACTION_STRAIGHT)
+        t = np.zeros(self.numAgents, dtype=np.int64)
+        rewardInState = np.zeros(self.numAgents)
+        episodeRewardSum = np.zeros(self.numAgents)
+
+        while active.any():
+            # Execute the actions
+            obs, reward, done, info = env.step(action)
+            t += 1
+
+            # Swings which are done have been reset so their last observation is from the info
+            xAcc = obs[:, 0]
+            if done.any():
+                xAcc = np.where(done, -env.g * np.sin(info["theta"]), xAcc)
+            state = self.discretizer(xAcc)
+            rewardInState += reward
+
+            # Update the Q Tables using the Bellman equation where there has been a change of state
+            changed = (state != statePrev) & active
+            chIdxs = agentIdxs[changed]
+            bestQ = self.qTables[chIdxs, state[changed]].max(axis=1)
+            qIdx = (chIdxs, statePrev[changed], action[changed])
+            self.qTables[qIdx] += learningRate[changed] * (rewardInState[changed] + self.discountFactor * bestQ - self.qTables[qIdx])
+
+            # Select new actions
+            randomExplore, randomActions = self._randomDraws()
+            bestActions = np.argmax(self.qTables[agentIdxs, state], axis=1)
+            newAction = np.where(randomExplore < explorationRate, randomActions, bestActions)
+            action = np.where(changed, newAction, action)
+            episodeRewardSum += np.where(changed, rewardInState, 0)
+            rewardInState[changed] = 0
+            statePrev = state
+
+            # Episodes which are done
+            ended = (done | (t > self.timeMax)) & active
+            if not ended.any():
+                continue
+            endIdxs = agentIdxs[ended]
+            rewardTotals[endIdxs, episodes[ended]] = episodeRewardSum[ended]
+            streaksNum = np.where(ended, np.where(episodeRewardSum >= self.rewardSumGoal, streaksNum + 1, 0), streaksNum)
+            solved = ended & (streaksNum > self.streakLenWhenDone)
+            episodesToSolve[solved] = episodes[solved]
+            episodes += ended
+            active &= ~solved & (episodes < self.episodeMax)
+
+            # Update parameters and start the next episode
+            learningRate = np.where(ended, self.getLearningRate(episodes - 1), learningRate)
+            explorationRate = np.where(ended, self.getExplorationRate(episodes - 1), explorationRate)
+            timedOut = ended & ~done
+            if timedOut.any():
+                obs = env.resetEnvs(timedOut)
+            statePrev = self._startEpisodes(obs[:, 0], ended, statePrev)
+            action = np.where(ended, self.ACTION_STRAIGHT, action)
+            t[ended] = 0
+            rewardInState[ended] = 0
+            episodeRewardSum[ended] = 0
+            if verbose and episodes[active].min(initial=self.episodeMax) >= nextReport:
+                print(f"Episodes {nextReport} solved {np.count_nonzero(episodesToSolve >= 0)} of {self.numAgents}")
+                nextReport += 100
+
+        return {"episodesToSolve":episodesToSolve, "rewardTotals":rewardTotals, "qTables":self.qTables}
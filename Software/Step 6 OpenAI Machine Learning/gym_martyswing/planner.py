@@ -0,0 +1,83 @@
+import numpy as np
+
+# Beam search planner for a reference policy
+#
+# Decisions are made when the discretized state changes (the xAcc bin and the direction of swing
+# as used by the Q-learning scripts). Each node in the beam holds a snapshot of the env at a
+# decision point, so both children of a node continue from the snapshot rather than
+# re-simulating from the start of the episode
+class SwingBeamPlanner:
+
+    def __init__(self, env, beamWidth=32, numBins=9, maxSteps=1000):
+        self.env = env
+        self.beamWidth = beamWidth
+        self.numBins = numBins
+        self.maxSteps = maxSteps
+        self.binBounds = np.linspace(-env.g, env.g, numBins-1)
+        self.actions = [0, 1]
+
+    def getDiscreteState(self):
+        # Bin of xAcc and direction of swing (as the Q-learning state numbering)
+        discreteVal = int(np.digitize(-self.env.g * np.sin(self.env.theta), self.binBounds))
+        if self.env.v <= 0:
+            return discreteVal
+        return self.numBins * 2 - 1 - discreteVal
+
+    def _runSegment(self, action, steps):
+        # Hold the action until the discretized state changes or the episode ends
+        env = self.env
+        state = self.getDiscreteState()
+        rewardSum = 0
+        done = False
+        while not done and steps < self.maxSteps:
+            reward, done = env._advance(action)
+            rewardSum += reward
+            steps += 1
+            if self.getDiscreteState() != state:
+                break
+        return rewardSum, done or steps >= self.maxSteps, steps
+
+    def plan(self):
+        # Each node is (rewardSum, energy, done, steps, snapshot, decisions) where decisions
+        # is a list of (step, discreteState, action)
+        env = self.env
+        env.reset()
+        beam = [(0, env.potentialE + env.kineticE, False, 0, env.getState(includeRng=False), [])]
+        while not all(node[2] for node in beam):
+            children = []
+            for node in beam:
+                rewardSum, energy, done, steps, snapshot, decisions = node
+                if done:
+                    children.append(node)
+                    continue
+                for action in self.actions:
+                    env.setState(snapshot)
+                    decision = (steps, self.getDiscreteState(), action)
+                    segReward, segDone, segSteps = self._runSegment(action, steps)
+                    children.append((rewardSum + segReward, env.potentialE + env.kineticE, segDone, segSteps,
+                                env.getState(includeRng=False), decisions + [decision]))
+
+            # Keep the best nodes - ordered by reward and then by the energy in the swing
+            children.sort(key=lambda node: (node[0], node[1]), reverse=True)
+            beam = children[:self.beamWidth]
+
+        best = beam[0]
+        env.setState(best[4])
+        return {"reward":best[0], "thetaMax":env.thetaMax, "steps":best[3], "decisions":best[5]}
+
+    def replay(self, decisions):
+        # Re-run a planned sequence of decisions from reset and return the total reward
+        env = self.env
+        env.reset()
+        decisionIdx = 0
+        action = self.actions[0]
+        rewardSum = 0
+        for step in range(self.maxSteps):
+            while decisionIdx < len(decisions) and decisions[decisionIdx][0] == step:
+                action = decisions[decisionIdx][2]
+                decisionIdx += 1
+            reward, done = env._advance(action)
+            rewardSum += reward
+            if done:
+                break
+        return rewardSum
@@ -0,0 +1,111 @@
+import numpy as np
+import json, hashlib, os
+from gym_martyswing.discretizer import ObservationDiscretizer, TileCodingDiscretizer
+from gym_martyswing.envs.martyswing_env import MartySwingEnv
+
+# Env settings which affect an episode (with the defaults for envs which don't have them)
+ENV_PARAMS = [("g", None), ("l1", None), ("l2", None), ("m", None), ("dt", None), ("thetaInit", None), ("vInitial", None),
+            ("damping", 0), ("integrator", "euler"), ("exactPeaks", False)]
+
+# Cache of the outcomes of greedy policies
+#
+# The swing is deterministic so an episode where the action in every state is the argmax of the
+# Q-table always gives the same result. The greedy action for each state is one bit (straight or
+# kick) so the whole policy is an integer (18 bits for 9 bins in 2 directions), and this together
+# with a hash of the env and discretizer settings is the key for the cached episode reward and
+# thetaMax. Rewards are summed in the same way as learnToSwing() - added up at each change of state.
+# With tile coding (numTilings > 1) the states are the fine bins and the Q-table passed in has a
+# row for each of them (as from TileCodingDiscretizer.getQTable())
+#
+# env is only read for its settings - the rollouts on a cache miss are run on a separate env of
+# the cache's own, so using the cache never disturbs an episode running on env. Scripts which
+# evaluate greedy policies share one cache file (testruns/martySwingGreedyCache.json) so a policy
+# evaluated in any earlier run isn't rolled out again
+class GreedyPolicyCache:
+
+    def __init__(self, env, numBins=9, windowLen=3, timeMax=1000, fileName=None, numTilings=1):
+        self.env = env
+        self.rolloutEnv = MartySwingEnv(fastMode=True)
+        self.timeMax = timeMax
+        self.fileName = fileName
+        self.numTilings = numTilings
+        if numTilings > 1:
+            self.discretizer = TileCodingDiscretizer(env.observation_space.low[0], env.observation_space.high[0], numBins, windowLen, numTilings)
+        else:
+            self.discretizer = ObservationDiscretizer(env.observation_space.low[0], env.observation_space.high[0], numBins, windowLen)
+        self.outcomes = {}
+        self.hits = 0
+        self.misses = 0
+        if fileName is not None and os.path.exists(fileName):
+            with open(fileName, "r") as cacheFile:
+                self.outcomes = json.load(cacheFile)
+
+    def getParamsKey(self):
+        # Everything which affects the episode - read on each lookup as the env may be changed
+        params = [getattr(self.env, name, default) for name, default in ENV_PARAMS]
+        params += [self.discretizer.numBins, self.discretizer.windowLen, self.timeMax]
+        if self.numTilings > 1:
+            params.append(self.numTilings)
+        return hashlib.sha1(json.dumps(params).encode()).hexdigest()[:16]
+
+    @staticmethod
+    def getActionKey(qTable):
+        # Greedy action for each state as the bits of an integer (state 0 is the lowest bit)
+        greedyActions = np.argmax(qTable, axis=1)
+        return sum(int(action) << i for i, action in enumerate(greedyActions))
+
+    def getKey(self, qTable):
+        return f"{self.getParamsKey()}:{self.getActionKey(qTable)}"
+
+    def lookup(self, qTable):
+        # Returns the cached (episodeRewardSum, thetaMax) for the greedy policy or None
+        outcome = self.outcomes.get(self.getKey(qTable))
+        return tuple(outcome) if outcome is not None else None
+
+    def evaluate(self, qTable):
+        # Returns (episodeRewardSum, thetaMax) for the greedy policy of the Q-table - only rolled
+        # out if it isn't in the cache
+        outcome = self.lookup(qTable)
+        if outcome is not None:
+            self.hits += 1
+            return outcome
+        self.misses += 1
+        outcome = self._rollout(np.argmax(qTable, axis=1))
+        self.outcomes[self.getKey(qTable)] = list(outcome)
+        return outcome
+
+    def _rollout(self, greedyActions):
+        # The rollout env has the settings of env (which may have been changed since the last one)
+        env = self.rolloutEnv
+        for name, default in ENV_PARAMS:
+            setattr(env, name, getattr(self.env, name, default))
+        observation = env.reset()
+        self.discretizer.reset()
+        statePrev = self.discretizer(observation[0])
+        action = 0
+        rewardInState = 0
+        episodeRewardSum = 0
+        for t in range(1, self.timeMax + 2):
+            observation, reward, done, _ = env.step(action)
+            state = self.discretizer(observation[0])
+            rewardInState += reward
+            if state != statePrev:
+                action = int(greedyActions[state])
+                episodeRewardSum += rewardInState
+                rewardInState = 0
+            statePrev = state
+            if done:
+                break
+        return float(episodeRewardSum), float(env.thetaMax)
+
+    def save(self):
+        # Written to a temporary file and renamed so the cache file is never left half written
+        if self.fileName is None:
+            return
+        dirName = os.path.dirname(self.fileName)
+        if dirName:
+            os.makedirs(dirName, exist_ok=True)
+        tmpFileName = self.fileName + ".tmp"
+        with open(tmpFileName, "w") as cacheFile:
+            json.dump(self.outcomes, cacheFile)
+        os.replace(tmpFileName, self.fileName)
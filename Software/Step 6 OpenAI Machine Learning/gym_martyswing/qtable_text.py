@@ -0,0 +1,18 @@
+import numpy as np
+
+# Names of the actions as shown in a Q-table dump (the last is for states where the actions are equal)
+ACTION_NAMES = ["Straight", "Kick", ""]
+
+def formatQTable(qTable, actionNames=ACTION_NAMES):
+    # Text of the Q for each action in each state with the best action (as printed by the learning
+    # scripts) - the first half of the states are right-to-left and the second left-to-right
+    dumpStr = ""
+    for i, st in enumerate(qTable):
+        for ac in st:
+            dumpStr += f"{ac:0.4f}\t"
+        if st[0] == st[1]:
+            bestAct = 2
+        else:
+            bestAct = np.argmax(st)
+        dumpStr += f"{'RL ' if i < len(qTable)/2 else 'LR '} {actionNames[bestAct]}\n"
+    return dumpStr
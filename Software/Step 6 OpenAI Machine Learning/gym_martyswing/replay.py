@@ -0,0 +1,55 @@
+import numpy as np
+
+# Prioritized experience replay for the tabular Q-learner
+#
+# Transitions (state, action, reward accumulated in the state, next state) are kept in fixed
+# capacity ring arrays, overwriting the oldest when full. Transitions are sampled with
+# probability proportional to priority^alpha where the priority is the size of the last TD error
+# (new transitions get the largest priority so they are replayed at least once). The updates in a
+# minibatch are applied together - where a state/action appears more than once in a batch the
+# mean of its TD errors is used
+class PrioritizedReplay:
+
+    def __init__(self, capacity=10000, alpha=0.6, minPriority=1e-3, seed=None):
+        self.capacity = capacity
+        self.alpha = alpha
+        self.minPriority = minPriority
+        self.rng = np.random.default_rng(seed)
+        self.states = np.zeros(capacity, dtype=np.int64)
+        self.actions = np.zeros(capacity, dtype=np.int64)
+        self.rewards = np.zeros(capacity)
+        self.nextStates = np.zeros(capacity, dtype=np.int64)
+        self.priorities = np.zeros(capacity)
+        self.maxPriority = 1.0
+        self.pos = 0
+        self.size = 0
+
+    def add(self, state, action, reward, nextState):
+        self.states[self.pos] = state
+        self.actions[self.pos] = action
+        self.rewards[self.pos] = reward
+        self.nextStates[self.pos] = nextState
+        self.priorities[self.pos] = self.maxPriority
+        self.pos = (self.pos + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+    def sample(self, batchSize):
+        weights = self.priorities[:self.size] ** self.alpha
+        return self.rng.choice(self.size, batchSize, p=weights / weights.sum())
+
+    def replay(self, qTable, learningRate, discountFactor, batchSize=32, numBatches=4):
+        # Apply numBatches minibatches of Bellman updates to qTable (in place)
+        if self.size == 0:
+            return
+        numActions = qTable.shape[1]
+        qFlat = qTable.reshape(-1)
+        for i in range(numBatches):
+            idxs = self.sample(batchSize)
+            saIdxs = self.states[idxs] * numActions + self.actions[idxs]
+            tdErrors = self.rewards[idxs] + discountFactor * qTable[self.nextStates[idxs]].max(axis=1) - qFlat[saIdxs]
+            counts = np.bincount(saIdxs, minlength=qFlat.size)
+            tdSums = np.bincount(saIdxs, weights=tdErrors, minlength=qFlat.size)
+            qFlat += learningRate * tdSums / np.maximum(counts, 1)
+            priorities = np.abs(tdErrors) + self.minPriority
+            self.priorities[idxs] = priorities
+            self.maxPriority = max(self.maxPriority, priorities.max())
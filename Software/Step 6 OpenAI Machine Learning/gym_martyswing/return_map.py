@@ -0,0 +1,175 @@
+import numpy as np
+from gym_martyswing.envs.martyswing_vec_env import MartySwingVecEnv
+from gym_martyswing.discretizer import BatchObservationDiscretizer
+
+# Half-swing return map (Poincare map) for bin-based policies
+#
+# The policy is an action for each discrete state of ObservationDiscretizer (a bin of xAcc in each
+# direction) and, as in learnToSwing(), the action is only changed when the state changes. The
+# direction is sensed from the moving sum of the observations so the state only flips to the new
+# direction a few steps after each peak and until then the action chosen in the last state of the
+# previous half swing is held. With the env's time step the swing isn't at rest at the step where
+# it peaks so the state there is the amplitude and the phase - the velocity as a fraction of the
+# most it can be at a peak (g.sin(amplitude).dt). The amplitude and phase at the next peak are then
+# a function of these, the policy's actions for the bins in the current direction and the held
+# action. This is tabulated once for every pattern of actions over the bins, each held action and
+# a grid of amplitudes and phases using the MartySwingEnv physics, and evaluating a policy is then
+# one interpolation per peak. The interpolation is approximate where a small change of amplitude
+# or phase moves a change of state to a different step, and these errors build up over the peaks
+#
+# Direction conventions follow the Q-learning state numbering - states 0 .. numBins-1 are used
+# when the swing is moving towards negative theta (the first half swing from thetaInit) and
+# states numBins .. 2*numBins-1 when moving back, where the mirrored bin d is state numBins+d
+#
+# The observations in the window at a peak are found by running the (semi-implicit Euler) physics
+# backwards from it with the held action. The first half swing of an episode is different as it
+# starts at rest with the window full of the first observation and the action is straight until
+# the first change of state - this is start index 2 in the tables (start indices 0 and 1 are the
+# held action)
+START_EPISODE = 2
+
+class SwingReturnMap:
+
+    def __init__(self, amplitudes, phases, nextAmplitudes, nextPhases, halfSwingTimes, params):
+        # Grids of starting amplitude and phase and the tables of results indexed
+        # [pattern, start, amplitude, phase]
+        self.amplitudes = amplitudes
+        self.phases = phases
+        self.nextAmplitudes = nextAmplitudes
+        self.nextPhases = nextPhases
+        self.halfSwingTimes = halfSwingTimes
+        self.params = params
+        self.numBins = int(params["numBins"])
+        self.windowLen = int(params["windowLen"])
+        self.discretizer = BatchObservationDiscretizer(1, -params["g"], params["g"], self.numBins, self.windowLen)
+
+    @classmethod
+    def build(cls, g=9.81, l1=0.45, l2=0.42, m=0.3, dt=0.05, numBins=9, windowLen=3, numAmplitudes=64, numPhases=9,
+                amplitudeMax=np.radians(170), timeMax=4):
+        # Every combination of actions over the bins in one direction, each way of starting
+        # the half swing and every starting amplitude and phase
+        numPatterns = 2 ** numBins
+        numStarts = START_EPISODE + 1
+        patternBits = (np.arange(numPatterns)[:, np.newaxis] >> np.arange(numBins)) & 1
+        amplitudes = np.linspace(np.radians(1), amplitudeMax, numAmplitudes)
+        phases = np.linspace(0, 1, numPhases)
+        shape = (numPatterns, numStarts, numAmplitudes, numPhases)
+        envPattern, envStart, envAmplitude, envPhase = [idxs.ravel() for idxs in np.indices(shape)]
+        numEnvs = len(envPattern)
+        isEpisodeStart = envStart == START_EPISODE
+        heldAction = np.where(isEpisodeStart, 0, envStart)
+        env = MartySwingVecEnv(numEnvs, g=g, l1=l1, l2=l2, m=m)
+        env.dt = dt
+        env.thetaInit = amplitudes[envAmplitude]
+        env.vInitial = np.where(isEpisodeStart, 0, -phases[envPhase] * g * np.sin(env.thetaInit) * dt)
+        obs = env.reset()
+        discretizer = BatchObservationDiscretizer(numEnvs, -g, g, numBins, windowLen)
+
+        # Observations before the peak (newest first) by inverting the steps of the physics
+        theta, v = env.theta, env.v
+        lHeld = np.where(heldAction == env.ACTION_KICK, l2, l1)
+        xAccBefore = np.zeros((numEnvs, windowLen))
+        for i in range(windowLen):
+            theta = theta - v * dt / lHeld
+            v = v + g * np.sin(theta) * dt
+            xAccBefore[:, i] = -g * np.sin(theta)
+
+        # State at the peak - in the previous direction except at the start of an episode
+        xAcc = obs[:, 0]
+        binIdxs = discretizer.getBin(xAcc)
+        increasing = isEpisodeStart | (xAcc >= xAccBefore[:, windowLen-1])
+        statePrev = np.where(increasing, binIdxs, numBins * 2 - 1 - binIdxs)
+        window = np.concatenate((xAccBefore[:, windowLen-2::-1], obs), axis=1)
+        discretizer.window[:] = np.where(isEpisodeStart[:, np.newaxis], obs, window)
+        action = heldAction.copy()
+
+        # Run until every swing has reached its next peak (or swung over the top) - the action
+        # changes on a change of state and is held while the state is in the previous direction
+        nextAmplitudes = np.full(numEnvs, np.nan)
+        nextPhases = np.full(numEnvs, np.nan)
+        halfSwingTimes = np.full(numEnvs, np.nan)
+        pending = np.ones(numEnvs, dtype=bool)
+        for i in range(int(timeMax / dt)):
+            vPrev = env.v
+            obs, _, _, _ = env.step(action)
+            state = discretizer(obs[:, 0])
+            changed = (state != statePrev) & (state < numBins)
+            action = np.where(changed, patternBits[envPattern, np.minimum(state, numBins-1)], action)
+            statePrev = state
+            peaked = pending & ((env.v > 0) != (vPrev > 0))
+            nextAmplitudes[peaked] = -env.theta[peaked]
+            nextPhases[peaked] = env.v[peaked] / (g * np.sin(-env.theta[peaked]) * dt)
+            halfSwingTimes[peaked] = env.t[peaked]
+            pending &= ~peaked
+            if not pending.any():
+                break
+
+        params = {"g":g, "l1":l1, "l2":l2, "m":m, "dt":dt, "numBins":numBins, "windowLen":windowLen}
+        return cls(amplitudes, phases, nextAmplitudes.reshape(shape), nextPhases.reshape(shape),
+                    halfSwingTimes.reshape(shape), params)
+
+    def save(self, fileName):
+        np.savez_compressed(fileName, amplitudes=self.amplitudes, phases=self.phases, nextAmplitudes=self.nextAmplitudes,
+                    nextPhases=self.nextPhases, halfSwingTimes=self.halfSwingTimes, **self.params)
+
+    @classmethod
+    def load(cls, fileName):
+        with np.load(fileName) as data:
+            params = {key:data[key].item() for key in ["g", "l1", "l2", "m", "dt", "numBins", "windowLen"]}
+            return cls(data["amplitudes"], data["phases"], data["nextAmplitudes"], data["nextPhases"], data["halfSwingTimes"], params)
+
+    def matchesEnv(self, env):
+        return all(np.isclose(self.params[key], getattr(env, key)) for key in ["g", "l1", "l2", "m", "dt"])
+
+    def patternsForPolicy(self, policyActions):
+        # Pattern index for each direction from an action per state (e.g. argmax of a Q-table)
+        policyActions = np.asarray(policyActions).astype(np.int64)
+        binWeights = 1 << np.arange(self.numBins)
+        return (int(np.dot(policyActions[:self.numBins], binWeights)),
+                int(np.dot(policyActions[self.numBins:2*self.numBins], binWeights)))
+
+    def interpolate(self, table, amplitude, phase):
+        # Bilinear interpolation of a table indexed [amplitude, phase] (nan beyond the amplitudes)
+        if not (self.amplitudes[0] <= amplitude <= self.amplitudes[-1]):
+            return np.nan
+        ampPos = np.interp(amplitude, self.amplitudes, np.arange(len(self.amplitudes)))
+        phasePos = np.interp(phase, self.phases, np.arange(len(self.phases)))
+        ampIdx = min(int(ampPos), len(self.amplitudes) - 2)
+        phaseIdx = min(int(phasePos), len(self.phases) - 2)
+        ampFrac, phaseFrac = ampPos - ampIdx, phasePos - phaseIdx
+        corners = table[ampIdx:ampIdx+2, phaseIdx:phaseIdx+2]
+        return ((1 - ampFrac) * ((1 - phaseFrac) * corners[0, 0] + phaseFrac * corners[0, 1]) +
+                    ampFrac * ((1 - phaseFrac) * corners[1, 0] + phaseFrac * corners[1, 1]))
+
+    def heldAction(self, amplitude, pattern):
+        # Action chosen in the last state of a half swing which ended at amplitude - the bin of
+        # the peak in that half swing's direction
+        binIdx = int(self.discretizer.getBin(np.array([self.params["g"] * np.sin(amplitude)]))[0])
+        return (pattern >> binIdx) & 1
+
+    def evaluatePolicy(self, policyActions, thetaInit=np.radians(30), numPeaks=11):
+        # Predict the amplitude at each peak, the time of each peak and the episode reward
+        # (using the same reward for a new maximum amplitude as MartySwingEnv)
+        patterns = self.patternsForPolicy(policyActions)
+        peaks = np.zeros(numPeaks)
+        peakTimes = np.zeros(numPeaks)
+        amplitude = thetaInit
+        phase = 0
+        t = 0
+        thetaMax = thetaInit
+        reward = 0
+        start = START_EPISODE
+        for i in range(numPeaks):
+            pattern = patterns[i % 2]
+            t += self.interpolate(self.halfSwingTimes[pattern, start], amplitude, phase)
+            amplitude, phase = (self.interpolate(self.nextAmplitudes[pattern, start], amplitude, phase),
+                        self.interpolate(self.nextPhases[pattern, start], amplitude, phase))
+            peaks[i] = amplitude
+            peakTimes[i] = t
+            if np.isnan(amplitude):
+                break
+            if thetaMax < amplitude:
+                reward += amplitude * 1000
+                thetaMax = amplitude
+            start = self.heldAction(amplitude, pattern)
+        return {"peaks":peaks, "peakTimes":peakTimes, "thetaMax":thetaMax, "reward":reward}
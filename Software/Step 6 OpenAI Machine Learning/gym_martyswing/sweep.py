@@ -0,0 +1,57 @@
+import numpy as np
+import itertools, functools, os
+import multiprocessing
+from gym_martyswing.envs.martyswing_env import MartySwingEnv
+
+# Sweep of physical parameters over a process pool
+#
+# Each parameter set is a dict which can contain any MartySwingEnv constructor argument
+# (g, l1, l2, m, thetaInitDeg, vInitial, integrator, exactPeaks) and also dt. The controller
+# is used as the rollout policy so it must be a fixed action or a picklable callable (such as
+# a ThresholdController or a module-level function)
+ENV_ARGS = ["g", "l1", "l2", "m", "thetaInitDeg", "vInitial", "integrator", "exactPeaks"]
+RESULT_NAMES = ["thetaMax", "reward", "timeToPeaks", "steps"]
+
+def runParamSet(paramSet, controller, numPeaks, maxSteps):
+    env = MartySwingEnv(fastMode=True, **{key:val for key, val in paramSet.items() if key in ENV_ARGS})
+    if "dt" in paramSet:
+        env.dt = paramSet["dt"]
+    trajectory, stats = env.rollout(controller, maxSteps)
+
+    # Time at which the swing changed direction for the Nth time
+    vPrev = np.concatenate(([env.vInitial], trajectory["v"][:-1]))
+    peakIdxs = np.flatnonzero((trajectory["v"] > 0) != (vPrev > 0))
+    timeToPeaks = trajectory["t"][peakIdxs[numPeaks-1]] if len(peakIdxs) >= numPeaks else np.nan
+    return (stats["thetaMax"], stats["rewardSum"], timeToPeaks, stats["steps"])
+
+def runSweep(paramSets, controller, numPeaks=10, maxSteps=10000, processes=None):
+    # Shard the parameter sets over a pool of worker processes (one per core by default)
+    runFn = functools.partial(runParamSet, controller=controller, numPeaks=numPeaks, maxSteps=maxSteps)
+    processes = processes or os.cpu_count()
+    chunkSize = max(1, len(paramSets) // (4 * processes))
+    with multiprocessing.Pool(processes) as pool:
+        results = pool.map(runFn, paramSets, chunksize=chunkSize)
+    results = np.array(results, dtype=np.float64).reshape(len(paramSets), len(RESULT_NAMES))
+    return {name:results[:, i] for i, name in enumerate(RESULT_NAMES)}
+
+def sweepList(paramSets, controller, fileName=None, **kwargs):
+    # Results are arrays with one value per parameter set
+    results = runSweep(paramSets, controller, **kwargs)
+    paramNames = sorted(set(key for paramSet in paramSets for key in paramSet))
+    params = {name:np.array([paramSet.get(name, np.nan) for paramSet in paramSets]) for name in paramNames}
+    if fileName is not None:
+        np.savez_compressed(fileName, **params, **results)
+    return params, results
+
+def sweepGrid(paramGrid, controller, fileName=None, **kwargs):
+    # paramGrid is a dict of parameter name to list of values - every combination is run and the
+    # results are arrays with one axis per parameter (in the order of the dict)
+    paramNames = list(paramGrid.keys())
+    gridShape = tuple(len(paramGrid[name]) for name in paramNames)
+    paramSets = [dict(zip(paramNames, vals)) for vals in itertools.product(*paramGrid.values())]
+    results = runSweep(paramSets, controller, **kwargs)
+    results = {name:result.reshape(gridShape) for name, result in results.items()}
+    axes = {name:np.array(paramGrid[name]) for name in paramNames}
+    if fileName is not None:
+        np.savez_compressed(fileName, paramNames=np.array(paramNames), **axes, **results)
+    return axes, results
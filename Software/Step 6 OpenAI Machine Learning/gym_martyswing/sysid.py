@@ -0,0 +1,118 @@
+import numpy as np
+import json
+from gym_martyswing.envs.martyswing_vec_env import MartySwingVecEnv
+
+# System identification - fit the swing physics to a recorded accelerometer trace
+#
+# Each candidate parameter set is one swing in a MartySwingVecEnv (held straight-legged) which is
+# sampled at the recorded times. The sensor is modelled as xAcc = sensorBias + sensorScale * sin(theta)
+# and for each candidate the bias is solved by least squares, so only the physical parameters and
+# the starting state are searched. The best candidates are refined over a number of rounds by
+# sampling around them
+#
+# The scale is fixed by the units of the recording (Marty's accelerometer reads in g so it is 1) -
+# for small swings it can't be told apart from the amplitude, so if it is fitted as well (by giving
+# a sensorScale of None) the amplitude found is arbitrary
+#
+# Parameters searched - the recorded swing starts at the first sample with theta = amplitude.cos(phase)
+# and timeScale converts the recorded times to seconds (1 for timestamped recordings and the sample
+# interval for recordings which are just a list of values)
+PARAM_NAMES = ["l1", "damping", "amplitudeDeg", "phase", "timeScale"]
+DEFAULT_RANGES = {
+    "l1": (0.2, 0.8),
+    "damping": (0, 0.5),
+    "amplitudeDeg": (1, 40),
+    "phase": (-np.pi, np.pi),
+    "timeScale": (1, 1),
+}
+
+# Kicked length as a fraction of the straight length (as the env's default l1 and l2) - used for
+# the kicked length of a fitted swing as it can't be fitted from a straight-legged recording
+KICK_LENGTH_RATIO = 0.42 / 0.45
+
+def loadSwingRecording(fileName):
+    # Recordings are either time and xAcc columns or xAcc only (in which case times are sample numbers)
+    data = np.loadtxt(fileName, ndmin=2)
+    if data.shape[1] >= 2:
+        return data[:, 0], data[:, 1]
+    return np.arange(len(data), dtype=np.float64), data[:, 0]
+
+def simulateCandidates(times, candidates, g=9.81, numSubsteps=8):
+    # Returns sin(theta) at each recorded time for each candidate - shape (numCandidates, numSamples)
+    numCandidates = len(candidates["l1"])
+    amplitude = np.radians(candidates["amplitudeDeg"])
+    env = MartySwingVecEnv(numCandidates, g=g, l1=candidates["l1"], l2=candidates["l1"], damping=candidates["damping"])
+    env.thetaInit = amplitude * np.cos(candidates["phase"])
+    env.vInitial = -amplitude * np.sin(candidates["phase"]) * np.sqrt(g * candidates["l1"])
+    env.thetaPeakCountMax = np.inf
+    env.reset()
+    straight = np.zeros(numCandidates, dtype=np.int64)
+    sinTheta = np.zeros((numCandidates, len(times)))
+    sinTheta[:, 0] = np.sin(env.theta)
+    for i in range(1, len(times)):
+        env.dt = candidates["timeScale"] * (times[i] - times[i-1]) / numSubsteps
+        for j in range(numSubsteps):
+            env.step(straight)
+        sinTheta[:, i] = np.sin(env.theta)
+    return sinTheta
+
+def scoreCandidates(sinTheta, xAcc, sensorScale=1.0):
+    # Least squares fit of the sensor model for every candidate at once (the bias only unless
+    # sensorScale is None)
+    sinMean = sinTheta.mean(axis=1, keepdims=True)
+    xAccMean = xAcc.mean()
+    if sensorScale is None:
+        sinCentred = sinTheta - sinMean
+        sensorScale = (sinCentred @ (xAcc - xAccMean)) / np.maximum((sinCentred * sinCentred).sum(axis=1), 1e-12)
+    else:
+        sensorScale = np.full(len(sinTheta), float(sensorScale))
+    sensorBias = xAccMean - sensorScale * sinMean[:, 0]
+    residuals = xAcc - (sensorBias[:, np.newaxis] + sensorScale[:, np.newaxis] * sinTheta)
+    return (residuals * residuals).mean(axis=1), sensorBias, sensorScale
+
+def fitSwingParams(times, xAcc, ranges=DEFAULT_RANGES, numCandidates=4096, numRounds=8, numElite=64, g=9.81, numSubsteps=8, sensorScale=1.0, seed=None, verbose=True):
+    rng = np.random.default_rng(seed)
+    low = np.array([ranges[name][0] for name in PARAM_NAMES], dtype=np.float64)
+    high = np.array([ranges[name][1] for name in PARAM_NAMES], dtype=np.float64)
+
+    # First round is spread uniformly over the ranges
+    samples = rng.uniform(low, high, (numCandidates, len(PARAM_NAMES)))
+    eliteSamples = np.zeros((0, len(PARAM_NAMES)))
+    eliteScores = np.zeros(0)
+    for roundIdx in range(numRounds):
+        candidates = {name:samples[:, i] for i, name in enumerate(PARAM_NAMES)}
+        mse, _, _ = scoreCandidates(simulateCandidates(times, candidates, g, numSubsteps), xAcc, sensorScale)
+
+        # Keep the best so far and sample the next round around them
+        allSamples = np.concatenate((eliteSamples, samples))
+        allScores = np.concatenate((eliteScores, mse))
+        eliteIdxs = np.argsort(allScores)[:numElite]
+        eliteSamples, eliteScores = allSamples[eliteIdxs], allScores[eliteIdxs]
+        if verbose:
+            print(f"Round {roundIdx} best mse {eliteScores[0]:.6f} " + " ".join(f"{name} {val:.4f}" for name, val in zip(PARAM_NAMES, eliteSamples[0])))
+        spread = np.maximum(eliteSamples.std(axis=0) / 2, (high - low) * 1e-4)
+        parents = eliteSamples[rng.integers(len(eliteSamples), size=numCandidates)]
+        samples = np.clip(parents + rng.normal(0, 1, parents.shape) * spread, low, high)
+
+    # Recompute the sensor model for the best candidate
+    best = {name:eliteSamples[:1, i] for i, name in enumerate(PARAM_NAMES)}
+    mse, sensorBias, sensorScale = scoreCandidates(simulateCandidates(times, best, g, numSubsteps), xAcc, sensorScale)
+    fitted = {name:float(val[0]) for name, val in best.items()}
+    fitted.update({"mse":float(mse[0]), "sensorBias":float(sensorBias[0]), "sensorScale":float(sensorScale[0]), "g":g})
+    return fitted
+
+def saveFittedParams(fileName, fitted, l2=None):
+    # Parameters in the form MartySwingEnv.loadParams() uses - the recording is of a straight-legged
+    # swing so l2 can't be fitted and unless it is given it is scaled from l1 by KICK_LENGTH_RATIO
+    # (the env's own l2 may not be shorter than the fitted l1, which would make a kick lengthen
+    # the swing)
+    if l2 is None:
+        l2 = fitted["l1"] * KICK_LENGTH_RATIO
+    if l2 >= fitted["l1"]:
+        raise ValueError(f"Kicked length l2 {l2:.3f} must be shorter than the fitted l1 {fitted['l1']:.3f}")
+    params = {"g":fitted["g"], "l1":fitted["l1"], "damping":fitted["damping"],
+                "sensorBias":fitted["sensorBias"], "sensorScale":fitted["sensorScale"],
+                "timeScale":fitted["timeScale"], "mse":fitted["mse"], "l2":l2}
+    with open(fileName, "w+") as paramsFile:
+        json.dump(params, paramsFile, indent=4)
+    return params
@@ -0,0 +1,117 @@
+import numpy as np
+import json
+from gym_martyswing.qtable_text import formatQTable
+
+# Binary trace of Q-learning for debugging
+#
+# Each step is a fixed-width record in a preallocated buffer which is written out in chunks, so
+# logging costs little more than an array assignment per step. Q-tables are stored only when they
+# differ from the last one stored and steps where the old text log showed the Q-table refer to
+# the stored table by index. The files (fileName + _steps.bin, _episodes.bin, _qtables.bin and
+# _meta.json) are raw arrays which can be memory-mapped by TraceReader and rendered in the text
+# format of the original LOG_DEBUG log on demand
+TRACE_STEP_DTYPE = np.dtype([("episode", np.int32), ("t", np.int32), ("statePrev", np.int16), ("state", np.int16),
+                ("action", np.int8), ("qTableIdx", np.int32), ("streaksNum", np.int32),
+                ("reward", np.float64), ("PE", np.float64), ("KE", np.float64), ("theta", np.float64),
+                ("thetaMax", np.float64), ("v", np.float64), ("explorationRate", np.float64), ("learningRate", np.float64)])
+TRACE_EPISODE_DTYPE = np.dtype([("episode", np.int32), ("t", np.int32), ("stepIdx", np.int64), ("streaksNum", np.int32),
+                ("rewardSum", np.float64), ("thetaMax", np.float64), ("learningRate", np.float64), ("explorationRate", np.float64)])
+
+class TraceRecorder:
+
+    def __init__(self, fileName, numStates, numActions, actionNames=("Straight", "Kick", ""), chunkLen=65536):
+        self.fileName = fileName
+        self.qTableShape = (numStates, numActions)
+        self.buffer = np.zeros(chunkLen, dtype=TRACE_STEP_DTYPE)
+        self.bufferIdx = 0
+        self.stepsWritten = 0
+        self.qTableCount = 0
+        self.lastQTable = None
+        self.stepsFile = open(fileName + "_steps.bin", "wb")
+        self.episodesFile = open(fileName + "_episodes.bin", "wb")
+        self.qTablesFile = open(fileName + "_qtables.bin", "wb")
+        with open(fileName + "_meta.json", "w") as metaFile:
+            json.dump({"numStates":numStates, "numActions":numActions, "actionNames":list(actionNames)}, metaFile)
+
+    def step(self, episode, t, statePrev, state, action, reward, PE, KE, theta, thetaMax, v, explorationRate, learningRate, streaksNum):
+        if self.bufferIdx >= len(self.buffer):
+            self.flush()
+        self.buffer[self.bufferIdx] = (episode, t, statePrev, state, action, -1, streaksNum,
+                    reward, PE, KE, theta, thetaMax, v, explorationRate, learningRate)
+        self.bufferIdx += 1
+
+    def qTable(self, qTable):
+        # Record the Q-table after the last step (a copy is stored only if it has changed)
+        if self.lastQTable is None or not np.array_equal(qTable, self.lastQTable):
+            self.lastQTable = np.array(qTable, dtype=np.float64)
+            self.qTablesFile.write(self.lastQTable.tobytes())
+            self.qTableCount += 1
+        self.buffer[self.bufferIdx - 1]["qTableIdx"] = self.qTableCount - 1
+
+    def episodeEnd(self, episode, t, rewardSum, thetaMax, learningRate, explorationRate, streaksNum):
+        record = np.array([(episode, t, self.stepsWritten + self.bufferIdx, streaksNum, rewardSum, thetaMax,
+                    learningRate, explorationRate)], dtype=TRACE_EPISODE_DTYPE)
+        self.episodesFile.write(record.tobytes())
+
+    def flush(self):
+        self.stepsFile.write(self.buffer[:self.bufferIdx].tobytes())
+        self.stepsWritten += self.bufferIdx
+        self.bufferIdx = 0
+        for traceFile in [self.stepsFile, self.episodesFile, self.qTablesFile]:
+            traceFile.flush()
+
+    def close(self):
+        self.flush()
+        for traceFile in [self.stepsFile, self.episodesFile, self.qTablesFile]:
+            traceFile.close()
+
+def _memmap(fileName, dtype, shape=None):
+    # Empty files can't be memory-mapped
+    data = np.fromfile(fileName, dtype=np.uint8, count=1)
+    if len(data) == 0:
+        return np.zeros((0,) + (shape or ()), dtype=dtype)
+    mapped = np.memmap(fileName, dtype=dtype, mode="r")
+    return mapped.reshape((-1,) + shape) if shape else mapped
+
+class TraceReader:
+
+    def __init__(self, fileName):
+        with open(fileName + "_meta.json", "r") as metaFile:
+            meta = json.load(metaFile)
+        self.actionNames = meta["actionNames"]
+        self.steps = _memmap(fileName + "_steps.bin", TRACE_STEP_DTYPE)
+        self.episodes = _memmap(fileName + "_episodes.bin", TRACE_EPISODE_DTYPE)
+        self.qTables = _memmap(fileName + "_qtables.bin", np.float64, (meta["numStates"], meta["numActions"]))
+
+    def formatQTable(self, qTable):
+        return formatQTable(qTable, self.actionNames)
+
+    def formatStep(self, step):
+        rew = step["reward"]
+        return (f"{self.actionNames[step['action']]} --- Ep {step['episode']} t {step['t']} statePrev {step['statePrev']} state {step['state']} "
+                f"rew {rew:.2f} {'[+]' if rew > 0 else ('[~]' if rew > -1 else '[-]')} PE {step['PE']:.2f} KE {step['KE']:.2f} "
+                f"TE {step['PE']+step['KE']:.2f} theta {step['theta']:.2f} thetaMax {step['thetaMax']:.2f} v {step['v']:.2f} "
+                f"explRate {float(step['explorationRate'])} learnRate {float(step['learningRate'])} Streaks {step['streaksNum']} \n")
+
+    def formatEpisodeEnd(self, episodeRec):
+        return (f".....Episode {episodeRec['episode']} finished after {episodeRec['t']} episodeRewardSum {episodeRec['rewardSum']:.2f} "
+                f"thetaMax {episodeRec['thetaMax']:.2f} learnRate {episodeRec['learningRate']:.2f} "
+                f"exploreRate {episodeRec['explorationRate']:.2f} streakLen {episodeRec['streaksNum']}\n")
+
+    def iterText(self, episodeStart=0, episodeEnd=None):
+        # Text of the old log for a range of episodes (all by default) a line or table at a time
+        episodeEnd = len(self.episodes) if episodeEnd is None else min(episodeEnd, len(self.episodes))
+        stepIdx = int(self.episodes[episodeStart - 1]["stepIdx"]) if episodeStart > 0 else 0
+        for episodeIdx in range(episodeStart, episodeEnd):
+            episodeRec = self.episodes[episodeIdx]
+            for step in self.steps[stepIdx:int(episodeRec["stepIdx"])]:
+                yield self.formatStep(step)
+                if step["qTableIdx"] >= 0:
+                    yield self.formatQTable(self.qTables[step["qTableIdx"]])
+            stepIdx = int(episodeRec["stepIdx"])
+            yield self.formatEpisodeEnd(episodeRec)
+
+    def writeText(self, textFileName, episodeStart=0, episodeEnd=None):
+        with open(textFileName, "w+") as textFile:
+            for text in self.iterText(episodeStart, episodeEnd):
+                textFile.write(text)
@@ -0,0 +1,107 @@
+import numpy as np
+import json, os
+from gym_martyswing.envs.martyswing_vec_env import MartySwingVecEnv
+from gym_martyswing.discretizer import BatchObservationDiscretizer
+
+# Dataset of swing trajectories for offline learning
+#
+# A dataset is a directory of compressed npz chunks and a meta.json. Each chunk holds arrays of
+# shape (chunkLen, numEnvs) - row k is step k of every env - so the steps of each env stay in
+# order and the observations can be discretized again with different settings. For each step
+# there is the observation before the step, its moving average, the discrete state, the action,
+# the reward, the observation after the step (from before any auto-reset) and its state, whether
+# the step ended the episode and whether it was the first step of an episode
+TRAJECTORY_FIELDS = {
+    "obs":np.float32, "smoothedObs":np.float32, "state":np.int16, "action":np.int8, "reward":np.float32,
+    "nextObs":np.float32, "nextState":np.int16, "done":np.bool_, "first":np.bool_,
+}
+
+class TrajectoryWriter:
+
+    def __init__(self, dirName, numEnvs=1, chunkLen=65536, meta=None):
+        self.dirName = dirName
+        self.numEnvs = numEnvs
+        self.chunkLen = chunkLen
+        self.meta = dict(meta or {}, numEnvs=numEnvs)
+        self.buffers = {name:np.zeros((chunkLen, numEnvs), dtype=dtype) for name, dtype in TRAJECTORY_FIELDS.items()}
+        self.bufferIdx = 0
+        self.numChunks = 0
+        self.numSteps = 0
+        os.makedirs(dirName, exist_ok=True)
+
+    def append(self, obs, smoothedObs, state, action, reward, nextObs, nextState, done, first):
+        # Values are arrays of length numEnvs (or scalars for a single env)
+        if self.bufferIdx >= self.chunkLen:
+            self.flush()
+        row = self.bufferIdx
+        for name, val in zip(TRAJECTORY_FIELDS, (obs, smoothedObs, state, action, reward, nextObs, nextState, done, first)):
+            self.buffers[name][row] = val
+        self.bufferIdx += 1
+
+    def flush(self):
+        if self.bufferIdx == 0:
+            return
+        fileName = os.path.join(self.dirName, f"chunk_{self.numChunks:05d}.npz")
+        np.savez_compressed(fileName, **{name:buffer[:self.bufferIdx] for name, buffer in self.buffers.items()})
+        self.numChunks += 1
+        self.numSteps += self.bufferIdx
+        self.bufferIdx = 0
+
+    def close(self):
+        self.flush()
+        with open(os.path.join(self.dirName, "meta.json"), "w") as metaFile:
+            json.dump(dict(self.meta, numChunks=self.numChunks, numSteps=self.numSteps), metaFile, indent=4)
+
+def loadTrajectoryMeta(dirName):
+    with open(os.path.join(dirName, "meta.json"), "r") as metaFile:
+        return json.load(metaFile)
+
+def iterTrajectoryChunks(dirName, fields=None):
+    # Chunks in order as dicts of arrays
+    meta = loadTrajectoryMeta(dirName)
+    for chunkIdx in range(meta["numChunks"]):
+        with np.load(os.path.join(dirName, f"chunk_{chunkIdx:05d}.npz")) as data:
+            yield {name:data[name] for name in (fields or data.files)}
+
+def generateDataset(dirName, numEnvs=1024, numSteps=2000, explorationRate=1.0, qTable=None, numBins=9, windowLen=3,
+                timeMax=1000, chunkLen=500, seed=None, envArgs=None):
+    # Runs a batch of swings choosing a new action at each change of discrete state (randomly or
+    # epsilon-greedy on qTable, as learnToSwing() does) and writes every step to a dataset
+    rng = np.random.default_rng(seed)
+    env = MartySwingVecEnv(numEnvs, **(envArgs or {}))
+    discretizer = BatchObservationDiscretizer(numEnvs, -env.maxXAcc, env.maxXAcc, numBins, windowLen)
+    writer = TrajectoryWriter(dirName, numEnvs, chunkLen, {"numBins":numBins, "windowLen":windowLen, "maxXAcc":float(env.maxXAcc),
+                "dt":env.dt, "timeMax":timeMax, "envArgs":envArgs or {}})
+
+    allEnvs = np.ones(numEnvs, dtype=bool)
+    obs = env.reset()[:, 0]
+    state = discretizer.reset(obs, allEnvs)
+    first = allEnvs.copy()
+    action = np.zeros(numEnvs, dtype=np.int64)
+    t = np.zeros(numEnvs, dtype=np.int64)
+    for i in range(numSteps):
+        smoothedObs = discretizer.smoothed
+        nextObsReset, reward, done, info = env.step(action)
+        t += 1
+        nextObs = np.where(done, -env.g * np.sin(info["theta"]), nextObsReset[:, 0])
+        nextState = discretizer(nextObs)
+        writer.append(obs, smoothedObs, state, action, reward, nextObs, nextState, done, first)
+
+        # New actions where the state has changed
+        newAction = rng.integers(0, 2, numEnvs)
+        if qTable is not None:
+            newAction = np.where(rng.random(numEnvs) < explorationRate, newAction, np.argmax(qTable[nextState], axis=1))
+        action = np.where(nextState != state, newAction, action)
+        obs, state = nextObs, nextState
+
+        # Start new episodes for swings which are done or out of time
+        first = done | (t > timeMax)
+        if first.any():
+            if (first & ~done).any():
+                nextObsReset = env.resetEnvs(first & ~done)
+            obs = np.where(first, nextObsReset[:, 0], obs)
+            state = np.where(first, discretizer.reset(obs, first), state)
+            action[first] = 0
+            t[first] = 0
+    writer.close()
+    return writer.numSteps * numEnvs
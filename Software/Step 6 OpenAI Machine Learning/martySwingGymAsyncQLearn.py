@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+
+from gym_martyswing.async_qlearn import AsyncQLearner
+from gym_martyswing.qtable_text import formatQTable
+import os, time
+import matplotlib.pyplot as plt
+
+# Worker processes sharing the Q-table (one per core by default)
+NUM_WORKERS = os.cpu_count()
+SEED = None
+
+# Learning and exploration settings (as martySwingGymQLearn.py) - the schedule is per worker
+xAccNumBins = 9
+obsWindowLen = 3
+EXPLORATION_RATE_MAX = 0.4
+EXPLORATION_RATE_MIN = 0.01
+EXPLORATION_RATE_DECAY_FACTOR = 1
+LEARN_RATE_MAX = 1
+LEARN_RATE_MIN = 0.1
+LEARN_RATE_DECAY_FACTOR = 1
+DISCOUNT_FACTOR = 0.9
+
+# Goal settings - EPISODE_MAX is per worker and the streak is of greedy evaluations
+EPISODE_MAX = 500
+TIME_MAX = 1000
+STREAK_LEN_WHEN_DONE = 20
+REWARD_SUM_GOAL = 2500
+
+actionNames = ["Straight", "Kick", ""]
+
+# Greedy policy outcomes are cached (shared with the other scripts)
+GREEDY_CACHE_FILE = "testruns/martySwingGreedyCache.json"
+
+if __name__ == "__main__":
+    learner = AsyncQLearner(NUM_WORKERS, xAccNumBins=xAccNumBins, obsWindowLen=obsWindowLen,
+                explorationRateMax=EXPLORATION_RATE_MAX, explorationRateMin=EXPLORATION_RATE_MIN,
+                explorationRateDecayFactor=EXPLORATION_RATE_DECAY_FACTOR,
+                learnRateMax=LEARN_RATE_MAX, learnRateMin=LEARN_RATE_MIN, learnRateDecayFactor=LEARN_RATE_DECAY_FACTOR,
+                discountFactor=DISCOUNT_FACTOR, episodeMax=EPISODE_MAX, timeMax=TIME_MAX,
+                streakLenWhenDone=STREAK_LEN_WHEN_DONE, rewardSumGoal=REWARD_SUM_GOAL, seed=SEED,
+                cacheFile=GREEDY_CACHE_FILE)
+    results = learner.train()
+    print(formatQTable(results["qTable"], actionNames))
+    print(f"{'Solved' if results['solved'] else 'Not solved'} after {results['episodes']} episodes over {NUM_WORKERS} workers in {results['time']:.1f} secs")
+    print(f"Greedy policy cache hits {results['cacheHits']} misses {results['cacheMisses']}")
+
+    plt.plot(results["rewardTotal"], 'p')
+    plt.suptitle("Marty Swing Async Q-Learning", fontsize=20)
+    plt.ylabel('Greedy Reward', fontsize=16)
+    plt.xlabel('Evaluation', fontsize=16)
+    plt.show()
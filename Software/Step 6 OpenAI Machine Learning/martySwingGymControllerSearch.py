@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+
+from gym_martyswing.controller_search import searchThresholdControllers
+import numpy as np
+import time
+
+# Grid of rule-based controllers - kick when |theta| is within the kick window and straighten
+# when |theta| is beyond the straighten angle
+KICK_WINDOWS_DEG = np.arange(1, 21, 1)
+STRAIGHTEN_ANGLES_DEG = np.arange(5, 61, 1)
+THETA_INITS_DEG = [10, 20, 30, 40]
+DT = 0.05
+TIME_MAX = 1000
+NUM_TO_SHOW = 20
+
+if __name__ == "__main__":
+    timeStart = time.time()
+    results = searchThresholdControllers(KICK_WINDOWS_DEG, STRAIGHTEN_ANGLES_DEG, THETA_INITS_DEG, dt=DT, maxSteps=TIME_MAX)
+    print(f"Evaluated {len(results)} controllers in {time.time()-timeStart:.2f} secs")
+    print("KickWindow\tStraighten\tThetaInit\tReward\tThetaMax\tTime")
+    for res in results[:NUM_TO_SHOW]:
+        print(f"{res['kickWindowDeg']:.0f}\t\t{res['straightenAngleDeg']:.0f}\t\t{res['thetaInitDeg']:.0f}\t\t{res['reward']:.2f}\t{np.degrees(res['thetaMax']):.1f}\t\t{res['t']:.2f}")
@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+
+from gym_martyswing.evolution import SwingPolicy, evolvePolicy
+import numpy as np
+import time
+import matplotlib.pyplot as plt
+
+# Policy - kick probability from the last HISTORY_LEN xAcc readings (HIDDEN_SIZE 0 is linear)
+HISTORY_LEN = 4
+HIDDEN_SIZE = 8
+
+# Evolution settings
+NUM_GENERATIONS = 100
+POP_SIZE = 256
+SIGMA = 0.1
+LEARN_RATE = 0.05
+TIME_MAX = 1000
+PROCESSES = None
+SEED = None
+PARAMS_FILE = "martySwingEvolvedPolicy.npy"
+
+if __name__ == "__main__":
+    policy = SwingPolicy(HISTORY_LEN, HIDDEN_SIZE)
+    timeStart = time.time()
+    params, rewardTotal, populationRewardMean = evolvePolicy(policy, NUM_GENERATIONS, POP_SIZE, SIGMA, LEARN_RATE,
+                TIME_MAX, processes=PROCESSES, seed=SEED)
+    print(f"Evolved {policy.numParams} parameters over {NUM_GENERATIONS} generations in {time.time()-timeStart:.1f} secs")
+    print(f"Final reward {rewardTotal[-1]:.2f}")
+    np.save(PARAMS_FILE, params)
+
+    plt.plot(rewardTotal, 'p')
+    plt.plot(populationRewardMean, 'g')
+    plt.suptitle("Marty Swing Evolution Strategies", fontsize=20)
+    plt.ylabel('Total Reward', fontsize=16)
+    plt.xlabel('Generation', fontsize=16)
+    plt.show()
@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+
+import gym_martyswing
+from gym_martyswing.trajectory_dataset import generateDataset, loadTrajectoryMeta
+from gym_martyswing.fitted_q import discretizeDataset, extractTransitions, fittedQIteration
+from gym_martyswing.policy_cache import GreedyPolicyCache
+import numpy as np
+import os, time
+
+# Dataset - generated (with random actions) if it doesn't exist, or written by
+# martySwingGymQLearn.py with RECORD_DATASET = True
+DATASET_DIR = "testruns/martySwingDataset"
+NUM_ENVS = 1024
+NUM_STEPS = 2000
+
+# Settings to compare against the same data
+XACC_NUM_BINS = [5, 7, 9, 11, 13]
+DISCOUNT_FACTORS = [0.8, 0.9, 0.99]
+obsWindowLen = 3
+TIME_MAX = 1000
+
+# Greedy policy outcomes are cached (shared with the other scripts)
+GREEDY_CACHE_FILE = "testruns/martySwingGreedyCache.json"
+REWARD_SUM_GOAL = 2500
+
+if __name__ == "__main__":
+    if not os.path.exists(os.path.join(DATASET_DIR, "meta.json")):
+        timeStart = time.time()
+        numSteps = generateDataset(DATASET_DIR, NUM_ENVS, NUM_STEPS, windowLen=obsWindowLen, timeMax=TIME_MAX)
+        print(f"Generated {numSteps} steps in {time.time()-timeStart:.1f} secs")
+    meta = loadTrajectoryMeta(DATASET_DIR)
+    print(f"Dataset has {meta['numSteps'] * meta['numEnvs']} steps")
+
+    env = gym_martyswing.makeRaw()
+    for xAccNumBins in XACC_NUM_BINS:
+        timeStart = time.time()
+        transitions = extractTransitions(*discretizeDataset(DATASET_DIR, xAccNumBins, obsWindowLen))
+        print(f"xAccNumBins {xAccNumBins} transitions {len(transitions['state'])} in {time.time()-timeStart:.1f} secs")
+        greedyCache = GreedyPolicyCache(env, xAccNumBins, obsWindowLen, TIME_MAX, GREEDY_CACHE_FILE)
+        for discountFactor in DISCOUNT_FACTORS:
+            qTable = fittedQIteration(transitions, xAccNumBins * 2, 2, discountFactor)
+            episodeRewardSum, thetaMax = greedyCache.evaluate(qTable)
+            print(f"    discount {discountFactor} greedy episodeRewardSum {episodeRewardSum:.2f} thetaMax {thetaMax:.2f}")
+        greedyCache.save()
@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+
+from gym_martyswing.hyper_search import makeConfigs, successiveHalving
+import time
+
+# Values to search for each of the learning settings
+SEARCH_SPACE = {
+    "explorationRateMax": [0.2, 0.4, 1],
+    "explorationRateDecayFactor": [1, 10, 50],
+    "learnRateDecayFactor": [1, 10, 50],
+    "discountFactor": [0.8, 0.9, 0.99],
+    "xAccNumBins": [7, 9, 13],
+    "obsWindowLen": [2, 3, 5],
+}
+MAX_CONFIGS = 81
+
+# Successive halving settings - each configuration is trained with NUM_SEEDS agents
+MIN_EPISODES = 200
+EPISODE_MAX = 2000
+ETA = 3
+NUM_SEEDS = 16
+RESULTS_FILE = "martySwingHyperSearch.csv"
+
+# Settings which are not searched
+BASE_SETTINGS = {
+    "explorationRateMin": 0.01,
+    "learnRateMax": 1,
+    "learnRateMin": 0.1,
+    "timeMax": 1000,
+    "streakLenWhenDone": 20,
+    "rewardSumGoal": 2500,
+}
+
+if __name__ == "__main__":
+    configs = makeConfigs(SEARCH_SPACE, MAX_CONFIGS, seed=0)
+    timeStart = time.time()
+    bestConfig, table = successiveHalving(configs, MIN_EPISODES, EPISODE_MAX, ETA, NUM_SEEDS, BASE_SETTINGS, RESULTS_FILE)
+    print(f"Search took {time.time()-timeStart:.1f} secs - results in {RESULTS_FILE}")
+    print(f"Best settings {bestConfig}")
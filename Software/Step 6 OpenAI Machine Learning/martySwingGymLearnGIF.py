@@ -3,11 +3,16 @@
 
 import gym
 import gym_martyswing
+from gym_martyswing.discretizer import ObservationDiscretizer
+from gym_martyswing.trace_log import TraceRecorder
+from gym_martyswing.exhaustive import evaluateActionTables
+from gym_martyswing.qtable_text import formatQTable
+from gym_martyswing.checkpoint import saveCheckpoint, loadCheckpoint, loadWarmStartTable, captureRngStates, restoreRngStates
 import numpy as np
 import time, math, random
 import matplotlib.pyplot as plt
 import matplotlib
-import itertools
+import itertools, argparse, os
 from PIL import Image
 import matplotlib.pyplot as plt
 
@@ -23,8 +28,9 @@ ACTION_KICK = 1
 stateBounds = (env.observation_space.low, env.observation_space.high)
 # Discrete bounds for observation
 xAccNumBins = 9
-xAccBinBounds = np.linspace(stateBounds[0], stateBounds[1], xAccNumBins-1)
-xAccBinBounds = xAccBinBounds.flatten()
+# Sensing direction (using a moving average)
+obsWindowLen = 3
+discretizer = ObservationDiscretizer(stateBounds[0][0], stateBounds[1][0], xAccNumBins, obsWindowLen)
 # Directions
 numDirections = 2
 
@@ -46,7 +52,8 @@ TIME_MAX = 1000
 STREAK_LEN_WHEN_DONE = 50
 REWARD_SUM_GOAL = 2500
 LOG_DEBUG = False
-LOG_DEBUG_FILE = "testruns/martySwingQLearnSegLog.txt"
+LOG_DEBUG_FILE = "testruns/martySwingQLearnSegTrace"
+# Debug log is a binary trace (see gym_martyswing/trace_log.py) - TraceReader(LOG_DEBUG_FILE).writeText() gives the text log
 SHOW_ALL_RENDERS = False
 GEN_GIF = True
 FIXED_ACTION = False
@@ -55,35 +62,70 @@ RENDER_LAST = True
 RENDER_BEST_PERMUTE = True
 GIF_BEST = True
 PERMUTE_BEST_INDEX = 124
+# Simulate all the permutations together to find the best (which is then the only one run as an
+# episode) rather than running each permutation as an episode
+PERMUTE_VECTORIZED = True
 MAX_SWING = False
 
+# Checkpoints are saved every CHECKPOINT_EVERY episodes (and at the end) so a run can be resumed
+CHECKPOINT_FILE = "testruns/martySwingQLearnSegCheckpoint.npz"
+CHECKPOINT_EVERY = 50
+
 # Debug
 learnRateVals = []
 exploreRateVals = []
 
 # Main
-def learnToSwing():
+def learnToSwing(resume=False, warmStartFile=None, checkpointFile=CHECKPOINT_FILE):
 
     # Set the learning and explore rates initially
     learningRate = getLearningRate(0)
     explorationRate = getExplorationRate(0)
 
     # Track progress in learning
+    episodeStart = 0
     streaksNum = 0
     rewardTotal = []
 
+    # The Q Table isn't learnt in the exhaustive search so there is nothing to checkpoint
+    if PERMUTE_ACTION:
+        checkpointFile = None
+
+    # Start from another run's Q-table or carry on from a checkpoint
+    if warmStartFile is not None:
+        qTable[:] = loadWarmStartTable(warmStartFile, qTable.shape)
+        print(f"Warm start from Q-table in {warmStartFile}")
+    if resume and checkpointFile is not None and os.path.exists(checkpointFile):
+        checkpoint = loadCheckpoint(checkpointFile)
+        qTable[:] = checkpoint["qTable"]
+        episodeStart = checkpoint["episode"]
+        learningRate = checkpoint["learningRate"]
+        explorationRate = checkpoint["explorationRate"]
+        streaksNum = checkpoint["streaksNum"]
+        rewardTotal = checkpoint["rewardTotal"]
+        restoreRngStates(checkpoint["rngStates"], env)
+        print(f"Resuming from episode {episodeStart} in {checkpointFile}")
+
     # Debug
-    logDebugFile = None
+    traceLog = None
     if LOG_DEBUG:
-        debugActPrev = -1
         try:
-            logDebugFile = open(LOG_DEBUG_FILE, "w+")
+            traceLog = TraceRecorder(LOG_DEBUG_FILE, len(qTable), numActions, actionNames)
         except:
             print(f"Cannot write to log file {LOG_DEBUG_FILE}")
             exit(0)
 
+    # Exhaustive search with every permutation simulated at once
+    episodes = range(episodeStart, EPISODE_MAX)
+    if PERMUTE_ACTION and PERMUTE_VECTORIZED:
+        global PERMUTE_BEST_INDEX
+        permuteRewards = evaluatePermutations()
+        PERMUTE_BEST_INDEX = int(np.argmax(permuteRewards))
+        print(f"Best permutation {PERMUTE_BEST_INDEX} {permutationsTable[PERMUTE_BEST_INDEX]} episodeRewardSum {permuteRewards[PERMUTE_BEST_INDEX]:.2f}")
+        episodes = [PERMUTE_BEST_INDEX]
+
     # Iterate episodes
-    for episode in range(EPISODE_MAX):
+    for episode in episodes:
 
         # Reset the environment
         observation = env.reset()
@@ -92,7 +134,8 @@ def learnToSwing():
         episodeRewardSum = 0
 
         # Initial state
-        statePrev = getObservationBinned(observation[0], xAccBinBounds)
+        discretizer.reset()
+        statePrev = discretizer(observation[0])
         state = statePrev
 
         # Setup for permutation
@@ -112,14 +155,14 @@ def learnToSwing():
             # Execute the action
             observation, reward, done, info = env.step(action)
             t += 1
-            state = getObservationBinned(observation[0], xAccBinBounds)
+            state = discretizer(observation[0])
 
             # Accumulate rewards in this state
             rewardInState += reward
            
             # Log data
-            if logDebugFile is not None:
-                logDebugFile.write(f"{actionNames[action]} --- Ep {episode} t {t} statePrev {statePrev} state {state} rew {rewardInState:.2f} {'[+]' if rewardInState > 0 else ('[~]' if rewardInState > -1 else '[-]')} PE {info['PE']:.2f} KE {info['KE']:.2f} TE {info['PE']+info['KE']:.2f} theta {info['theta']:.2f} thetaMax {info['thetaMax']:.2f} v {info['v']:.2f} explRate {explorationRate} learnRate {learningRate} Streaks {streaksNum} \n")
+            if traceLog is not None:
+                traceLog.step(episode, t, statePrev, state, action, rewardInState, info['PE'], info['KE'], info['theta'], info['thetaMax'], info['v'], explorationRate, learningRate, streaksNum)
 
             # Check if there has been a change of state
             if state != statePrev:
@@ -130,8 +173,8 @@ def learnToSwing():
                     qTable[statePrev, action] += learningRate*(rewardInState + DISCOUNT_FACTOR*(best_q) - qTable[statePrev, action])
 
                 # Debug
-                if logDebugFile is not None:
-                    logDebugFile.write(dumpQTable(qTable))
+                if traceLog is not None:
+                    traceLog.qTable(qTable)
 
                 # Select a new action
                 if FIXED_ACTION:
@@ -156,8 +199,8 @@ def learnToSwing():
             if done or t > TIME_MAX or (MAX_SWING and t > 120):
                 rewardTotal.append(episodeRewardSum)
                 logStr = f"Episode {episode} finished after {t} episodeRewardSum {episodeRewardSum:.2f} thetaMax {info['thetaMax']:.2f} learnRate {learningRate:.2f} exploreRate {explorationRate:.2f} streakLen {streaksNum}"
-                if logDebugFile:
-                    logDebugFile.write("....." + logStr + "\n")
+                if traceLog is not None:
+                    traceLog.episodeEnd(episode, t, episodeRewardSum, info['thetaMax'], learningRate, explorationRate, streaksNum)
                 if episode % 100 == 0:
                     print(dumpQTable(qTable))
                 print(logStr)
@@ -177,15 +220,25 @@ def learnToSwing():
         explorationRate = getExplorationRate(episode)
         learningRate = getLearningRate(episode)
 
-    # Close debug log
-    if logDebugFile:
-        logDebugFile.close()
+        # Checkpoint
+        if checkpointFile is not None and (episode + 1) % CHECKPOINT_EVERY == 0:
+            saveCheckpoint(checkpointFile, qTable, episode + 1, learningRate, explorationRate, streaksNum, rewardTotal, captureRngStates(env))
+
+    # Close debug trace
+    if traceLog is not None:
+        traceLog.close()
+
+    # Final checkpoint
+    if checkpointFile is not None:
+        saveCheckpoint(checkpointFile, qTable, len(rewardTotal), learningRate, explorationRate, streaksNum, rewardTotal, captureRngStates(env))
 
     # Save GIF
     if GEN_GIF:
         saveGIF()
 
     print(dumpQTable(qTable))
+    if PERMUTE_ACTION and PERMUTE_VECTORIZED:
+        rewardTotal = permuteRewards
     plt.plot(rewardTotal, 'p')
     if PERMUTE_ACTION:
         plt.xlabel('Pattern Permutation', fontsize=16)
@@ -237,6 +290,24 @@ def permuteTableSetup(episode):
 def permutesDone(episode):
     return episode > len(permutationsTable)
 
+def permuteActionTable():
+    # Action in every state for each permutation (as permuteTableSetup() sets the Q Table)
+    actionTable = np.zeros((len(permutationsTable), len(qTable)), dtype=np.int64)
+    perms = np.array(permutationsTable)
+    for i in range(permuteUsedBinCount):
+        if i < permuteUsedBinCount // 2:
+            actionTable[:, i+permuteUsedBinStart] = perms[:, i]
+        else:
+            actionTable[:, permuteSecondDirectionBinEnd-(i-permuteUsedBinCount // 2)] = perms[:, i]
+    return actionTable
+
+def evaluatePermutations():
+    # Episode reward of every permutation from one vectorized simulation
+    timeMax = min(TIME_MAX, 120) if MAX_SWING else TIME_MAX
+    envArgs = {"l2":.2} if MAX_SWING else None
+    results = evaluateActionTables(permuteActionTable(), xAccNumBins, obsWindowLen, timeMax, envArgs)
+    return results["rewardSums"]
+
 def getExplorationRate(t):
     # Exploration rate is a log function reducing over time
     return max(EXPLORATION_RATE_MIN, EXPLORATION_RATE_MAX * (1.0 - math.log10(t/EXPLORATION_RATE_DECAY_FACTOR+1)))
@@ -245,50 +316,22 @@ def getLearningRate(t):
     # Learning rate is a log function reducing over time
     return max(LEARN_RATE_MIN, LEARN_RATE_MAX * (1.0 - math.log10(t/LEARN_RATE_DECAY_FACTOR+1)))
 
-# Sensing direction (using a moving average)
-obsList = []
-obsSum = 0
-obsWindowLen = 3
-def getObservationBinned(val, bins):
-    global obsList, obsSum
-    # Smooth the observations
-    obsSumPrev = obsSum
-    if len(obsList) >= obsWindowLen:
-        obsSum -= obsList[0]
-    else:
-        obsList = [val] * (obsWindowLen-1)
-        obsSum = val * (obsWindowLen-1)
-        obsSumPrev = obsSum + val
-    obsList = obsList[-(obsWindowLen-1):]
-    obsList.append(val)
-    obsSum += val
-    discreteVal = np.digitize(val, bins)
-    if obsSum >= obsSumPrev:
-        return discreteVal
-    return xAccNumBins * 2 - 1 - discreteVal
-
 def dumpQTable(qTable):
-    dumpStr = ""
-    for i, st in enumerate(qTable):
-        for ac in st:
-            dumpStr += f"{ac:0.4f}\t"
-        if st[0] == st[1]:
-            bestAct = 2
-        else:
-            bestAct = np.argmax(st)
-        dumpStr += f"{'RL ' if i < len(qTable)/2 else 'LR '} {actionNames[bestAct]}\n"
-    return dumpStr
+    return formatQTable(qTable, actionNames)
         
 indHueMin = 0/360 
 indHueMax = 100/360
 kickIndicators = []
-binBoundsAngles = [np.arcsin(np.clip(binBound / 9.81, -1, 1)) for binBound in xAccBinBounds]
+binBoundsAngles = [np.arcsin(np.clip(binBound / 9.81, -1, 1)) for binBound in discretizer.binBounds]
 binCentreAngles = [(binBoundsAngles[binBoundsIdx]+binBoundsAngles[binBoundsIdx-1])/2 for binBoundsIdx in range(1,len(binBoundsAngles))]
 
 def doRender(episode, numStreaks, mode='human'):
-    from gym.envs.classic_control import rendering
     oldViewer = env.viewer
-    env.render(mode)
+    retVal = env.render(mode)
+    if env.viewer is None:
+        # Headless or software rendered so the bin overlays aren't drawn
+        return retVal
+    from gym.envs.classic_control import rendering
     if oldViewer is None:
         lineStart = -0.5
         lineEnd = -1
@@ -397,4 +440,9 @@ def saveGIF():
         im.save(outFile, save_all=True, append_images=framesAngle)
 
 if __name__ == "__main__":
-    learnToSwing()
+    parser = argparse.ArgumentParser(description="Marty Swing Q-Learning")
+    parser.add_argument("--resume", action="store_true", help="carry on from the last checkpoint")
+    parser.add_argument("--checkpoint", default=CHECKPOINT_FILE, help="checkpoint file")
+    parser.add_argument("--warm-start", dest="warmStartFile", help="start from the Q-table in this checkpoint (or .npy) file")
+    args = parser.parse_args()
+    learnToSwing(args.resume, args.warmStartFile, args.checkpoint)
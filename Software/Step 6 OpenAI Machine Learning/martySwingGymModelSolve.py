@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+
+import gym_martyswing
+from gym_martyswing.model_solver import solveSwing
+from gym_martyswing.policy_cache import GreedyPolicyCache
+from gym_martyswing.qtable_text import formatQTable
+import numpy as np
+import time
+
+# Discrete states and actions (as martySwingGymQLearn.py)
+actionNames = ["Straight", "Kick", ""]
+xAccNumBins = 9
+obsWindowLen = 3
+DISCOUNT_FACTOR = 0.9
+TIME_MAX = 1000
+REWARD_SUM_GOAL = 2500
+
+# Sampling settings - each round runs NUM_ENVS swings for NUM_STEPS steps
+NUM_ROUNDS = 4
+NUM_ENVS = 4096
+NUM_STEPS = 1000
+EXPLORATION_RATE = 0.2
+SEED = None
+
+# Greedy policy outcomes are cached (shared with the other scripts)
+GREEDY_CACHE_FILE = "testruns/martySwingGreedyCache.json"
+
+# Q-table is saved so it can be used to warm start martySwingGymLearnGIF.py
+Q_TABLE_FILE = "martySwingModelQTable.npy"
+
+if __name__ == "__main__":
+    timeStart = time.time()
+    qTable, counts, doneCounts, rewardSums = solveSwing(NUM_ROUNDS, NUM_ENVS, NUM_STEPS, EXPLORATION_RATE, DISCOUNT_FACTOR,
+                xAccNumBins, obsWindowLen, TIME_MAX, SEED)
+    print(f"Solved in {time.time()-timeStart:.1f} secs")
+    print(formatQTable(qTable, actionNames))
+    np.save(Q_TABLE_FILE, qTable)
+
+    # Check the greedy policy in a single swing
+    greedyCache = GreedyPolicyCache(gym_martyswing.makeRaw(), xAccNumBins, obsWindowLen, TIME_MAX, GREEDY_CACHE_FILE)
+    episodeRewardSum, thetaMax = greedyCache.evaluate(qTable)
+    greedyCache.save()
+    print(f"Greedy policy episodeRewardSum {episodeRewardSum:.2f} thetaMax {thetaMax:.2f} {'reaches' if episodeRewardSum >= REWARD_SUM_GOAL else 'misses'} goal {REWARD_SUM_GOAL}")
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+
+from gym_martyswing.multi_agent_qlearn import MultiAgentQLearner
+import numpy as np
+import time
+import matplotlib.pyplot as plt
+
+# Number of independent agents (seeds) trained together
+NUM_AGENTS = 200
+SEED = None
+
+# Learning and exploration settings (as martySwingGymQLearn.py)
+xAccNumBins = 9
+obsWindowLen = 3
+EXPLORATION_RATE_MAX = 0.4
+EXPLORATION_RATE_MIN = 0.01
+EXPLORATION_RATE_DECAY_FACTOR = 1
+LEARN_RATE_MAX = 1
+LEARN_RATE_MIN = 0.1
+LEARN_RATE_DECAY_FACTOR = 1
+DISCOUNT_FACTOR = 0.9
+
+# Goal settings
+EPISODE_MAX = 500
+TIME_MAX = 1000
+STREAK_LEN_WHEN_DONE = 20
+REWARD_SUM_GOAL = 2500
+
+if __name__ == "__main__":
+    learner = MultiAgentQLearner(NUM_AGENTS, xAccNumBins=xAccNumBins, obsWindowLen=obsWindowLen,
+                explorationRateMax=EXPLORATION_RATE_MAX, explorationRateMin=EXPLORATION_RATE_MIN,
+                explorationRateDecayFactor=EXPLORATION_RATE_DECAY_FACTOR,
+                learnRateMax=LEARN_RATE_MAX, learnRateMin=LEARN_RATE_MIN, learnRateDecayFactor=LEARN_RATE_DECAY_FACTOR,
+                discountFactor=DISCOUNT_FACTOR, episodeMax=EPISODE_MAX, timeMax=TIME_MAX,
+                streakLenWhenDone=STREAK_LEN_WHEN_DONE, rewardSumGoal=REWARD_SUM_GOAL, seed=SEED)
+    timeStart = time.time()
+    results = learner.train()
+    print(f"Trained {NUM_AGENTS} agents in {time.time()-timeStart:.1f} secs")
+
+    # Distribution of the number of episodes to solve
+    episodesToSolve = results["episodesToSolve"]
+    solvedEpisodes = episodesToSolve[episodesToSolve >= 0]
+    print(f"Solved {len(solvedEpisodes)} of {NUM_AGENTS} within {EPISODE_MAX} episodes")
+    if len(solvedEpisodes) > 0:
+        percentiles = np.percentile(solvedEpisodes, [0, 10, 25, 50, 75, 90, 100])
+        print("Episodes to solve - min/10%/25%/median/75%/90%/max " + " / ".join(f"{p:.0f}" for p in percentiles))
+        plt.hist(solvedEpisodes, bins=30)
+    plt.suptitle("Marty Swing Q-Learning Episodes to Solve", fontsize=20)
+    plt.ylabel('Agents', fontsize=16)
+    plt.xlabel('Episodes', fontsize=16)
+    plt.show()
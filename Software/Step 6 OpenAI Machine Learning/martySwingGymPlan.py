@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+
+import gym_martyswing
+from gym_martyswing.planner import SwingBeamPlanner
+import numpy as np
+import time
+
+# Planner settings
+BEAM_WIDTH = 32
+xAccNumBins = 9
+TIME_MAX = 1000
+actionNames = ["Straight", "Kick"]
+
+if __name__ == "__main__":
+    env = gym_martyswing.makeRaw()
+    planner = SwingBeamPlanner(env, beamWidth=BEAM_WIDTH, numBins=xAccNumBins, maxSteps=TIME_MAX)
+    timeStart = time.time()
+    result = planner.plan()
+    print(f"Planned in {time.time()-timeStart:.1f} secs - reward {result['reward']:.2f} thetaMax {result['thetaMax']:.2f} after {result['steps']} steps")
+    for step, state, action in result["decisions"]:
+        print(f"t {step} state {state} {actionNames[action]}")
+    print(f"Replayed reward {planner.replay(result['decisions']):.2f}")
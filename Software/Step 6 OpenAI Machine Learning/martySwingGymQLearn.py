@@ -3,12 +3,18 @@
 
 import gym
 import gym_martyswing
+from gym_martyswing.discretizer import ObservationDiscretizer, TileCodingDiscretizer
+from gym_martyswing.trace_log import TraceRecorder
+from gym_martyswing.qtable_text import formatQTable
+from gym_martyswing.policy_cache import GreedyPolicyCache
+from gym_martyswing.trajectory_dataset import TrajectoryWriter
+from gym_martyswing.replay import PrioritizedReplay
 import numpy as np
 import time, math, random
 import matplotlib.pyplot as plt
 
-# Create the MartySwing environment
-env = gym.make('MartySwing-v0')
+# Create the MartySwing environment (unwrapped and in fast mode - info is read from env as needed)
+env = gym_martyswing.makeRaw()
 
 # Discrete actions
 numActions = env.action_space.n # (straight, kick)
@@ -19,13 +25,20 @@ ACTION_KICK = 1
 stateBounds = (env.observation_space.low, env.observation_space.high)
 # Discrete bounds for observation
 xAccNumBins = 9
-xAccBinBounds = np.linspace(stateBounds[0], stateBounds[1], xAccNumBins-1)
-xAccBinBounds = xAccBinBounds.flatten()
+# Sensing direction (using a moving average)
+obsWindowLen = 3
+# Tile coding - with more than one tiling the Q Table has a row for each tile and the states are
+# the finer bins formed by all the tilings together
+NUM_TILINGS = 1
+if NUM_TILINGS > 1:
+    discretizer = TileCodingDiscretizer(stateBounds[0][0], stateBounds[1][0], xAccNumBins, obsWindowLen, NUM_TILINGS)
+else:
+    discretizer = ObservationDiscretizer(stateBounds[0][0], stateBounds[1][0], xAccNumBins, obsWindowLen)
 # Directions
 numDirections = 2
 
 # Q Table indexed by state-action pair
-qTable = np.zeros((xAccNumBins * numDirections, numActions))
+qTable = np.zeros((discretizer.numTiles, numActions))
 
 # Learning and exploration settings
 EXPLORATION_RATE_MAX = 0.4
@@ -42,10 +55,28 @@ TIME_MAX = 1000
 STREAK_LEN_WHEN_DONE = 20
 REWARD_SUM_GOAL = 2500
 LOG_DEBUG = False
-LOG_DEBUG_FILE = "testruns/martySwingQLearnLog.txt"
+LOG_DEBUG_FILE = "testruns/martySwingQLearnTrace"
+# Debug log is a binary trace (see gym_martyswing/trace_log.py) - TraceReader(LOG_DEBUG_FILE).writeText() gives the text log
 SHOW_ALL_RENDERS = False
 RENDER_LAST = False
 
+# Check the greedy policy of the learnt Q Table at the end - the outcome is looked up in the cache
+# of greedy policy outcomes shared with the other scripts (and only rolled out if it isn't there)
+USE_GREEDY_CACHE = False
+GREEDY_CACHE_FILE = "testruns/martySwingGreedyCache.json"
+
+# Every step can be recorded to a trajectory dataset for offline learning (martySwingGymFittedQ.py)
+RECORD_DATASET = False
+DATASET_DIR = "testruns/martySwingDataset"
+
+# Prioritized experience replay - after each episode REPLAY_BATCHES minibatches of stored
+# transitions are replayed into the Q Table (without tile coding only)
+USE_REPLAY = False
+REPLAY_CAPACITY = 10000
+REPLAY_ALPHA = 0.6
+REPLAY_BATCH_SIZE = 32
+REPLAY_BATCHES = 4
+
 # Debug
 learnRateVals = []
 exploreRateVals = []
@@ -60,13 +91,20 @@ def learnToSwing():
     # Track progress in learning
     streaksNum = 0
     rewardTotal = []
+    replay = PrioritizedReplay(REPLAY_CAPACITY, REPLAY_ALPHA) if USE_REPLAY and NUM_TILINGS == 1 else None
+    greedyCache = GreedyPolicyCache(env, xAccNumBins, obsWindowLen, TIME_MAX, GREEDY_CACHE_FILE, NUM_TILINGS) if USE_GREEDY_CACHE else None
+
+    # Dataset
+    datasetWriter = None
+    if RECORD_DATASET:
+        datasetWriter = TrajectoryWriter(DATASET_DIR, 1, meta={"numBins":xAccNumBins, "windowLen":obsWindowLen, "numTilings":NUM_TILINGS,
+                    "maxXAcc":float(stateBounds[1][0]), "dt":env.dt, "timeMax":TIME_MAX})
 
     # Debug
-    logDebugFile = None
+    traceLog = None
     if LOG_DEBUG:
-        debugActPrev = -1
         try:
-            logDebugFile = open(LOG_DEBUG_FILE, "w+")
+            traceLog = TraceRecorder(LOG_DEBUG_FILE, discretizer.numStates, numActions, actionNames)
         except:
             print(f"Cannot write to log file {LOG_DEBUG_FILE}")
             exit(0)
@@ -79,7 +117,8 @@ def learnToSwing():
         episodeRewardSum = 0
 
         # Initial state
-        statePrev = getObservationBinned(observation[0], xAccBinBounds)
+        discretizer.reset()
+        statePrev = discretizer(observation[0])
         state = statePrev
 
         # Run the experiment over time steps
@@ -94,26 +133,32 @@ def learnToSwing():
                 time.sleep(0.1)
 
             # Execute the action
-            observation, reward, done, info = env.step(action)
+            if datasetWriter is not None:
+                obsPrev, smoothedObsPrev = observation[0], discretizer.smoothed
+            observation, reward, done, _ = env.step(action)
             t += 1
-            state = getObservationBinned(observation[0], xAccBinBounds)
+            state = discretizer(observation[0])
+            if datasetWriter is not None:
+                datasetWriter.append(obsPrev, smoothedObsPrev, statePrev, action, reward, observation[0], state, done, t == 1)
 
             # Accumulate rewards in this state
             rewardInState += reward
 
             # Log data
-            if logDebugFile is not None:
-                logDebugFile.write(f"{actionNames[action]} --- Ep {episode} t {t} statePrev {statePrev} state {state} rew {rewardInState:.2f} {'[+]' if rewardInState > 0 else ('[~]' if rewardInState > -1 else '[-]')} PE {info['PE']:.2f} KE {info['KE']:.2f} TE {info['PE']+info['KE']:.2f} theta {info['theta']:.2f} thetaMax {info['thetaMax']:.2f} v {info['v']:.2f} explRate {explorationRate} learnRate {learningRate} Streaks {streaksNum} \n")
+            if traceLog is not None:
+                traceLog.step(episode, t, statePrev, state, action, rewardInState, env.potentialE, env.kineticE, env.theta, env.thetaMax, env.v, explorationRate, learningRate, streaksNum)
 
             # Check if there has been a change of state
             if state != statePrev:
                 # Update the Q Table using the Bellman equation
-                best_q = np.amax(qTable[state])
-                qTable[statePrev, action] += learningRate*(rewardInState + DISCOUNT_FACTOR*(best_q) - qTable[statePrev, action])
+                best_q = discretizer.getQ(qTable, state).max()
+                discretizer.update(qTable, statePrev, action, learningRate*(rewardInState + DISCOUNT_FACTOR*(best_q) - discretizer.getQ(qTable, statePrev)[action]))
+                if replay is not None:
+                    replay.add(statePrev, action, rewardInState, state)
 
                 # Debug
-                if logDebugFile is not None:
-                    logDebugFile.write(dumpQTable(qTable))
+                if traceLog is not None:
+                    traceLog.qTable(discretizer.getQTable(qTable))
 
                 # Select a new action
                 action = actionSelect(state, explorationRate)
@@ -128,9 +173,9 @@ def learnToSwing():
             # Check for episode done
             if done or t > TIME_MAX:
                 rewardTotal.append(episodeRewardSum)
-                logStr = f"Episode {episode} finished after {t} episodeRewardSum {episodeRewardSum:.2f} thetaMax {info['thetaMax']:.2f} learnRate {learningRate:.2f} exploreRate {explorationRate:.2f} streakLen {streaksNum}"
-                if logDebugFile:
-                    logDebugFile.write("....." + logStr + "\n")
+                logStr = f"Episode {episode} finished after {t} episodeRewardSum {episodeRewardSum:.2f} thetaMax {env.thetaMax:.2f} learnRate {learningRate:.2f} exploreRate {explorationRate:.2f} streakLen {streaksNum}"
+                if traceLog is not None:
+                    traceLog.episodeEnd(episode, t, episodeRewardSum, env.thetaMax, learningRate, explorationRate, streaksNum)
                 if episode % 100 == 0:
                     print(dumpQTable(qTable))
                     print(logStr)
@@ -140,6 +185,10 @@ def learnToSwing():
                     streaksNum = 0
                 break
 
+        # Replay stored transitions
+        if replay is not None:
+            replay.replay(qTable, learningRate, DISCOUNT_FACTOR, REPLAY_BATCH_SIZE, REPLAY_BATCHES)
+
         # It's considered done when it's solved over N times consecutively
         if streaksNum > STREAK_LEN_WHEN_DONE:
             break
@@ -150,9 +199,19 @@ def learnToSwing():
         explorationRate = getExplorationRate(episode)
         learningRate = getLearningRate(episode)
 
-    # Close debug log
-    if logDebugFile:
-        logDebugFile.close()
+    # Close debug trace
+    if traceLog is not None:
+        traceLog.close()
+
+    # Finish the dataset
+    if datasetWriter is not None:
+        datasetWriter.close()
+
+    # Greedy policy check
+    if greedyCache is not None:
+        greedyRewardSum, greedyThetaMax = greedyCache.evaluate(discretizer.getQTable(qTable))
+        greedyCache.save()
+        print(f"Greedy policy episodeRewardSum {greedyRewardSum:.2f} thetaMax {greedyThetaMax:.2f} {'reaches' if greedyRewardSum >= REWARD_SUM_GOAL else 'misses'} goal {REWARD_SUM_GOAL} (cache hits {greedyCache.hits} misses {greedyCache.misses})")
 
     print(dumpQTable(qTable))
     plt.plot(rewardTotal, 'p')
@@ -170,7 +229,7 @@ def actionSelect(state, explorationRate):
         action = env.action_space.sample()
     else:
         # Action with best Q for current state
-        action = np.argmax(qTable[state])
+        action = discretizer.getQ(qTable, state).argmax()
     return action
 
 def getExplorationRate(t):
@@ -181,39 +240,9 @@ def getLearningRate(t):
     # Learning rate is a log function reducing over time
     return max(LEARN_RATE_MIN, LEARN_RATE_MAX * (1.0 - math.log10(t/LEARN_RATE_DECAY_FACTOR+1)))
 
-# Sensing direction (using a moving average)
-obsList = []
-obsSum = 0
-obsWindowLen = 3
-def getObservationBinned(val, bins):
-    global obsList, obsSum
-    # Smooth the observations
-    obsSumPrev = obsSum
-    if len(obsList) >= obsWindowLen:
-        obsSum -= obsList[0]
-    else:
-        obsList = [val] * (obsWindowLen-1)
-        obsSum = val * (obsWindowLen-1)
-        obsSumPrev = obsSum + val
-    obsList = obsList[-(obsWindowLen-1):]
-    obsList.append(val)
-    obsSum += val
-    discreteVal = np.digitize(val, bins)
-    if obsSum >= obsSumPrev:
-        return discreteVal
-    return xAccNumBins * 2 - 1 - discreteVal
-
 def dumpQTable(qTable):
-    dumpStr = ""
-    for i, st in enumerate(qTable):
-        for ac in st:
-            dumpStr += f"{ac:0.4f}\t"
-        if st[0] == st[1]:
-            bestAct = 2
-        else:
-            bestAct = np.argmax(st)
-        dumpStr += f"{'RL ' if i < len(qTable)/2 else 'LR '} {actionNames[bestAct]}\n"
-    return dumpStr
+    # Q for each state (summed over the tiles with tile coding)
+    return formatQTable(discretizer.getQTable(qTable), actionNames)
             
 if __name__ == "__main__":
     learnToSwing()
@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+
+import gym_martyswing
+from gym_martyswing.envs import MartySwingEnv
+from gym_martyswing.return_map import SwingReturnMap
+import numpy as np
+import os, time
+
+# Return map settings
+RETURN_MAP_FILE = "martySwingReturnMap.npz"
+xAccNumBins = 9
+obsWindowLen = 3
+
+# Policy to evaluate - action per state as used by actionSelectFix (kick in states 4 and 13)
+ACTION_STRAIGHT = 0
+ACTION_KICK = 1
+policyActions = [ACTION_STRAIGHT] * (xAccNumBins * 2)
+policyActions[4] = ACTION_KICK
+policyActions[13] = ACTION_KICK
+
+def getReturnMap(env):
+    # Load the table if it has been built for this env already
+    if os.path.exists(RETURN_MAP_FILE):
+        try:
+            returnMap = SwingReturnMap.load(RETURN_MAP_FILE)
+            if returnMap.matchesEnv(env) and returnMap.numBins == xAccNumBins and returnMap.windowLen == obsWindowLen:
+                return returnMap
+        except KeyError:
+            print(f"Return map {RETURN_MAP_FILE} is in an old format and will be rebuilt")
+    timeStart = time.time()
+    returnMap = SwingReturnMap.build(g=env.g, l1=env.l1, l2=env.l2, m=env.m, dt=env.dt, numBins=xAccNumBins, windowLen=obsWindowLen)
+    returnMap.save(RETURN_MAP_FILE)
+    print(f"Built return map in {time.time()-timeStart:.1f} secs and saved to {RETURN_MAP_FILE}")
+    return returnMap
+
+if __name__ == "__main__":
+    env = MartySwingEnv()
+    returnMap = getReturnMap(env)
+
+    # Predict the episode from the table
+    timeStart = time.time()
+    result = returnMap.evaluatePolicy(policyActions, thetaInit=env.thetaInit)
+    print(f"Predicted in {(time.time()-timeStart)*1000:.2f} ms - thetaMax {result['thetaMax']:.3f} reward {result['reward']:.2f}")
+    print("Peaks", np.array2string(np.degrees(result["peaks"]), precision=1))
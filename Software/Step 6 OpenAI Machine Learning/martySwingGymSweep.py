@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+
+from gym_martyswing.controllers import ThresholdController
+from gym_martyswing.sweep import sweepGrid
+import numpy as np
+import time
+
+# Robot geometry study - swing lengths straight and kicked and the starting angle
+SWEEP_GRID = {
+    "l1": np.linspace(0.40, 0.50, 6),
+    "l2": np.linspace(0.30, 0.44, 8),
+    "thetaInitDeg": [10, 20, 30, 40],
+    "dt": [0.01],
+}
+SWEEP_FILE = "martySwingSweep.npz"
+NUM_PEAKS = 10
+MAX_STEPS = 5000
+
+if __name__ == "__main__":
+    controller = ThresholdController(kickWindowDeg=5, straightenAngleDeg=29)
+    timeStart = time.time()
+    axes, results = sweepGrid(SWEEP_GRID, controller, SWEEP_FILE, numPeaks=NUM_PEAKS, maxSteps=MAX_STEPS)
+    print(f"Swept {results['thetaMax'].size} configurations in {time.time()-timeStart:.1f} secs - results in {SWEEP_FILE}")
+
+    # Best configuration
+    bestIdx = np.unravel_index(np.nanargmax(results["thetaMax"]), results["thetaMax"].shape)
+    bestParams = {name:float(axes[name][idx]) for name, idx in zip(axes.keys(), bestIdx)}
+    print(f"Best thetaMax {np.degrees(results['thetaMax'][bestIdx]):.1f} deg with {bestParams}")
@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+
+from gym_martyswing.sysid import loadSwingRecording, fitSwingParams, saveFittedParams, DEFAULT_RANGES
+from gym_martyswing.envs import MartySwingEnv
+import numpy as np
+import time
+
+# Recording to fit - martySwingAndTime.txt has timestamps, martySwing.txt is xAcc values only
+# (for that one the sample interval is fitted, and as it can't be separated from the swing
+# length the length is fixed)
+TIMED_RECORDING = True
+if TIMED_RECORDING:
+    DATA_FILE = "testruns/martySwingAndTime.txt"
+    SAMPLE_START = 0
+    # The swing is pushed at about 13 secs (sample 116) so the fit stops before that
+    SAMPLE_END = 116
+    FIT_RANGES = DEFAULT_RANGES
+    NUM_SUBSTEPS = 8
+else:
+    DATA_FILE = "testruns/martySwing.txt"
+    SAMPLE_START = 100
+    SAMPLE_END = 1600
+    FIT_RANGES = dict(DEFAULT_RANGES, l1=(0.45, 0.45), timeScale=(0.001, 0.02))
+    NUM_SUBSTEPS = 2
+# Marty's accelerometer reads in g so xAcc = sensorBias + SENSOR_SCALE * sin(theta)
+SENSOR_SCALE = 1.0
+FITTED_PARAMS_FILE = "testruns/martySwingFittedParams.json"
+# The kicked length l2 can't be fitted from a straight-legged recording - set it here to write it
+# to the parameters file (otherwise it is scaled from the fitted l1 as the env's default lengths)
+FITTED_L2 = None
+NUM_CANDIDATES = 4096
+NUM_ROUNDS = 8
+
+if __name__ == "__main__":
+    times, xAcc = loadSwingRecording(DATA_FILE)
+    times, xAcc = times[SAMPLE_START:SAMPLE_END], xAcc[SAMPLE_START:SAMPLE_END]
+    timeStart = time.time()
+    fitted = fitSwingParams(times, xAcc, FIT_RANGES, numCandidates=NUM_CANDIDATES, numRounds=NUM_ROUNDS, numSubsteps=NUM_SUBSTEPS, sensorScale=SENSOR_SCALE)
+    print(f"Fitted in {time.time()-timeStart:.1f} secs - rms error {np.sqrt(fitted['mse']):.4f}")
+    params = saveFittedParams(FITTED_PARAMS_FILE, fitted, FITTED_L2)
+    print(f"Parameters written to {FITTED_PARAMS_FILE}: {params}")
+
+    # Check the env can use them
+    env = MartySwingEnv()
+    env.loadParams(FITTED_PARAMS_FILE)
+    print(f"Env l1 {env.l1:.3f} l2 {env.l2:.3f} damping {env.damping:.3f}")
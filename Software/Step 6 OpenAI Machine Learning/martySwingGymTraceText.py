@@ -0,0 +1,18 @@
+# -*- coding: utf-8 -*-
+
+from gym_martyswing.trace_log import TraceReader
+
+# Trace written by martySwingGymQLearn.py with LOG_DEBUG = True (martySwingGymLearnGIF.py uses
+# testruns/martySwingQLearnSegTrace)
+TRACE_FILE = "testruns/martySwingQLearnTrace"
+TEXT_FILE = "testruns/martySwingQLearnLog.txt"
+
+# Range of episodes to render (None for the end)
+EPISODE_START = 0
+EPISODE_END = None
+
+if __name__ == "__main__":
+    traceReader = TraceReader(TRACE_FILE)
+    print(f"Trace has {len(traceReader.steps)} steps {len(traceReader.episodes)} episodes {len(traceReader.qTables)} Q-tables")
+    traceReader.writeText(TEXT_FILE, EPISODE_START, EPISODE_END)
+    print(f"Written {TEXT_FILE}")
@@ -0,0 +1,4 @@
+import os, sys
+
+# The tests import gym_martyswing from the Step 6 directory (as the scripts do when run from there)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,671 @@
+import numpy as np
+import pytest
+import random
+import json
+import subprocess, sys
+import gym_martyswing
+from gym_martyswing.envs import MartySwingEnv, MartySwingVecEnv, MartySwingSubprocVecEnv
+from gym_martyswing.discretizer import ObservationDiscretizer, BatchObservationDiscretizer, TileCodingDiscretizer
+from gym_martyswing.exhaustive import evaluateActionTables
+from gym_martyswing.return_map import SwingReturnMap
+from gym_martyswing.policy_cache import GreedyPolicyCache
+from gym_martyswing.controllers import ThresholdController
+from gym_martyswing.sweep import sweepGrid, sweepList
+from gym_martyswing.controller_search import searchThresholdControllers
+from gym_martyswing.evolution import SwingPolicy, evaluatePolicies, evolvePolicy
+from gym_martyswing.hyper_search import successiveHalving, makeConfigs
+from gym_martyswing.multi_agent_qlearn import MultiAgentQLearner
+from gym_martyswing.async_qlearn import AsyncQLearner
+from gym_martyswing.planner import SwingBeamPlanner
+from gym_martyswing.trajectory_dataset import generateDataset, iterTrajectoryChunks
+from gym_martyswing.fitted_q import discretizeDataset, extractTransitions, fitQTable
+from gym_martyswing.replay import PrioritizedReplay
+from gym_martyswing.trace_log import TraceRecorder, TraceReader
+from gym_martyswing.checkpoint import saveCheckpoint, loadCheckpoint, loadWarmStartTable, captureRngStates, restoreRngStates
+from gym_martyswing.model_solver import valueIteration, solveSwing
+from gym_martyswing.sysid import simulateCandidates, fitSwingParams, saveFittedParams, KICK_LENGTH_RATIO
+
+# Regression tests for the equivalences the faster code paths rely on - each compares a fast or
+# batched path with the plain MartySwingEnv step loop (or np.digitize for the discretizer) - and
+# behaviour tests for the learners and tools built on the env
+
+def learnerRollout(env, policyActions, numBins=9, windowLen=3, timeMax=1000):
+    # Episode as learnToSwing() runs it with a fixed action per state - the action only changes on
+    # a change of state and the reward is summed at each change of state
+    discretizer = ObservationDiscretizer(-env.maxXAcc, env.maxXAcc, numBins, windowLen)
+    observation = env.reset()
+    statePrev = discretizer(observation[0])
+    action = 0
+    rewardInState = 0
+    episodeRewardSum = 0
+    peaks = []
+    for t in range(1, timeMax + 2):
+        vPrev = env.v
+        observation, reward, done, _ = env.step(action)
+        if (env.v > 0) != (vPrev > 0):
+            peaks.append(abs(env.theta))
+        state = discretizer(observation[0])
+        rewardInState += reward
+        if state != statePrev:
+            action = int(policyActions[state])
+            episodeRewardSum += rewardInState
+            rewardInState = 0
+        statePrev = state
+        if done:
+            break
+    return {"rewardSum":episodeRewardSum, "thetaMax":env.thetaMax, "peaks":np.array(peaks), "steps":t}
+
+def testVecEnvMatchesScalarEnv():
+    numEnvs = 8
+    rng = np.random.default_rng(1)
+    vecEnv = MartySwingVecEnv(numEnvs)
+    envs = [MartySwingEnv() for i in range(numEnvs)]
+    vecEnv.reset()
+    for env in envs:
+        env.reset()
+    for step in range(400):
+        acts = rng.integers(0, 2, numEnvs)
+        obs, reward, done, info = vecEnv.step(acts)
+        for i, env in enumerate(envs):
+            envObs, envReward, envDone, envInfo = env.step(acts[i])
+            assert envDone == done[i]
+            assert envReward == pytest.approx(reward[i], rel=1e-12, abs=1e-12)
+            assert envInfo["theta"] == pytest.approx(info["theta"][i], rel=1e-12, abs=1e-12)
+            if envDone:
+                envObs = env.reset()
+            assert envObs[0] == pytest.approx(obs[i, 0], rel=1e-12, abs=1e-12)
+
+def testFastModeMatchesNormalMode():
+    rng = np.random.default_rng(2)
+    env = MartySwingEnv()
+    fastEnv = gym_martyswing.makeRaw(fastMode=True)
+    env.reset()
+    fastEnv.reset()
+    for step in range(1000):
+        act = int(rng.integers(0, 2))
+        obs, reward, done, info = env.step(act)
+        fastObs, fastReward, fastDone, fastInfo = fastEnv.step(act)
+        assert fastInfo == {}
+        assert (fastObs[0], fastReward, fastDone) == (obs[0], reward, done)
+        assert fastEnv.getInfo() == info
+        if done:
+            env.reset()
+            fastEnv.reset()
+
+def testRolloutMatchesStepLoop():
+    env = MartySwingEnv()
+    policy = lambda swingEnv: 1 if swingEnv.v < 0 else 0
+    trajectory, stats = env.rollout(policy, 2000)
+    env.reset()
+    for step, rec in enumerate(trajectory):
+        obs, reward, done, info = env.step(policy(env))
+        for key in ["t", "theta", "v", "l", "kickAngle", "PE", "KE"]:
+            assert rec[key] == info[key]
+        assert rec["reward"] == reward
+    assert done == stats["done"]
+    assert stats["steps"] == len(trajectory)
+
+def testDiscretizerMatchesDigitize():
+    rng = np.random.default_rng(3)
+    low, high, numBins, windowLen = -9.81, 9.81, 9, 3
+    bounds = np.linspace(low, high, numBins - 1)
+    vals = np.concatenate((rng.uniform(-11, 11, 500), 9.81 * np.sin(np.linspace(0, 20, 500))))
+    discretizer = ObservationDiscretizer(low, high, numBins, windowLen)
+    np.testing.assert_allclose(discretizer.binBounds, bounds)
+
+    # Reference - bin from np.digitize and the direction from the moving sum of the window
+    window = [vals[0]] * windowLen
+    for val in vals:
+        sumPrev = sum(window)
+        window = window[1:] + [val]
+        binIdx = int(np.digitize(val, bounds))
+        expected = binIdx if sum(window) >= sumPrev else numBins * 2 - 1 - binIdx
+        assert discretizer(val) == expected
+
+def testBatchDiscretizerMatchesDiscretizer():
+    rng = np.random.default_rng(4)
+    numEnvs = 16
+    vals = rng.uniform(-10, 10, (300, numEnvs))
+    batch = BatchObservationDiscretizer(numEnvs, -9.81, 9.81)
+    discretizers = [ObservationDiscretizer(-9.81, 9.81) for i in range(numEnvs)]
+    batchStates = batch.reset(vals[0])
+    for i, discretizer in enumerate(discretizers):
+        assert discretizer(vals[0, i]) == batchStates[i]
+    for row in vals[1:]:
+        batchStates = batch(row)
+        assert [discretizer(val) for discretizer, val in zip(discretizers, row)] == list(batchStates)
+
+def testSingleTilingMatchesDiscretizer():
+    rng = np.random.default_rng(5)
+    tiles = TileCodingDiscretizer(-9.81, 9.81, numTilings=1)
+    discretizer = ObservationDiscretizer(-9.81, 9.81)
+    for val in rng.uniform(-11, 11, 500):
+        assert tiles(val) == discretizer(val)
+    qTable = rng.normal(size=(tiles.numTiles, 2))
+    np.testing.assert_array_equal(tiles.getQTable(qTable), qTable)
+
+def testExhaustiveEvaluationMatchesRollouts():
+    rng = np.random.default_rng(6)
+    actionTables = rng.integers(0, 2, (16, 18))
+    results = evaluateActionTables(actionTables)
+    env = gym_martyswing.makeRaw(fastMode=False)
+    for i, policyActions in enumerate(actionTables):
+        expected = learnerRollout(env, policyActions)
+        assert results["rewardSums"][i] == expected["rewardSum"]
+        assert results["thetaMax"][i] == expected["thetaMax"]
+        assert results["steps"][i] == expected["steps"]
+
+@pytest.fixture(scope="module")
+def returnMap():
+    env = MartySwingEnv()
+    return SwingReturnMap.build(g=env.g, l1=env.l1, l2=env.l2, m=env.m, dt=env.dt, numAmplitudes=40, amplitudeMax=np.radians(60))
+
+def testReturnMapMatchesRolloutForFixedPolicy(returnMap):
+    # Kick in states 4 and 13 (actionSelectFix in the learning scripts)
+    policyActions = np.zeros(18, dtype=np.int64)
+    policyActions[[4, 13]] = 1
+    env = MartySwingEnv()
+    assert returnMap.matchesEnv(env)
+    expected = learnerRollout(env, policyActions)
+    predicted = returnMap.evaluatePolicy(policyActions, thetaInit=env.thetaInit)
+    np.testing.assert_allclose(np.degrees(predicted["peaks"]), np.degrees(expected["peaks"][:11]), atol=0.5)
+    assert predicted["thetaMax"] == pytest.approx(expected["thetaMax"], abs=np.radians(0.5))
+
+def testReturnMapHalfSwingsMatchRollouts(returnMap):
+    # Predict each half swing from the amplitude, phase and held action at the real peak before it
+    rng = np.random.default_rng(7)
+    env = MartySwingEnv()
+    errors = []
+    for i in range(20):
+        policyActions = rng.integers(0, 2, 18)
+        patterns = returnMap.patternsForPolicy(policyActions)
+        discretizer = ObservationDiscretizer(-env.maxXAcc, env.maxXAcc)
+        statePrev = discretizer(env.reset()[0])
+        action = 0
+        peaks = []
+        for t in range(1000):
+            vPrev = env.v
+            observation, reward, done, info = env.step(action)
+            state = discretizer(observation[0])
+            if state != statePrev:
+                action = int(policyActions[state])
+            statePrev = state
+            if (env.v > 0) != (vPrev > 0):
+                amplitude = abs(env.theta)
+                peaks.append((amplitude, abs(env.v) / (env.g * np.sin(amplitude) * env.dt), action))
+            if done:
+                break
+        for peakIdx in range(1, len(peaks)):
+            amplitude, phase, heldAction = peaks[peakIdx-1]
+            if amplitude > returnMap.amplitudes[-1]:
+                break
+            assert returnMap.heldAction(amplitude, patterns[(peakIdx-1) % 2]) == heldAction
+            predicted = returnMap.interpolate(returnMap.nextAmplitudes[patterns[peakIdx % 2], heldAction], amplitude, phase)
+            errors.append(np.degrees(abs(predicted - peaks[peakIdx][0])))
+    assert np.median(errors) < 0.1
+
+def testGreedyCachePersistsOutcomes(tmp_path):
+    # An outcome saved by one cache is read by a new cache on the same file without a rollout
+    cacheFile = str(tmp_path / "cache" / "greedy.json")
+    qTable = np.zeros((18, 2))
+    qTable[[4, 13], 1] = 1
+    cache = GreedyPolicyCache(gym_martyswing.makeRaw(), fileName=cacheFile)
+    outcome = cache.evaluate(qTable)
+    expected = learnerRollout(gym_martyswing.makeRaw(fastMode=False), np.argmax(qTable, axis=1))
+    assert outcome == (expected["rewardSum"], expected["thetaMax"])
+    assert (cache.hits, cache.misses) == (0, 1)
+    cache.save()
+
+    cache = GreedyPolicyCache(gym_martyswing.makeRaw(), fileName=cacheFile)
+    cache._rollout = None
+    assert cache.lookup(qTable) == outcome
+    assert cache.evaluate(qTable) == outcome
+    assert (cache.hits, cache.misses) == (1, 0)
+
+    # A change of env settings is a different key
+    cache.env.l2 = 0.3
+    assert cache.lookup(qTable) is None
+
+def testResetRestoresLengthAndEnergies():
+    # An episode which ends kicked mustn't leave the next one starting at the kicked length
+    env = MartySwingEnv()
+    env.reset()
+    for step in range(10):
+        env.step(env.ACTION_KICK)
+    assert env.l == env.l2
+    env.reset()
+    assert env.l == env.l1
+    assert env.kineticE == env.calcKineticEnergy(env.vInitial)
+    assert env.potentialE == env.calcPotentialEnergy(env.thetaInit)
+
+    # So the next episode is the same as one from a new env
+    freshEnv = MartySwingEnv()
+    freshEnv.reset()
+    for step in range(200):
+        assert env.step(0)[0][0] == freshEnv.step(0)[0][0]
+
+def testSysIdRecoversSwingParams(tmp_path):
+    # Recording simulated from known parameters with the sensor model in g
+    times = np.arange(100) * 0.1
+    known = {"l1":np.array([0.34]), "damping":np.array([0.05]), "amplitudeDeg":np.array([8.0]),
+                "phase":np.array([0.5]), "timeScale":np.array([1.0])}
+    xAcc = 0.01 + simulateCandidates(times, known)[0]
+    fitted = fitSwingParams(times, xAcc, numCandidates=512, numRounds=6, seed=0, verbose=False)
+    assert fitted["l1"] == pytest.approx(0.34, abs=0.005)
+    assert fitted["damping"] == pytest.approx(0.05, abs=0.02)
+    assert fitted["amplitudeDeg"] == pytest.approx(8.0, abs=0.5)
+    assert fitted["sensorBias"] == pytest.approx(0.01, abs=0.002)
+
+    # The env uses the fitted lengths and the kicked length is scaled with l1
+    paramsFile = str(tmp_path / "params.json")
+    saveFittedParams(paramsFile, fitted)
+    env = MartySwingEnv()
+    env.loadParams(paramsFile)
+    assert env.l1 == fitted["l1"] and env.damping == fitted["damping"]
+    assert env.l2 == pytest.approx(fitted["l1"] * KICK_LENGTH_RATIO)
+    assert env.l == env.l1 and env.basePotentialE == env.l1 * env.m * env.g
+
+    # A kicked length which isn't shorter is refused
+    with pytest.raises(ValueError):
+        saveFittedParams(paramsFile, fitted, l2=fitted["l1"])
+
+def testValueIterationHasNoFutureValueAfterDone():
+    # State 0 always ends the episode with a reward of 1 and state 1 goes to state 0 with no reward
+    counts = np.zeros((2, 2, 2), dtype=np.int64)
+    doneCounts = np.zeros((2, 2), dtype=np.int64)
+    rewardSums = np.zeros((2, 2))
+    doneCounts[0, 0] = 4
+    rewardSums[0, 0] = 4
+    counts[1, 0, 0] = 3
+    qTable = valueIteration(counts, doneCounts, rewardSums, 0.9)
+    assert qTable[0, 0] == pytest.approx(1)
+    assert qTable[1, 0] == pytest.approx(0.9)
+    assert qTable[0, 1] == 0 and qTable[1, 1] == 0
+
+def testSolvedPolicyReachesGoal():
+    qTable, counts, doneCounts, rewardSums = solveSwing(2, 256, 400, seed=0, verbose=False)
+    assert doneCounts.sum() > 0
+    assert learnerRollout(MartySwingEnv(), np.argmax(qTable, axis=1))["rewardSum"] >= 2500
+
+def testSubprocVecEnvMatchesScalarEnv():
+    rng = np.random.default_rng(0)
+    acts = rng.integers(0, 2, (400, 2))
+    vecEnv = MartySwingSubprocVecEnv([MartySwingEnv, MartySwingEnv])
+    try:
+        scalarEnvs = [MartySwingEnv(), MartySwingEnv()]
+        obs = vecEnv.reset()
+        assert np.array_equal(obs[:, 0], [env.reset()[0] for env in scalarEnvs])
+        for stepActs in acts:
+            obs, reward, done, info = vecEnv.step(stepActs)
+            for envIdx, env in enumerate(scalarEnvs):
+                envObs, envReward, envDone, envInfo = env.step(stepActs[envIdx])
+                assert info["theta"][envIdx] == envInfo["theta"]
+                if envDone:
+                    envObs = env.reset()
+                assert obs[envIdx, 0] == envObs[0]
+                assert reward[envIdx] == envReward and done[envIdx] == envDone
+        assert done.dtype == bool
+
+        # Frames need a shared buffer
+        with pytest.raises(ValueError):
+            vecEnv.render()
+    finally:
+        vecEnv.close()
+
+def testSubprocVecEnvRaisesWorkerErrors():
+    vecEnv = MartySwingSubprocVecEnv([MartySwingEnv, MartySwingEnv])
+    try:
+        vecEnv.reset()
+        vecEnv.setAttr("integrator", "unknown")
+        with pytest.raises(ValueError, match="Unknown integrator") as errorInfo:
+            vecEnv.step([0, 0])
+        assert "martyswing_env.py" in str(errorInfo.value.__cause__)
+
+        # The workers carry on after an error
+        vecEnv.setAttr("integrator", "euler")
+        obs, reward, done, info = vecEnv.step([0, 0])
+        assert obs.shape == (2, 1)
+    finally:
+        vecEnv.close()
+    assert vecEnv.closed
+
+def qLearnEpisodes(env, qTable, numEpisodes, explorationRate=0.3, learningRate=0.5, discountFactor=0.9, timeMax=300):
+    # Short version of learnToSwing() which draws from python's random, numpy's global generator
+    # and the env's action space so a resumed run only matches if all of them are restored
+    discretizer = ObservationDiscretizer(-env.maxXAcc, env.maxXAcc)
+    rewardTotal = []
+    for episode in range(numEpisodes):
+        env.thetaInit = np.radians(20 + 20 * np.random.random())
+        discretizer.reset()
+        statePrev = discretizer(env.reset()[0])
+        action = 0
+        rewardInState = 0
+        episodeRewardSum = 0
+        for t in range(timeMax):
+            observation, reward, done, _ = env.step(action)
+            state = discretizer(observation[0])
+            rewardInState += reward
+            if state != statePrev:
+                qTable[statePrev, action] += learningRate * (rewardInState + discountFactor * qTable[state].max() - qTable[statePrev, action])
+                action = env.action_space.sample() if random.random() < explorationRate else int(qTable[state].argmax())
+                episodeRewardSum += rewardInState
+                rewardInState = 0
+            statePrev = state
+            if done:
+                break
+        rewardTotal.append(episodeRewardSum)
+    return rewardTotal
+
+def testCheckpointResumeMatchesUninterruptedRun(tmp_path):
+    def seedAll(env):
+        random.seed(1)
+        np.random.seed(1)
+        env.action_space.seed(1)
+
+    # Uninterrupted run
+    env = MartySwingEnv()
+    seedAll(env)
+    qTable = np.zeros((18, 2))
+    rewardTotal = qLearnEpisodes(env, qTable, 6)
+
+    # Run which is checkpointed half way, disturbed and then resumed in a new env
+    checkpointFile = str(tmp_path / "checkpoints" / "run.npz")
+    env = MartySwingEnv()
+    seedAll(env)
+    resumedQTable = np.zeros((18, 2))
+    firstRewards = qLearnEpisodes(env, resumedQTable, 3)
+    saveCheckpoint(checkpointFile, resumedQTable, 3, 0.5, 0.3, 0, firstRewards, captureRngStates(env))
+    random.seed(2)
+    np.random.seed(2)
+    env = MartySwingEnv()
+    checkpoint = loadCheckpoint(checkpointFile)
+    restoreRngStates(checkpoint["rngStates"], env)
+    resumedQTable = checkpoint["qTable"]
+    assert checkpoint["episode"] == 3 and checkpoint["rewardTotal"] == firstRewards
+    resumedRewards = checkpoint["rewardTotal"] + qLearnEpisodes(env, resumedQTable, 3)
+    assert np.array_equal(resumedQTable, qTable)
+    assert resumedRewards == rewardTotal
+
+    # Warm start from the checkpoint needs a table of the same shape
+    assert np.array_equal(loadWarmStartTable(checkpointFile, (18, 2)), loadCheckpoint(checkpointFile)["qTable"])
+    with pytest.raises(ValueError):
+        loadWarmStartTable(checkpointFile, (9, 2))
+
+def testTraceRendersOriginalTextLog(tmp_path):
+    # Q-learning run logged with the trace and with the LOG_DEBUG text of the original script
+    actionNames = ["Straight", "Kick", ""]
+    def dumpQTable(qTable):
+        dumpStr = ""
+        for i, st in enumerate(qTable):
+            for ac in st:
+                dumpStr += f"{ac:0.4f}\t"
+            bestAct = 2 if st[0] == st[1] else np.argmax(st)
+            dumpStr += f"{'RL ' if i < len(qTable)/2 else 'LR '} {actionNames[bestAct]}\n"
+        return dumpStr
+
+    traceFile = str(tmp_path / "trace")
+    traceLog = TraceRecorder(traceFile, 18, 2, actionNames, chunkLen=64)
+    episodeTexts = []
+    env = MartySwingEnv()
+    discretizer = ObservationDiscretizer(-env.maxXAcc, env.maxXAcc)
+    rng = np.random.default_rng(0)
+    qTable = np.zeros((18, 2))
+    learningRate, explorationRate, streaksNum = 0.5, 0.3, 0
+    for episode in range(3):
+        text = ""
+        discretizer.reset()
+        statePrev = discretizer(env.reset()[0])
+        action = 0
+        rewardInState = 0
+        episodeRewardSum = 0
+        for t in range(1, 301):
+            observation, reward, done, info = env.step(action)
+            state = discretizer(observation[0])
+            rewardInState += reward
+            text += (f"{actionNames[action]} --- Ep {episode} t {t} statePrev {statePrev} state {state} rew {rewardInState:.2f} {'[+]' if rewardInState > 0 else ('[~]' if rewardInState > -1 else '[-]')} PE {info['PE']:.2f} KE {info['KE']:.2f} TE {info['PE']+info['KE']:.2f} theta {info['theta']:.2f} thetaMax {info['thetaMax']:.2f} v {info['v']:.2f} explRate {explorationRate} learnRate {learningRate} Streaks {streaksNum} \n")
+            traceLog.step(episode, t, statePrev, state, action, rewardInState, info["PE"], info["KE"], info["theta"], info["thetaMax"], info["v"], explorationRate, learningRate, streaksNum)
+            if state != statePrev:
+                qTable[statePrev, action] += learningRate * (rewardInState + 0.9 * qTable[state].max() - qTable[statePrev, action])
+                text += dumpQTable(qTable)
+                traceLog.qTable(qTable)
+                action = int(rng.integers(2)) if rng.random() < explorationRate else int(qTable[state].argmax())
+                episodeRewardSum += rewardInState
+                rewardInState = 0
+            statePrev = state
+            if done:
+                break
+        text += f".....Episode {episode} finished after {t} episodeRewardSum {episodeRewardSum:.2f} thetaMax {info['thetaMax']:.2f} learnRate {learningRate:.2f} exploreRate {explorationRate:.2f} streakLen {streaksNum}\n"
+        traceLog.episodeEnd(episode, t, episodeRewardSum, info["thetaMax"], learningRate, explorationRate, streaksNum)
+        episodeTexts.append(text)
+        streaksNum += 1
+        explorationRate /= 2
+    traceLog.close()
+
+    traceReader = TraceReader(traceFile)
+    assert len(traceReader.episodes) == 3 and len(traceReader.steps) > 64
+    assert len(traceReader.qTables) < (traceReader.steps["qTableIdx"] >= 0).sum()
+    textFile = str(tmp_path / "log.txt")
+    traceReader.writeText(textFile)
+    with open(textFile, "r") as logFile:
+        assert logFile.read() == "".join(episodeTexts)
+    assert "".join(traceReader.iterText(1, 2)) == episodeTexts[1]
+
+def testReplayConvergesToBellmanValues():
+    # Two states which swap on action 0 with a reward of 1 on leaving state 0 - action 1 is never taken
+    replay = PrioritizedReplay(capacity=4, seed=0)
+    for i in range(3):
+        replay.add(0, 0, 1.0, 1)
+        replay.add(1, 0, 0.0, 0)
+    assert replay.size == 4 and replay.pos == 2
+    qTable = np.zeros((2, 2))
+    replay.replay(qTable, 0.5, 0.9, batchSize=8, numBatches=500)
+    assert qTable[0, 0] == pytest.approx(1 / 0.19, rel=1e-4)
+    assert qTable[1, 0] == pytest.approx(0.9 / 0.19, rel=1e-4)
+    assert qTable[0, 1] == 0 and qTable[1, 1] == 0
+    assert replay.priorities[:replay.size].max() < 0.01
+
+def testFittedQFromDataset(tmp_path):
+    dirName = str(tmp_path / "dataset")
+    assert generateDataset(dirName, 64, 400, chunkLen=100, seed=0) == 64 * 400
+
+    # Discretized again with the same settings the stored states are reproduced
+    states, actions, rewards, nextStates, dones, firsts = discretizeDataset(dirName)
+    chunks = list(iterTrajectoryChunks(dirName, ["state", "nextState", "reward"]))
+    assert len(chunks) == 4
+    assert np.array_equal(states, np.concatenate([chunk["state"] for chunk in chunks]).T)
+    assert np.array_equal(nextStates, np.concatenate([chunk["nextState"] for chunk in chunks]).T)
+
+    # Every step is in one transition
+    transitions = extractTransitions(states, actions, rewards, nextStates, dones, firsts)
+    assert transitions["reward"].sum() == pytest.approx(rewards.sum())
+    assert transitions["done"].sum() == dones.sum()
+
+    # The greedy policy of the fitted table reaches the goal
+    qTable, transitions = fitQTable(dirName)
+    assert learnerRollout(MartySwingEnv(), np.argmax(qTable, axis=1))["rewardSum"] >= 2500
+
+def testSetStateReproducesTrajectory():
+    # Random kicks from the env's own generator so the snapshot must include its state
+    def runSteps(env, numSteps):
+        results = []
+        for step in range(numSteps):
+            observation, reward, done, info = env.step(int(env.np_random.integers(2)))
+            results.append((observation[0], reward, done, info["PE"], info["KE"], info["thetaMax"]))
+            if done:
+                break
+        return results
+
+    env = MartySwingEnv()
+    env.seed(0)
+    env.reset()
+    runSteps(env, 50)
+    snapshot = env.getState()
+    firstRun = runSteps(env, 200)
+    env.step(1)
+    env.setState(snapshot)
+    assert runSteps(env, 200) == firstRun
+
+    # A snapshot without the generator state restores the dynamics only
+    env.setState(snapshot[:-1] + (None,))
+    assert env.getState(includeRng=False) == snapshot[:-1] + (None,)
+
+def testPlannerDecisionsReplay():
+    planner = SwingBeamPlanner(gym_martyswing.makeRaw(), beamWidth=4)
+    result = planner.plan()
+    assert result["reward"] >= 2500
+    assert planner.replay(result["decisions"]) == result["reward"]
+
+def testSweepMatchesRollouts(tmp_path):
+    controller = ThresholdController(kickWindowDeg=5, straightenAngleDeg=20)
+    paramGrid = {"l2": [0.35, 0.42], "thetaInitDeg": [10, 30], "dt": [0.02]}
+    sweepFile = str(tmp_path / "sweep.npz")
+    axes, results = sweepGrid(paramGrid, controller, sweepFile, numPeaks=5, maxSteps=3000, processes=2)
+    assert results["thetaMax"].shape == (2, 2, 1)
+    for l2Idx, l2 in enumerate(paramGrid["l2"]):
+        for thetaIdx, thetaInitDeg in enumerate(paramGrid["thetaInitDeg"]):
+            env = MartySwingEnv(l2=l2, thetaInitDeg=thetaInitDeg)
+            env.dt = 0.02
+            trajectory, stats = env.rollout(controller, 3000)
+            assert results["thetaMax"][l2Idx, thetaIdx, 0] == stats["thetaMax"]
+            assert results["reward"][l2Idx, thetaIdx, 0] == stats["rewardSum"]
+            assert results["steps"][l2Idx, thetaIdx, 0] == stats["steps"]
+    with np.load(sweepFile) as data:
+        assert list(data["paramNames"]) == ["l2", "thetaInitDeg", "dt"]
+        assert np.array_equal(data["reward"], results["reward"])
+
+    # Parameters which aren't in every set are nan in the list results
+    params, listResults = sweepList([{"l2":0.35}, {"thetaInitDeg":10}], controller, numPeaks=5, maxSteps=3000, processes=1)
+    assert np.isnan(params["l2"][1]) and np.isnan(params["thetaInitDeg"][0])
+    assert listResults["reward"][0] == MartySwingEnv(l2=0.35).rollout(controller, 3000)[1]["rewardSum"]
+
+def testControllerSearchMatchesRollouts():
+    results = searchThresholdControllers([2, 5, 10], [15, 25], [10, 30], maxSteps=3000)
+    assert len(results) == 12
+    assert np.all(np.diff(results["reward"]) <= 0)
+    for result in results[[0, 5, 11]]:
+        env = MartySwingEnv(thetaInitDeg=result["thetaInitDeg"])
+        controller = ThresholdController(result["kickWindowDeg"], result["straightenAngleDeg"])
+        trajectory, stats = env.rollout(controller, 3000)
+        assert result["reward"] == pytest.approx(stats["rewardSum"])
+        assert result["thetaMax"] == pytest.approx(stats["thetaMax"])
+        assert result["done"] == stats["done"]
+
+def testEvolvedPolicyImproves():
+    policy = SwingPolicy(historyLen=4)
+    params, rewardTotal, populationRewardMean = evolvePolicy(policy, 15, 32, processes=1, seed=0, verbose=False)
+
+    # Zero parameters never kick (so get no reward) and the evolved ones reach the goal
+    assert rewardTotal[0] == 0
+    assert rewardTotal[-1] >= 2500
+
+    # The batched evaluation matches a scalar env following the same policy
+    env = MartySwingEnv()
+    history = np.full((1, policy.historyLen), env.reset()[0] / env.maxXAcc)
+    rewardSum = 0
+    for step in range(1000):
+        observation, reward, done, _ = env.step(int(policy.kickProbs(params[np.newaxis, :], history)[0] > 0.5))
+        rewardSum += reward
+        if done:
+            break
+        history = np.roll(history, -1, axis=1)
+        history[0, -1] = observation[0] / env.maxXAcc
+    assert evaluatePolicies(params, policy)[0] == pytest.approx(rewardSum)
+
+    # Evaluating over a pool gives the same result
+    assert evolvePolicy(policy, 3, 8, processes=2, seed=1, verbose=False)[1] == evolvePolicy(policy, 3, 8, processes=1, seed=1, verbose=False)[1]
+
+def testSuccessiveHalvingKeepsLearningConfig(tmp_path):
+    # A learning rate of zero never learns so it must be dropped after the first round
+    configs = makeConfigs({"learnRateMax": [0, 1], "learnRateMin": [0]})
+    assert len(configs) == 2
+    resultsFile = str(tmp_path / "results.csv")
+    best, table = successiveHalving(configs, minEpisodes=20, maxEpisodes=40, eta=2, numSeeds=4,
+                baseSettings={"streakLenWhenDone":5}, resultsFile=resultsFile, processes=2, verbose=False)
+    assert best == {"learnRateMax":1, "learnRateMin":0}
+    assert [(row["round"], row["episodeMax"]) for row in table] == [(0, 20), (0, 20), (1, 40)]
+    assert table[0]["solvedFraction"] == 0 and table[1]["meanRewardLast"] > table[0]["meanRewardLast"]
+    with open(resultsFile, "r") as csvFile:
+        lines = csvFile.read().splitlines()
+    assert lines[0] == "learnRateMax,learnRateMin,round,episodeMax,solvedFraction,medianEpisodesToSolve,meanRewardLast"
+    assert len(lines) == 4
+
+def testAsyncLearnerSolvesAndStopsWorkers(tmp_path):
+    cacheFile = str(tmp_path / "cache.json")
+    learner = AsyncQLearner(2, episodeMax=300, streakLenWhenDone=3, seed=0, cacheFile=cacheFile)
+    results = learner.train(verbose=False)
+
+    # Solved by a streak of greedy evaluations and the workers stopped before their episodeMax
+    assert results["solved"]
+    assert all(reward >= 2500 for reward in results["rewardTotal"][-4:])
+    assert results["episodes"] == results["workerEpisodes"].sum() < 600
+    assert np.all(results["workerEpisodes"] > 0)
+
+    # Each greedy evaluation is either a cache hit or a rollout which is then in the cache file
+    assert results["cacheHits"] + results["cacheMisses"] == len(results["rewardTotal"])
+    with open(cacheFile, "r") as jsonFile:
+        assert len(json.load(jsonFile)) == results["cacheMisses"]
+
+def testIntegratorsOnFreeSwing():
+    # Free swing from 30 degrees - the turning points are half a period apart (the large
+    # amplitude pendulum period) and energy is conserved better by the higher order integrators
+    thetaInit = np.radians(30)
+    period = 2 * np.pi * np.sqrt(0.45 / 9.81) * (1 + thetaInit**2 / 16 + 11 * thetaInit**4 / 3072 + 173 * thetaInit**6 / 737280)
+    energyDrifts = {}
+    for integrator in ["euler", "leapfrog", "rk4"]:
+        env = MartySwingEnv(integrator=integrator, exactPeaks=True)
+        env.reset()
+        energyStart = env.potentialE + env.kineticE
+        peakTimes = []
+        done = False
+        while not done:
+            vPrev = env.v
+            observation, reward, done, info = env.step(0)
+            if (env.v > 0) != (vPrev > 0):
+                peakTimes.append(env.tPeakLast)
+        energyDrifts[integrator] = abs(env.potentialE + env.kineticE - energyStart) / energyStart
+        if integrator == "rk4":
+            assert len(peakTimes) == 11
+            assert np.allclose(np.diff(peakTimes), period / 2, atol=1e-6)
+            assert peakTimes[0] == pytest.approx(period / 2, abs=1e-6)
+    assert energyDrifts["rk4"] < 1e-6 < energyDrifts["leapfrog"] < energyDrifts["euler"]
+
+def testMultiAgentLearnersStopWhenSolved():
+    streakLenWhenDone = 5
+    results = MultiAgentQLearner(8, episodeMax=40, streakLenWhenDone=streakLenWhenDone, seed=0).train(verbose=False)
+    episodesToSolve, rewardTotals = results["episodesToSolve"], results["rewardTotals"]
+    assert (episodesToSolve >= 0).any()
+    for agentIdx, solvedEpisode in enumerate(episodesToSolve):
+        if solvedEpisode >= 0:
+            # Solved by a streak of episodes reaching the goal and then stopped
+            assert np.all(rewardTotals[agentIdx, solvedEpisode - streakLenWhenDone:solvedEpisode + 1] >= 2500)
+            assert np.all(np.isnan(rewardTotals[agentIdx, solvedEpisode + 1:]))
+        else:
+            assert not np.isnan(rewardTotals[agentIdx]).any()
+
+def testEnvImportsWithoutRendering():
+    # Importing and stepping the env mustn't load the OpenGL rendering (or pyglet)
+    code = ("import sys, gym_martyswing; env = gym_martyswing.makeRaw(); env.reset(); env.step(1); "
+                "print('pyglet' in sys.modules, 'gym.envs.classic_control.rendering' in sys.modules)")
+    output = subprocess.run([sys.executable, "-W", "ignore", "-c", code], capture_output=True, text=True, check=True).stdout
+    assert output.split()[-2:] == ["False", "False"]
+
+def testRasterizerRendersSwingStates():
+    env = MartySwingEnv()
+    env.headless = True
+    env.useRasterizer = True
+    env.reset()
+    assert env.render(mode='human') is None
+
+    # Frames of single states match the batch render
+    thetas = np.radians([-20, 0, 25])
+    kickAngles = np.array([0, env.kickAngleKicked, 0])
+    frames = env.renderFrames(thetas, kickAngles)
+    assert frames.shape == (3, 500, 500, 3) and frames.dtype == np.uint8
+    for theta, kickAngle, frame in zip(thetas, kickAngles, frames):
+        env.theta, env.kickAngle = theta, kickAngle
+        assert np.array_equal(env.render(mode='rgb_array'), frame)
+
+    # White background, black axle (just above the world origin where the rope hangs) and the swing moves
+    assert np.all(frames[:, 0, 0] == 255)
+    assert np.all(frames[:, int((1.0 - 0.03) / 4.4 * 500), 250] == 0)
+    assert not np.array_equal(frames[0], frames[2])